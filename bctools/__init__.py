@@ -1,2 +1,6 @@
 from .plots import *
-from .utilities import get_cost_dict, get_confusion_category_observations_df
\ No newline at end of file
+from .utilities import get_cost_dict, get_confusion_category_observations_df, get_density_curve_data
+from .confusion import ConfusionAccumulator, ConfusionSketch, ConfusionCategoryIndex, CostModel
+from .cache import set_cache_options, clear_cache, get_cache_info
+from .analysis import ThresholdAnalysis
+from .bootstrap import get_bootstrap_confidence_bands
\ No newline at end of file
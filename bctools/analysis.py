@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import copy
+
+import numpy as np
+
+from . import plots
+from .cache import _get_fingerprint
+from .validation import _get_values_array, _get_labels_scores_arrays
+from .confusion import ConfusionCategoryIndex, CostModel, _get_n_below, _get_cum_pos, _get_counts_from_cum_pos
+from .confusion import _sort_validated_predictions
+from .utilities import get_amount_cost_df, get_invariant_metrics_df, get_confusion_category_observations_df
+from .thresholds import get_optimized_thresholds_df
+from .bootstrap import get_bootstrap_confidence_bands
+
+class ThresholdAnalysis:
+
+    """
+    Session of analysis of a binary classifier on a set of data, that serves all the plots and dataframes of the library.
+    Inputs are validated and converted once to contiguous read-only NumPy arrays (hashed only once by the cache, if enabled);
+    the sorted order of the predicted probabilities, the cumulative counts, the amount and cost grids,
+    the invariant metrics and the optimized thresholds are computed lazily and kept for the following calls.
+    The data are sorted once per session, even with the cache disabled: plots and dataframes use the sorted
+    predictions of the session (amount and cost grids, counts and invariant metrics of the plots are computed from them
+    in linear time), only the ROC and PR curves points are computed by scikit-learn at each plot
+
+    Parameters
+    ----------
+    true_y: sequence of ints (0 or 1)
+        True labels
+    predicted_proba: sequence of floats
+        predicted probabilities for class 1
+        (e.g. output from model.predict_proba(data)[:,1])
+    amounts: sequence of floats, default=None
+        amounts associated to each element of data
+        (e.g. fraud detection for online orders: amounts could be the orders' amounts)
+    cost_dict: dict or CostModel, deafult=None
+        dict containing costs associated to each class (TN, FP, FN, TP)
+        with keys "TN", "FP", "FN", "TP"
+        and values that can be both lists (with coherent lenghts) and/or floats
+        (output from get_cost_dict), converted once to a CostModel
+    currency: str, default='€'
+        currency symbol to be visualized in the plots
+    random_state: int, default=None
+        Controls the randomness of the bootstrapping of the samples when optimizing thresholds with GHOST method
+        and of the bootstrap confidence bands.
+        If None, a seed is drawn once, so that all the optimized thresholds and bands of the session are consistent
+    n_jobs: int, default=None
+        Number of worker processes used when optimizing thresholds with GHOST method and computing confidence bands.
+        None or 1 means no parallelism, -1 means using all processors
+    low_memory: bool, default=False
+        If True, predicted probabilities, amounts and per-row costs are stored as float32, halving their memory
+        and the one of the sorted predictions and of the GHOST subsets (sums of amounts and costs are still
+        accumulated in float64). Predicted probabilities are rounded to the nearest float32 (relative error
+        at most 2**-24, i.e. absolute error at most 6e-8 on probabilities), so counts can differ from the default
+        ones only for data points within 6e-8 of a threshold; amounts and costs sums differ at most by
+        2**-24 times the sum of their absolute values (plus the float64 rounding of the default path)
+
+    Attributes
+    ----------
+    true_y, predicted_proba, amounts: np.arrays
+        read-only validated inputs: uint8 labels, float64 (or float32, if given so or if low_memory is True)
+        predicted probabilities and amounts (amounts is None if not given)
+    cost_dict: CostModel
+        validated costs, with read-only per-row costs (None if not given)
+    low_memory: bool
+        True if the inputs are stored as float32
+    """
+
+    def __init__(self, true_y, predicted_proba, amounts = None, cost_dict = None, currency = '€',
+                 random_state = None, n_jobs = None, low_memory = False):
+
+        self.low_memory = bool(low_memory)
+        values_dtype = np.float32 if self.low_memory else None
+
+        true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
+        self.true_y = _get_read_only_array(true_y)
+        self.predicted_proba = _get_read_only_array(predicted_proba, values_dtype)
+        n_data = len(self.true_y)
+
+        self.amounts = None
+        if amounts is not None:
+            self.amounts = _get_read_only_array(_get_values_array(amounts, 'amounts', n_data), values_dtype)
+
+        self.cost_dict = None if cost_dict is None else CostModel.from_cost_dict(cost_dict, n_data = n_data,
+                                                                                dtype = values_dtype)
+
+        self.currency = currency
+        self.random_state = np.random.randint(2**31 - 1) if random_state is None else random_state
+        self.n_jobs = n_jobs
+
+        self._sorted_predictions = None
+        self._cum_pos = None
+        self._results = {}
+
+    def get_confusion_counts(self, threshold_values):
+
+        """
+        Computes confusion matrix counts (TN, FP, FN, TP) for every given threshold,
+        from the sorted labels and their cumulative counts (computed once)
+
+        Parameters
+        ----------
+        threshold_values: float or sequence of floats
+            classification thresholds below which prediction label is 0, 1 otherwise
+
+        Returns
+        ----------
+        TN, FP, FN, TP: np.arrays of ints
+            counts of each confusion class, one element for each threshold (in the given order)
+        """
+        sorted_proba = self._get_sorted_predictions()[1]
+
+        return _get_counts_from_cum_pos(self._get_cum_pos(), _get_n_below(sorted_proba, threshold_values))
+
+    def get_amount_cost_df(self, threshold_values, n_breakpoints = None):
+
+        """
+        Returns the dataframe of amounts and costs of each confusion class for every given threshold
+        (see utilities.get_amount_cost_df)
+
+        Parameters
+        ----------
+        threshold_values: sequence of floats or 'exact'
+            classification thresholds below which prediction label is 0, 1 otherwise
+        n_breakpoints: int, default=None
+            maximum number of thresholds when threshold_values is 'exact'
+        """
+        return self._get_result('amount_cost_df',
+                                lambda: get_amount_cost_df(self.true_y, self.predicted_proba, threshold_values,
+                                                           self.amounts, self.cost_dict, n_breakpoints = n_breakpoints,
+                                                           _sorted_predictions = self._get_sorted_predictions()),
+                                threshold_values, n_breakpoints)
+
+    def get_invariant_metrics_df(self):
+
+        """
+        Returns the dataframe of metrics that don't depend on threshold: ROC auc, Precision-Recall auc (average precision),
+        Brier score, log-loss and calibration error
+        (see utilities.get_invariant_metrics_df)
+        """
+        return self._get_result('invariant_metrics_df',
+                                lambda: get_invariant_metrics_df(self.true_y, self.predicted_proba,
+                                                                 _sorted_predictions = self._get_sorted_predictions()))
+
+    def get_optimized_thresholds_df(self, optimize_threshold = 'all', threshold_values = None,
+                                    N_subsets = 70, subsets_size = 0.2, with_replacement = False,
+                                    return_curves = False, n_breakpoints = None):
+
+        """
+        Returns the thresholds optimized with GHOST method, with the random_state and n_jobs of the session
+        (see thresholds.get_optimized_thresholds_df)
+
+        Parameters
+        ----------
+        optimize_threshold: {'all', 'ROC', 'MCC', 'Kappa', 'Fscore', 'Cost'}
+                            or list containing allowed values except 'all',  default='all'
+            metrics for which thresholds will be optimized
+        threshold_values: sequence of floats or 'exact', default=None
+            thresholds among which the optimal ones are chosen; if None, the inner thresholds of
+            the plots with threshold_step=0.01
+        N_subsets, subsets_size, with_replacement, return_curves, n_breakpoints:
+            see thresholds.get_optimized_thresholds_df
+        """
+        if threshold_values is None:
+            threshold_values = list(np.arange(0, 1 + 0.01, 0.01))[1:-1]
+
+        return self._get_result('optimized_thresholds_df',
+                                lambda: get_optimized_thresholds_df(optimize_threshold, threshold_values,
+                                                                    self.true_y, self.predicted_proba, self.cost_dict,
+                                                                    N_subsets = N_subsets, subsets_size = subsets_size,
+                                                                    with_replacement = with_replacement,
+                                                                    random_state = self.random_state, n_jobs = self.n_jobs,
+                                                                    return_curves = return_curves, n_breakpoints = n_breakpoints),
+                                optimize_threshold, threshold_values, N_subsets, subsets_size, with_replacement,
+                                return_curves, n_breakpoints)
+
+    def get_bootstrap_confidence_bands(self, threshold_values = None, n_bootstraps = 200, confidence_level = 0.95,
+                                       method = 'poisson', n_curve_points = 101):
+
+        """
+        Returns the bootstrap confidence bands of the invariant metrics, of the ROC and PR curves and, if threshold_values
+        is given, of the threshold dependent metrics, amounts and costs of the session data,
+        with the random_state and n_jobs of the session (see bootstrap.get_bootstrap_confidence_bands)
+
+        Parameters
+        ----------
+        threshold_values: sequence of floats, default=None
+            classification thresholds below which prediction label is 0, 1 otherwise
+        n_bootstraps, confidence_level, method, n_curve_points:
+            see bootstrap.get_bootstrap_confidence_bands
+        """
+        amounts, cost_dict = (None, None) if threshold_values is None else (self.amounts, self.cost_dict)
+
+        return self._get_result('bootstrap_confidence_bands',
+                                lambda: get_bootstrap_confidence_bands(self.true_y, self.predicted_proba, threshold_values,
+                                                                       amounts, cost_dict, n_bootstraps = n_bootstraps,
+                                                                       confidence_level = confidence_level, method = method,
+                                                                       n_curve_points = n_curve_points,
+                                                                       random_state = self.random_state, n_jobs = self.n_jobs,
+                                                                       _sorted_predictions = self._get_sorted_predictions()),
+                                threshold_values, n_bootstraps, confidence_level, method, n_curve_points)
+
+    def get_confusion_category_observations_df(self, confusion_category, X_data, threshold = 0.5):
+
+        """
+        Returns X (features) dataframe of data points related to a chosen "confusion category"
+        (see utilities.get_confusion_category_observations_df)
+
+        Parameters
+        ----------
+        confusion_category: str {'TN', 'FP', 'FN', 'TP'}
+            confusion category is either True Negative TN, False Positive FP, False Negative FN, True Positive TP
+        X_data: sequence of features (nd.array or list or pandas object)
+            set of features, in the order of the data of the session
+        threshold: float, default=0.5
+            classification threshold below which prediction label is 0, 1 otherwise
+        """
+        return get_confusion_category_observations_df(confusion_category, X_data, self.true_y, self.predicted_proba,
+                                                      threshold = threshold)
+
+    def get_confusion_category_index(self, X_data = None, sort_data = False):
+
+        """
+        Returns the index of the data points of each confusion category, for repeated retrievals of their features
+        at any threshold and of the data points that change category between two thresholds, with the amounts
+        and costs of the session (see confusion.ConfusionCategoryIndex)
+
+        Parameters
+        ----------
+        X_data: pandas DataFrame, nd.array (or np.memmap) or str, default=None
+            set of features, in the order of the data of the session, or path of a Parquet file
+        sort_data: bool or str, default=False
+            if True, the feature table is copied in memory in the order of the index;
+            if a path is given, the sorted NumPy feature table is written to a memory-mapped .npy file at that path
+        """
+        return ConfusionCategoryIndex(self.true_y, self.predicted_proba, X_data, sort_data = sort_data,
+                                      amounts = self.amounts, cost_dict = self.cost_dict,
+                                      _sorted_predictions = self._get_sorted_predictions())
+
+    def curve_ROC_plot(self, title = "Receiver Operating Characteristic Curve", show_display_modebar = True,
+                       max_points = None, tolerance = None, confidence_level = None, n_bootstraps = 200):
+
+        """
+        Plots the ROC curve of the session data, with the random_state and n_jobs of the session for the confidence band
+        (see plots.curve_ROC_plot)
+        """
+        fig, area_under_ROC_curve = plots.build_curve_ROC_plot(self.true_y, self.predicted_proba, title = title,
+                                                               max_points = max_points, tolerance = tolerance,
+                                                               confidence_level = confidence_level, n_bootstraps = n_bootstraps,
+                                                               random_state = self.random_state, n_jobs = self.n_jobs,
+                                                               _sorted_predictions = self._get_band_sorted_predictions(confidence_level))
+        fig.show(config = dict(displayModeBar = show_display_modebar))
+
+        return area_under_ROC_curve
+
+    def curve_PR_plot(self, beta = 1, title = "Precision Recall Curve", show_display_modebar = True,
+                      max_points = None, tolerance = None, confidence_level = None, n_bootstraps = 200):
+
+        """
+        Plots the Precision-Recall curve of the session data, with the random_state and n_jobs of the session
+        for the confidence band (see plots.curve_PR_plot)
+        """
+        fig, area_under_pr_curve = plots.build_curve_PR_plot(self.true_y, self.predicted_proba, beta = beta, title = title,
+                                                             max_points = max_points, tolerance = tolerance,
+                                                             confidence_level = confidence_level, n_bootstraps = n_bootstraps,
+                                                             random_state = self.random_state, n_jobs = self.n_jobs,
+                                                             _sorted_predictions = self._get_band_sorted_predictions(confidence_level))
+        fig.show(config = dict(displayModeBar = show_display_modebar))
+
+        return area_under_pr_curve
+
+    def predicted_proba_violin_plot(self, threshold_step = 0.01, marker_size = 3,
+                                    title = "Interactive Probabilities Violin Plot", show_display_modebar = True,
+                                    compact = False, max_points = None):
+
+        """
+        Plots the violin plots of the predicted probabilities of the session data (see plots.predicted_proba_violin_plot)
+        """
+        fig = plots.build_predicted_proba_violin_plot(self.true_y, self.predicted_proba, threshold_step = threshold_step,
+                                                      marker_size = marker_size, title = title, compact = compact,
+                                                      max_points = max_points,
+                                                      _sorted_predictions = self._get_sorted_predictions())
+        fig.show(config = dict(displayModeBar = show_display_modebar))
+
+    def predicted_proba_density_curve_plot(self, threshold_step = 0.01, curve_type = 'kde',
+                                           title = "Interactive Probabilities Density Plot", show_display_modebar = True,
+                                           compact = False, bandwidth = 'scott'):
+
+        """
+        Plots the density curves of the predicted probabilities of the session data
+        (see plots.predicted_proba_density_curve_plot)
+        """
+        fig = plots.build_predicted_proba_density_curve_plot(self.true_y, self.predicted_proba, threshold_step = threshold_step,
+                                                             curve_type = curve_type, title = title, compact = compact,
+                                                             bandwidth = bandwidth,
+                                                             _sorted_predictions = self._get_sorted_predictions())
+        fig.show(config = dict(displayModeBar = show_display_modebar))
+
+    def confusion_matrix_plot(self, threshold_step = 0.01, optimize_threshold = None,
+                              N_subsets = 70, subsets_size = 0.2, with_replacement = False,
+                              title = 'Interactive Confusion Matrix', show_display_modebar = True, compact = False):
+
+        """
+        Plots the interactive confusion matrix of the session data, with its amounts, costs, currency,
+        random_state and n_jobs (see plots.confusion_matrix_plot)
+        """
+        fig, metrics_dep_on_threshold_df, constant_metrics_df, optimal_thresholds_df = \
+            plots.build_confusion_matrix_plot(self.true_y, self.predicted_proba, threshold_step = threshold_step,
+                                              amounts = self.amounts, cost_dict = self.cost_dict,
+                                              optimize_threshold = optimize_threshold, N_subsets = N_subsets,
+                                              subsets_size = subsets_size, with_replacement = with_replacement,
+                                              currency = self.currency, random_state = self.random_state, title = title,
+                                              n_jobs = self.n_jobs, compact = compact,
+                                              _sorted_predictions = self._get_sorted_predictions())
+        fig.show(config = dict(displayModeBar = show_display_modebar))
+
+        return metrics_dep_on_threshold_df, constant_metrics_df, optimal_thresholds_df
+
+    def confusion_linechart_plot(self, threshold_step = 0.01,
+                                 title = 'Interactive Confusion Line Chart', show_display_modebar = True,
+                                 compact = False, confidence_level = None, n_bootstraps = 200):
+
+        """
+        Plots the interactive confusion line chart of the session data, with its amounts, costs and currency,
+        random_state and n_jobs (see plots.confusion_linechart_plot)
+        """
+        fig, amount_cost_df, tot_amount = \
+            plots.build_confusion_linechart_plot(self.true_y, self.predicted_proba, threshold_step = threshold_step,
+                                                 amounts = self.amounts, cost_dict = self.cost_dict, currency = self.currency,
+                                                 title = title, compact = compact, confidence_level = confidence_level,
+                                                 n_bootstraps = n_bootstraps, random_state = self.random_state,
+                                                 n_jobs = self.n_jobs, _sorted_predictions = self._get_sorted_predictions())
+        fig.show(config = dict(displayModeBar = show_display_modebar))
+
+        return amount_cost_df, tot_amount
+
+    def total_amount_cost_plot(self, threshold_step = 0.01, amount_classes = None, cost_classes = None,
+                               title = 'Interactive Amount-Cost Line Chart', show_display_modebar = True):
+
+        """
+        Plots the total amount and cost of the session data for the selected confusion classes,
+        with its amounts, costs and currency (see plots.total_amount_cost_plot).
+        If amount_classes (cost_classes) is None, all the classes are plotted when the session has amounts (costs)
+        """
+        fig, amount_cost_df = \
+            plots.build_total_amount_cost_plot(self.true_y, self.predicted_proba, threshold_step = threshold_step,
+                                               amounts = self.amounts, cost_dict = self.cost_dict,
+                                               amount_classes = amount_classes, cost_classes = cost_classes,
+                                               currency = self.currency, title = title,
+                                               _sorted_predictions = self._get_sorted_predictions())
+        fig.show(config = dict(displayModeBar = show_display_modebar))
+
+        return amount_cost_df
+
+    def _get_sorted_predictions(self):
+        # Sort order, sorted predicted probabilities and labels of the session data, computed once
+        # and passed to the library functions, so that they don't sort the data again
+        if self._sorted_predictions is None:
+            self._sorted_predictions = _sort_validated_predictions(self.true_y, self.predicted_proba)
+        return self._sorted_predictions
+
+    def _get_band_sorted_predictions(self, confidence_level):
+        # Sorted predictions for the confidence bands of the curves (None without bands, which don't need them)
+        return None if confidence_level is None else self._get_sorted_predictions()
+
+    def _get_cum_pos(self):
+        # Cumulative counts of positives along the sorted predicted probabilities, computed once
+        if self._cum_pos is None:
+            self._cum_pos = _get_cum_pos(self._get_sorted_predictions()[2])
+        return self._cum_pos
+
+    def _get_result(self, name, compute, *key_values):
+        # Result computed once for the given name and key values, returned as a copy so that callers can modify it
+        try:
+            key = _get_fingerprint(name, key_values)
+        except TypeError: # key values that can't be hashed (results are not kept)
+            return compute()
+        if key not in self._results:
+            self._results[key] = compute()
+        return copy.deepcopy(self._results[key])
+
+def _get_read_only_array(array, dtype = None):
+    # Validated array that can't be modified (so that it is hashed only once by the cache):
+    # arrays that are read-only, own their data and have the given dtype are kept, the others are copied once
+    if (dtype is not None) and (array.dtype != dtype):
+        array = array.astype(dtype)
+    elif array.flags.writeable or (array.base is not None):
+        array = array.copy()
+    array.setflags(write = False)
+    return array
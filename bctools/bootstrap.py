@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import pandas as pd
+import numpy as np
+
+from .cache import _memoize
+from .confusion import CostModel, _sort_predictions, _get_cost_array
+from .validation import _get_values_array
+from .utilities import _safe_divide, _get_metrics_dep_on_threshold
+from .thresholds import _get_n_workers, _map_with_shared_arrays, shared_memory
+
+# maximum number of replicate weights (replicates x data points) drawn at once
+_CHUNK_SIZE = 2**22
+
+@_memoize(ignore = ['n_jobs', '_sorted_predictions'], seed_argument = 'random_state')
+def get_bootstrap_confidence_bands(true_y, predicted_proba, threshold_values = None, amounts = None, cost_dict = None,
+                                   n_bootstraps = 200, confidence_level = 0.95, method = 'poisson', n_curve_points = 101,
+                                   random_state = None, n_jobs = None, _sorted_predictions = None):
+
+    """
+    Computes bootstrap confidence bands of the invariant metrics (see utilities.get_invariant_metrics_df), of the ROC and PR curves
+    and, if threshold_values is given, of every threshold dependent metric, amount and cost.
+    Data are sorted once: each bootstrap replicate only draws a weight for every data point
+    (how many times it is resampled), then all the statistics of the replicate are computed from cumulative sums
+    of the weights along the sorted predicted probabilities, so that the cost of each replicate is linear in the
+    number of data, whatever the number of thresholds.
+    Bands are the percentile intervals of the replicates statistics
+
+    Parameters
+    ----------
+    true_y: sequence of ints (0 or 1)
+        True labels
+    predicted_proba: sequence of floats
+        predicted probabilities for class 1
+        (e.g. output from model.predict_proba(data)[:,1])
+    threshold_values: sequence of floats, default=None
+        list of classification thresholds below which prediction label is 0, 1 otherwise.
+        If None, only the invariant metrics and the curves are computed
+    amounts: sequence of floats, default=None
+        amounts associated to each element of data (requires threshold_values)
+    cost_dict: dict, default=None
+        dict containing costs associated to each class (TN, FP, FN, TP) (output from get_cost_dict, requires threshold_values)
+    n_bootstraps: int, default=200
+        Number of bootstrap replicates
+    confidence_level: float, default=0.95
+        Confidence level of the bands, between 0 and 1
+    method: {'poisson', 'multinomial'}, default='poisson'
+        Resampling weights of the replicates:
+        'multinomial' is the classical bootstrap (n data points drawn with replacement),
+        'poisson' draws an independent Poisson(1) weight for every data point, which is asymptotically equivalent
+    n_curve_points: int, default=101
+        Number of evenly spaced false positive rates (ROC curve) and recalls (PR curve) on which the curves bands are computed
+    random_state: int, default=None
+        Controls the randomness of the bootstrap. Every replicate has its own random generator,
+        derived from random_state, so that results only depend on the data, on the parameters and on random_state
+        (and not on n_jobs)
+    n_jobs: int, default=None
+        Number of worker processes the replicates are distributed to (None or 1: no parallelism, -1: all CPUs)
+
+    Returns
+    ----------
+    bands: dict
+        pandas dataframes with keys:
+        - "invariant_metrics": invariant_metric, value, lower, upper
+        - "ROC": false_positive_rate, true_positive_rate, lower, upper
+        - "PR": recall, precision, lower, upper
+        - if threshold_values is given, "metrics_dep_on_threshold": threshold and, for every metric of
+          get_metrics_dep_on_threshold_df, its value and its bounds (e.g. f1_score, f1_score_lower, f1_score_upper)
+        - if amounts or cost_dict are given, "amount_cost": threshold and, for every variable of get_amount_cost_df,
+          its value and its bounds (e.g. amount_TP, amount_TP_lower, amount_TP_upper)
+    """
+
+    if method not in ['poisson', 'multinomial']:
+        raise ValueError("method must be either 'poisson' or 'multinomial'")
+    if not 0 < confidence_level < 1:
+        raise ValueError("confidence_level must be between 0 and 1")
+    if n_bootstraps < 1:
+        raise ValueError("n_bootstraps must be a positive integer")
+    if (threshold_values is None) and ((amounts is not None) or (cost_dict is not None)):
+        raise TypeError("threshold_values must be given together with amounts or cost_dict")
+
+    order, sorted_proba, sorted_pos = _sort_predictions(true_y, predicted_proba, _sorted_predictions)
+    arrays = _get_bootstrap_arrays(order, sorted_proba, sorted_pos, threshold_values, amounts, cost_dict)
+    n_data = len(sorted_proba)
+
+    # replicates are processed in chunks, each replicate with its own seed
+    replicates_seeds = np.random.SeedSequence(random_state).spawn(n_bootstraps)
+    chunk_size = max(_CHUNK_SIZE // max(n_data, 1), 1)
+    tasks_args = [(replicates_seeds[i:i + chunk_size], method, n_curve_points) for i in range(0, n_bootstraps, chunk_size)]
+    n_workers = _get_n_workers(n_jobs)
+
+    if (n_workers > 1) and (len(tasks_args) > 1) and (shared_memory is not None):
+        chunks_statistics = _map_with_shared_arrays(_get_replicates_statistics, arrays, tasks_args, n_workers)
+    else:
+        chunks_statistics = [_get_replicates_statistics(arrays, *args) for args in tasks_args]
+
+    replicates_statistics = {key: np.concatenate([statistics[key] for statistics in chunks_statistics])
+                             for key in chunks_statistics[0]}
+
+    # statistics of the data themselves (unit weights)
+    statistics = _get_group_statistics(_get_group_cum_sums(arrays, np.ones((1, n_data))), arrays, n_curve_points)
+
+    # percentile intervals
+    quantiles = [(1 - confidence_level) / 2, (1 + confidence_level) / 2]
+    bounds = {key: np.nanquantile(values, quantiles, axis = 0) for key, values in replicates_statistics.items()}
+
+    invariant_metrics = ['roc_auc', 'pr_auc', 'brier_score', 'log_loss', 'calibration_error']
+    bands = {'invariant_metrics': pd.DataFrame({'invariant_metric': invariant_metrics,
+                                                'value': [statistics[key][0] for key in invariant_metrics],
+                                                'lower': [bounds[key][0] for key in invariant_metrics],
+                                                'upper': [bounds[key][1] for key in invariant_metrics]}).round(4)}
+
+    curve_x = np.linspace(0, 1, n_curve_points)
+    for curve, x_name, y_name in [('ROC', 'false_positive_rate', 'true_positive_rate'), ('PR', 'recall', 'precision')]:
+        bands[curve] = pd.DataFrame({x_name: curve_x, y_name: statistics[curve][0],
+                                     'lower': bounds[curve][0], 'upper': bounds[curve][1]})
+
+    if threshold_values is not None:
+        metrics_names = list(_get_metrics_dep_on_threshold(0, 0, 0, 0))
+        bands['metrics_dep_on_threshold'] = _get_bands_df(threshold_values, metrics_names, statistics, bounds).round(4)
+
+        amount_cost_names = [key for key in ['amount_TN', 'amount_FP', 'amount_FN', 'amount_TP',
+                                             'cost_TN', 'cost_FP', 'cost_FN', 'cost_TP', 'total_cost'] if key in statistics]
+        if amount_cost_names:
+            bands['amount_cost'] = _get_bands_df(threshold_values, amount_cost_names,
+                                                 statistics, bounds).sort_values(by = 'threshold')
+
+    return bands
+
+def _get_bootstrap_arrays(order, sorted_proba, sorted_pos, threshold_values, amounts, cost_dict):
+    # Data shared by all the replicates: groups of tied predicted probabilities (replicates statistics only depend
+    # on the sums of the weights of each group), index of the first group above each threshold
+    # and per-row values summed over the weights of the replicates (counts, amounts and per-row costs of each class)
+    group_starts = np.flatnonzero(np.r_[True, sorted_proba[1:] != sorted_proba[:-1]]) if len(sorted_proba) else np.zeros(0, dtype = np.int64)
+    group_proba = sorted_proba[group_starts]
+
+    arrays = {'group_starts': group_starts,
+              'group_proba': group_proba,
+              'values_neg': (~sorted_pos).astype(float),
+              'values_pos': sorted_pos.astype(float)}
+
+    if threshold_values is not None:
+        thresholds = np.atleast_1d(np.asarray(threshold_values, dtype = float))
+        arrays['threshold_groups'] = np.searchsorted(group_proba, thresholds, side = 'left')
+
+    if amounts is not None:
+        sorted_amounts = _get_values_array(amounts, 'amounts', len(order))[order]
+        arrays['amount_neg'] = np.where(sorted_pos, 0., sorted_amounts)
+        arrays['amount_pos'] = np.where(sorted_pos, sorted_amounts, 0.)
+
+    if cost_dict is not None:
+        cost_model = CostModel.from_cost_dict(cost_dict, n_data = len(order))
+        for confusion_class, is_pos in [('TN', False), ('FP', False), ('FN', True), ('TP', True)]:
+            cost = cost_model[confusion_class]
+            if hasattr(cost, '__iter__'):
+                sorted_cost = _get_cost_array(cost)[order]
+                arrays['cost_' + confusion_class] = np.where(sorted_pos == is_pos, sorted_cost, 0.)
+            else:
+                arrays['scalar_cost_' + confusion_class] = np.array([float(cost)])
+
+    return arrays
+
+def _get_replicates_statistics(arrays, seeds, method, n_curve_points):
+    # Draws the weights of the replicates of the given seeds and computes their statistics
+    n_data = len(arrays['values_pos'])
+    weights = np.empty((len(seeds), n_data))
+
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        if method == 'poisson':
+            weights[i] = rng.poisson(1., n_data)
+        else:
+            weights[i] = np.bincount(rng.integers(0, n_data, n_data), minlength = n_data)
+
+    return _get_group_statistics(_get_group_cum_sums(arrays, weights), arrays, n_curve_points)
+
+def _get_group_cum_sums(arrays, weights):
+    # Cumulative sums of the weighted per-row values at the end of each group of tied predicted probabilities,
+    # starting from 0, with shape (replicates, groups + 1) for each kind of values
+    # (cumulative sums of the negatives are the ones of the weights minus the ones of the positives)
+    group_ends = np.r_[0, arrays['group_starts'][1:], len(arrays['values_pos'])]
+    cum_sums = {}
+    for key in ['values_pos', 'amount_neg', 'amount_pos', 'cost_TN', 'cost_FP', 'cost_FN', 'cost_TP', 'weights']:
+        if (key in arrays) or (key == 'weights'):
+            cum_sum = np.zeros((len(weights), weights.shape[1] + 1))
+            np.cumsum(weights if key == 'weights' else weights * arrays[key], axis = 1, out = cum_sum[:, 1:])
+            cum_sums[key] = cum_sum if len(group_ends) == cum_sum.shape[1] else cum_sum[:, group_ends]
+    cum_sums['values_neg'] = cum_sums.pop('weights') - cum_sums['values_pos']
+    return cum_sums
+
+def _get_group_statistics(cum_sums, arrays, n_curve_points):
+    # Statistics of each replicate from its cumulative sums: confusion counts, metrics, amounts and costs for each threshold,
+    # invariant metrics and curves sampled on n_curve_points evenly spaced false positive rates and recalls
+    cum_neg, cum_pos = cum_sums['values_neg'], cum_sums['values_pos']
+    neg, pos = np.diff(cum_neg, axis = 1), np.diff(cum_pos, axis = 1)
+    n_neg, n_pos = cum_neg[:, -1:], cum_pos[:, -1:]
+    group_proba = arrays['group_proba']
+
+    # Mann-Whitney statistic (ties count one half), average precision (sum of the precisions at each positive),
+    # Brier score and log-loss, each predicted probability being the same in a group
+    statistics = {'roc_auc': _safe_divide(np.sum(pos * (cum_neg[:, :-1] + neg / 2), axis = 1),
+                                          n_pos[:, 0] * n_neg[:, 0], np.nan)}
+
+    # positives and negatives predicted positive at the threshold of each group (and above the highest one)
+    TP_curve, FP_curve = n_pos - cum_pos, n_neg - cum_neg
+    precision_curve = _safe_divide(TP_curve, TP_curve + FP_curve, 1)
+    statistics['pr_auc'] = _safe_divide(np.sum(pos * precision_curve[:, :-1], axis = 1), n_pos[:, 0], np.nan)
+    statistics['brier_score'] = _safe_divide(np.sum(neg * group_proba**2 + pos * (1 - group_proba)**2, axis = 1),
+                                             n_pos[:, 0] + n_neg[:, 0], np.nan)
+    clipped_proba = np.clip(group_proba, np.finfo(float).eps, 1 - np.finfo(float).eps)
+    statistics['log_loss'] = _safe_divide(-np.sum(neg * np.log(1 - clipped_proba) + pos * np.log(clipped_proba), axis = 1),
+                                          n_pos[:, 0] + n_neg[:, 0], np.nan)
+    
+    # calibration error on the uniform bins of utilities.get_invariant_metrics_df, whose groups are contiguous
+    bins_bounds = np.r_[0, np.searchsorted(group_proba, np.linspace(0, 1, 11)[1:-1], side = 'right'), len(group_proba)]
+    cum_proba = np.zeros_like(cum_pos)
+    np.cumsum((neg + pos) * group_proba, axis = 1, out = cum_proba[:, 1:])
+    statistics['calibration_error'] = _safe_divide(np.sum(np.abs(np.diff(cum_pos[:, bins_bounds] - cum_proba[:, bins_bounds], 
+                                                                         axis = 1)), axis = 1),
+                                                   n_pos[:, 0] + n_neg[:, 0], np.nan)
+
+    # curves from the highest threshold, so that rates are non-decreasing
+    # (the ROC curve is interpolated on the counts, then scaled to rates)
+    curve_x = np.linspace(0, 1, n_curve_points)
+    statistics['ROC'] = np.array([_interp_last_below(curve_x * N, FP, TP) / max(P, 1) 
+                                  for N, P, FP, TP in zip(n_neg[:, 0], n_pos[:, 0], FP_curve[:, ::-1], TP_curve[:, ::-1])])
+    statistics['PR'] = np.array([_interp_last_below(curve_x * P, TP, precision)
+                                 for P, TP, precision in zip(n_pos[:, 0], TP_curve[:, ::-1], precision_curve[:, ::-1])])
+
+    if 'threshold_groups' not in arrays:
+        return statistics
+
+    # sums below each threshold are the cumulative sums at its group, sums above are the remaining ones
+    # (exactly 0 when empty)
+    threshold_groups = arrays['threshold_groups']
+    below_above = {key: (cum[:, threshold_groups], cum[:, -1:] - cum[:, threshold_groups]) for key, cum in cum_sums.items()}
+    
+    counts = dict(zip(['TN', 'FP'], below_above['values_neg']), **dict(zip(['FN', 'TP'], below_above['values_pos'])))
+    statistics.update(_get_metrics_dep_on_threshold(counts['TN'], counts['FP'], counts['FN'], counts['TP']))
+
+    if 'amount_neg' in cum_sums:
+        statistics['amount_TN'], statistics['amount_FP'] = below_above['amount_neg']
+        statistics['amount_FN'], statistics['amount_TP'] = below_above['amount_pos']
+
+    costs = []
+    for confusion_class, is_above in [('TN', False), ('FP', True), ('FN', False), ('TP', True)]:
+        if 'cost_' + confusion_class in cum_sums:
+            costs.append(below_above['cost_' + confusion_class][int(is_above)])
+        elif 'scalar_cost_' + confusion_class in arrays:
+            costs.append(counts[confusion_class] * arrays['scalar_cost_' + confusion_class][0])
+
+    if costs:
+        for confusion_class, cost in zip(['TN', 'FP', 'FN', 'TP'], costs):
+            statistics['cost_' + confusion_class] = cost
+        statistics['total_cost'] = sum(costs)
+
+    return statistics
+
+def _interp_last_below(x, xp, fp):
+    # Piecewise linear interpolation of the curve (xp, fp), with xp non-decreasing:
+    # on vertical segments (repeated values of xp) the last point is taken
+    index = (np.searchsorted(xp, x, side = 'right') - 1).clip(0, len(xp) - 1)
+    next_index = np.minimum(index + 1, len(xp) - 1)
+    dx = xp[next_index] - xp[index]
+    slope = _safe_divide(fp[next_index] - fp[index], dx, 0)
+    return fp[index] + slope * np.clip(x - xp[index], 0, None)
+
+def _get_bands_df(threshold_values, names, statistics, bounds):
+    # Dataframe with the threshold, the value of each statistic and its bounds
+    bands_df = pd.DataFrame({'threshold': np.atleast_1d(np.asarray(threshold_values, dtype = float))})
+    for name in names:
+        bands_df[name] = statistics[name][0]
+        bands_df[name + '_lower'] = bounds[name][0]
+        bands_df[name + '_upper'] = bounds[name][1]
+    return bands_df
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import copy
+import pickle
+import hashlib
+import inspect
+import weakref
+import functools
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import pandas as pd
+import numpy as np
+
+from .validation import _get_numpy_array
+
+# memoized results, from the least to the most recently used (see _memoize)
+_cache = OrderedDict()
+_cache_sizes = {}
+_cache_options = {'enabled': False, 'max_memory': 512 * 2**20, 'cache_dir': None}
+_cache_stats = {'hits': 0, 'misses': 0, 'memory': 0}
+
+# digests of read-only arrays owning their data, by id, so that they are hashed only once (see _update_fingerprint)
+_array_digests = {}
+
+# changes whenever cached results of the same inputs may change, so that old files on disk are not used
+_CACHE_VERSION = 1
+
+def set_cache_options(enabled = False, max_memory = 512 * 2**20, cache_dir = None):
+
+    """
+    Sets the options of the cache shared by the functions and plots of the library.
+    The cache is disabled by default. Once enabled, results of the expensive computations (confusion grids, 
+    amount and cost dataframes, invariant metrics, GHOST optimizations, bootstrap confidence bands) are memoized, 
+    keyed on a hash of the content of the input arrays and on the other parameters,
+    so that repeated or follow-up calls on the same data reuse them.
+    GHOST optimizations and bootstrap bands are memoized only if their random state is given
+
+    Parameters
+    ----------
+    enabled: bool, default=False
+        If True, results are memoized and read from the cache; if False, they are neither memoized nor read
+    max_memory: int, default=512 * 2**20
+        maximum size in bytes of the results kept in memory; the least recently used results are evicted first
+    cache_dir: str, default=None
+        If given, results are also saved as pickle files in this directory (created if needed)
+        and read from it when they are not in memory, so that they survive the restart of the session
+    """
+    _cache_options['enabled'] = enabled
+    _cache_options['max_memory'] = max_memory
+    _cache_options['cache_dir'] = cache_dir
+    _evict()
+
+def clear_cache(disk = False):
+
+    """
+    Removes all the memoized results from memory
+
+    Parameters
+    ----------
+    disk: bool, default=False
+        If True, also removes the files saved by the cache in the cache_dir set by set_cache_options
+    """
+    _cache.clear()
+    _cache_sizes.clear()
+    _cache_stats.update(hits = 0, misses = 0, memory = 0)
+
+    cache_dir = _cache_options['cache_dir']
+    if disk and (cache_dir is not None) and os.path.isdir(cache_dir):
+        for file_name in os.listdir(cache_dir):
+            if file_name.startswith('bctools_') and file_name.endswith('.pkl'):
+                os.remove(os.path.join(cache_dir, file_name))
+
+def get_cache_info():
+
+    """
+    Returns
+    ----------
+    cache_info: dict
+        number of results in memory (n_results), their size in bytes (memory), number of hits and misses
+        since the last clear_cache, and the options set by set_cache_options
+    """
+    return dict(n_results = len(_cache), **_cache_stats, **_cache_options)
+
+def _memoize(ignore = (), seed_argument = None):
+    # Decorator memoizing a function on a fingerprint of its name and of all its arguments but the ignored ones
+    # (e.g. n_jobs). Calls whose seed_argument is None (random results) or with arguments that can not be
+    # fingerprinted (e.g. a ConfusionAccumulator) are not memoized. Copies of the results are returned,
+    # so that callers can modify them
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def memoized_function(*args, **kwargs):
+            if not _cache_options['enabled']:
+                return function(*args, **kwargs)
+
+            bound_arguments = signature.bind(*args, **kwargs)
+            bound_arguments.apply_defaults()
+            if (seed_argument is not None) and (bound_arguments.arguments[seed_argument] is None):
+                return function(*args, **kwargs)
+
+            try:
+                key = _get_fingerprint(f"{_CACHE_VERSION} {function.__module__}.{function.__qualname__}",
+                                       {name: value for name, value in bound_arguments.arguments.items() if name not in ignore})
+            except TypeError:
+                return function(*args, **kwargs)
+
+            found, result = _get_cached_result(key)
+            if not found:
+                result = function(*args, **kwargs)
+                _set_cached_result(key, result)
+
+            return copy.deepcopy(result)
+
+        return memoized_function
+
+    return decorator
+
+def _get_fingerprint(*values):
+    # Hexadecimal digest of the content of values, raising TypeError if a value is not supported
+    hasher = hashlib.blake2b(digest_size = 16)
+    for value in values:
+        _update_fingerprint(hasher, value)
+    return hasher.hexdigest()
+
+def _update_fingerprint(hasher, value):
+    # Feeds the hasher with the type and the content of value, raising TypeError if value is not supported
+    if isinstance(value, (pd.Series, pd.Index)) or (type(value).__module__.split('.')[0] == 'pyarrow'):
+        value = _get_numpy_array(value)
+    elif isinstance(value, (list, tuple)):
+        try:
+            array = np.asarray(value)
+        except ValueError: # ragged sequences
+            array = None
+        if (array is not None) and (array.dtype != object):
+            value = array
+        else:
+            hasher.update(f"{type(value).__name__} {len(value)}".encode())
+            for item in value:
+                _update_fingerprint(hasher, item)
+            return
+
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            raise TypeError("object arrays can not be fingerprinted")
+        hasher.update(f"array {value.dtype.str} {value.shape}".encode())
+        hasher.update(_get_array_digest(value))
+    elif isinstance(value, Mapping): # dicts and cost models
+        hasher.update(f"dict {len(value)}".encode())
+        for key in sorted(value, key = str):
+            _update_fingerprint(hasher, key)
+            _update_fingerprint(hasher, value[key])
+    elif (value is None) or isinstance(value, (bool, int, float, str, np.number, np.bool_)):
+        hasher.update(f"{type(value).__name__} {value!r}".encode())
+    else:
+        raise TypeError(f"{type(value).__name__} can not be fingerprinted")
+
+def _get_array_digest(array):
+    # Digest of the content of an array; arrays that can not change (read-only and owning their data,
+    # as those of ThresholdAnalysis) are hashed only once
+    if array.flags.writeable or (array.base is not None):
+        return hashlib.blake2b(np.ascontiguousarray(array).reshape(-1).view(np.uint8), digest_size = 16).digest()
+
+    array_id = id(array)
+    if (array_id in _array_digests) and (_array_digests[array_id][0]() is array):
+        return _array_digests[array_id][1]
+
+    digest = hashlib.blake2b(np.ascontiguousarray(array).reshape(-1).view(np.uint8), digest_size = 16).digest()
+    _array_digests[array_id] = (weakref.ref(array, lambda _: _array_digests.pop(array_id, None)), digest)
+    return digest
+
+def _get_cached_result(key):
+    # Result saved with key in memory or in the cache directory, as (found, result)
+    if key in _cache:
+        _cache.move_to_end(key)
+        _cache_stats['hits'] += 1
+        return True, _cache[key]
+
+    file_path = _get_cache_file_path(key)
+    if (file_path is not None) and os.path.isfile(file_path):
+        with open(file_path, 'rb') as cache_file:
+            result = pickle.load(cache_file)
+        _set_cached_result(key, result, save = False)
+        _cache_stats['hits'] += 1
+        return True, result
+
+    _cache_stats['misses'] += 1
+    return False, None
+
+def _set_cached_result(key, result, save = True):
+    # Keeps the result in memory (unless it exceeds max_memory on its own) and saves it in the cache directory
+    size = _get_size(result)
+    if (size <= _cache_options['max_memory']) and (key not in _cache):
+        _cache[key] = result
+        _cache_sizes[key] = size
+        _cache_stats['memory'] += size
+        _evict()
+
+    file_path = _get_cache_file_path(key)
+    if save and (file_path is not None):
+        os.makedirs(_cache_options['cache_dir'], exist_ok = True)
+        # written to a temporary file and renamed, so that an interrupted write leaves no partial file
+        with open(file_path + '.tmp', 'wb') as cache_file:
+            pickle.dump(result, cache_file, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(file_path + '.tmp', file_path)
+
+def _evict():
+    # Removes the least recently used results until their total size fits max_memory
+    while _cache and (_cache_stats['memory'] > _cache_options['max_memory']):
+        key, _ = _cache.popitem(last = False)
+        _cache_stats['memory'] -= _cache_sizes.pop(key)
+
+def _get_cache_file_path(key):
+    # Path of the file of the result saved with key, None if results are not saved on disk
+    if _cache_options['cache_dir'] is None:
+        return None
+    return os.path.join(_cache_options['cache_dir'], f"bctools_{key}.pkl")
+
+def _get_size(value):
+    # Approximate size in bytes of a result (arrays, dataframes and containers of them)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep = True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep = True))
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_get_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_get_size(item) for item in value.values())
+    return sys.getsizeof(value)
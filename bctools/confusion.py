@@ -0,0 +1,1525 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+from collections.abc import Mapping
+
+import pandas as pd
+import numpy as np
+
+try:
+    import pyarrow.parquet as pq
+except ImportError: # Parquet feature tables are not supported
+    pq = None
+
+from .cache import _memoize
+from .validation import _get_labels_array, _get_values_array, _get_labels_scores_arrays
+
+_BINS_CHUNK_SIZE = 2**20
+
+@_memoize(ignore = ['_sorted_predictions'])
+def get_confusion_counts(true_y, predicted_proba, threshold_values, _sorted_predictions = None):
+
+    """
+    Computes confusion matrix counts (TN, FP, FN, TP) for every given threshold.
+    Predicted probabilities are sorted once and cumulative counts of positives are used,
+    so that all thresholds are evaluated in O(n log n + k log n) instead of O(n * k)
+
+    Parameters
+    ----------
+    true_y: sequence of ints (0 or 1)
+        True labels
+    predicted_proba: sequence of floats
+        predicted probabilities for class 1
+        (e.g. output from model.predict_proba(data)[:,1])
+    threshold_values: float or sequence of floats
+        classification thresholds below which prediction label is 0, 1 otherwise
+
+    Returns
+    ----------
+    TN, FP, FN, TP: np.arrays of ints
+        counts of each confusion class, one element for each threshold (in the given order)
+    """
+    order, sorted_proba, sorted_pos = _sort_predictions(true_y, predicted_proba, _sorted_predictions)
+    n_below = _get_n_below(sorted_proba, threshold_values)
+
+    return _get_counts_from_sorted(sorted_pos, n_below)
+
+@_memoize(ignore = ['_sorted_predictions'])
+def get_confusion_amounts(true_y, predicted_proba, threshold_values, amounts, _sorted_predictions = None):
+
+    """
+    Computes the total amount of each confusion class (TN, FP, FN, TP) for every given threshold,
+    using cumulative sums of the amounts along the sorted predicted probabilities
+
+    Parameters
+    ----------
+    true_y: sequence of ints (0 or 1)
+        True labels
+    predicted_proba: sequence of floats
+        predicted probabilities for class 1
+        (e.g. output from model.predict_proba(data)[:,1])
+    threshold_values: float or sequence of floats
+        classification thresholds below which prediction label is 0, 1 otherwise
+    amounts: sequence of floats
+        amounts associated to each element of data
+        (e.g. fraud detection: amount could be the associated order amount for each order)
+
+    Returns
+    ----------
+    TN, FP, FN, TP: np.arrays of floats
+        amounts of each confusion class, one element for each threshold (in the given order)
+    """
+    order, sorted_proba, sorted_pos = _sort_predictions(true_y, predicted_proba, _sorted_predictions)
+    n_below = _get_n_below(sorted_proba, threshold_values)
+
+    return _get_amounts_from_sorted(order, sorted_pos, n_below, amounts)
+
+@_memoize(ignore = ['_sorted_predictions'])
+def get_confusion_costs(true_y, predicted_proba, threshold_values, cost_dict, _sorted_predictions = None):
+
+    """
+    Computes the total cost of each confusion class (TN, FP, FN, TP) for every given threshold,
+    using cumulative sums of the per-row costs along the sorted predicted probabilities
+
+    Parameters
+    ----------
+    true_y: sequence of ints (0 or 1)
+        True labels
+    predicted_proba: sequence of floats
+        predicted probabilities for class 1
+        (e.g. output from model.predict_proba(data)[:,1])
+    threshold_values: float or sequence of floats
+        classification thresholds below which prediction label is 0, 1 otherwise
+    cost_dict: dict or CostModel
+        dict containing keys: "TN", "FP", "FN", "TP"
+        and values corresponding to lists (with coherent lenghts) and/or floats
+        (output from get_cost_dict)
+
+    Returns
+    ----------
+    TN, FP, FN, TP: np.arrays of floats
+        costs of each confusion class, one element for each threshold (in the given order)
+    """
+    order, sorted_proba, sorted_pos = _sort_predictions(true_y, predicted_proba, _sorted_predictions)
+    n_below = _get_n_below(sorted_proba, threshold_values)
+    cost_model = CostModel.from_cost_dict(cost_dict, n_data = len(order))
+
+    return _get_costs_from_sorted(order, sorted_pos, n_below, cost_model)
+
+def get_breakpoint_thresholds(predicted_proba, n_breakpoints = None):
+
+    """
+    Returns the thresholds at which the confusion matrix changes, i.e. the distinct values of predicted_proba
+    (a data point is predicted positive when its predicted proba is greater or equal to the threshold).
+    Screening these thresholds is equivalent to screening every possible threshold
+
+    Parameters
+    ----------
+    predicted_proba: sequence of floats
+        predicted probabilities for class 1
+        (e.g. output from model.predict_proba(data)[:,1])
+    n_breakpoints: int, default=None
+        If given, breakpoints are compressed to at most n_breakpoints values,
+        taken at evenly spaced quantiles of predicted_proba (recommended for very large datasets)
+
+    Returns
+    ----------
+    threshold_values: np.array of floats
+        distinct values of predicted_proba (or of its quantiles), in ascending order
+    """
+    sorted_proba = np.sort(_get_values_array(predicted_proba))
+
+    return _get_breakpoints_from_sorted(sorted_proba, n_breakpoints)
+
+def _sort_predictions(true_y, predicted_proba, sorted_predictions = None):
+
+    """
+    Sorts predicted probabilities in ascending order, together with the true labels
+
+    Parameters
+    ----------
+    true_y: sequence of ints (0 or 1)
+        True labels
+    predicted_proba: sequence of floats
+        predicted probabilities for class 1
+    sorted_predictions: tuple of np.arrays, default=None
+        If given, the sorted predictions of the same data (e.g. kept by a ThresholdAnalysis session),
+        returned after the validation of the inputs instead of sorting them again
+
+    Returns
+    ----------
+    order: np.array of ints
+        indices that sort predicted_proba (stable sort)
+    sorted_proba: np.array of floats
+        predicted probabilities sorted in ascending order
+    sorted_pos: np.array of bools
+        True where the label of the sorted data point is 1
+    """
+    true_y_array, predicted_proba_array = _get_labels_scores_arrays(true_y, predicted_proba)
+    if sorted_predictions is not None:
+        return sorted_predictions
+
+    return _sort_validated_predictions(true_y_array, predicted_proba_array)
+
+def _sort_validated_predictions(true_y_array, predicted_proba_array):
+    # Sort order, sorted predicted probabilities and labels (as bools) of validated arrays (see _sort_predictions)
+    order = np.argsort(predicted_proba_array, kind = 'mergesort')
+
+    return order, predicted_proba_array[order], true_y_array[order].view(bool)
+
+def _get_breakpoints_from_sorted(sorted_proba, n_breakpoints = None):
+    # Distinct values of the sorted predicted probabilities; if n_breakpoints is given, only the values
+    # at n_breakpoints evenly spaced quantiles (inverted cdf, so that they are still actual breakpoints)
+    if n_breakpoints is not None:
+        if n_breakpoints < 1:
+            raise ValueError("n_breakpoints must be a positive integer")
+        if len(sorted_proba) > n_breakpoints:
+            sorted_proba = sorted_proba[np.linspace(0, len(sorted_proba) - 1, int(n_breakpoints)).round().astype(np.int64)]
+
+    return np.unique(sorted_proba)
+
+def _resolve_threshold_values(threshold_values, sorted_proba, n_breakpoints = None):
+    # 'exact' is replaced by the breakpoints of the sorted predicted probabilities
+    if isinstance(threshold_values, str):
+        if threshold_values != 'exact':
+            raise ValueError(f"threshold_values must be a sequence of floats or 'exact', got '{threshold_values}'")
+        return _get_breakpoints_from_sorted(sorted_proba, n_breakpoints)
+    return threshold_values
+
+def _get_n_below(sorted_proba, threshold_values):
+    # Number of data points predicted negative (predicted proba < threshold) for each threshold
+    thresholds = np.atleast_1d(np.asarray(threshold_values, dtype = float))
+    return np.searchsorted(sorted_proba, thresholds, side = 'left')
+
+def _get_counts_from_sorted(sorted_pos, n_below):
+    # Computes TN, FP, FN, TP arrays from the sorted labels:
+    # data points below a threshold (predicted negatives) are the first n_below sorted elements
+    return _get_counts_from_cum_pos(_get_cum_pos(sorted_pos), n_below)
+
+def _get_cum_pos(sorted_pos):
+    # Number of positives among the first i sorted data points, for i from 0 to the number of data points
+    # (int32 while it fits, int64 for more than 2**31 - 1 data points)
+    cum_pos = np.zeros(len(sorted_pos) + 1, dtype = _get_count_dtype(len(sorted_pos)))
+    np.cumsum(sorted_pos, out = cum_pos[1:])
+    return cum_pos
+
+def _get_count_dtype(n_data):
+    # Smallest signed integer dtype (int32 or int64) that can count up to n_data
+    return np.int32 if n_data <= np.iinfo(np.int32).max else np.int64
+
+def _get_counts_from_cum_pos(cum_pos, n_below):
+    # Computes TN, FP, FN, TP arrays from the cumulative counts of positives along the sorted labels
+    # (always as int64, whatever the dtype of the cumulative counts)
+    n_pos = int(cum_pos[-1])
+    n_neg = len(cum_pos) - 1 - n_pos
+
+    FN = cum_pos[n_below].astype(np.int64)
+    TN = n_below - FN
+    FP = n_neg - TN
+    TP = n_pos - FN
+
+    return TN, FP, FN, TP
+
+def _get_amounts_from_sorted(order, sorted_pos, n_below, amounts):
+    # Computes TN, FP, FN, TP amount arrays from the sorted labels and the amounts:
+    # amounts are summed over the sorted data points of each class, like per-row costs
+    amounts_array = _get_values_array(amounts, 'amounts', len(order))
+    TN_count, _, FN_count, _ = _get_counts_from_sorted(sorted_pos, n_below)
+
+    TN, FP = _get_below_above_sums(amounts_array[order[~sorted_pos]], TN_count)
+    FN, TP = _get_below_above_sums(amounts_array[order[sorted_pos]], FN_count)
+
+    return TN, FP, FN, TP
+
+def _get_costs_from_sorted(order, sorted_pos, n_below, cost_dict):
+    # Computes TN, FP, FN, TP cost arrays from the sorted labels and cost_dict:
+    # scalar costs multiply the class counts, per-row costs are summed over the sorted data points of their class
+    counts = dict(zip(['TN', 'FP', 'FN', 'TP'], _get_counts_from_sorted(sorted_pos, n_below)))
+    class_orders = {}
+    costs = {}
+
+    for confusion_class, is_pos, is_above, below_class in [('TN', False, False, 'TN'), ('FP', False, True, 'TN'),
+                                                           ('FN', True, False, 'FN'), ('TP', True, True, 'FN')]:
+        cost = cost_dict[confusion_class]
+
+        if hasattr(cost, '__iter__'):
+            if is_pos not in class_orders:
+                class_orders[is_pos] = order[sorted_pos == is_pos]
+            cost_array = _get_cost_array(cost)
+            if len(cost_array) != len(order):
+                raise ValueError(f"costs of {confusion_class} must have one element for each data point "
+                                 f"({len(order)}), got {len(cost_array)}")
+            # data points of the class below each threshold are the first ones of the class
+            sorted_cost = cost_array[class_orders[is_pos]]
+            costs[confusion_class] = _get_below_above_sums(sorted_cost, counts[below_class])[int(is_above)]
+        else:
+            costs[confusion_class] = counts[confusion_class] * float(cost)
+
+    return costs['TN'], costs['FP'], costs['FN'], costs['TP']
+
+def _get_cost_array(cost):
+    # Per-row costs as a 1d float array, without copies of float64 or float32 arrays (e.g. those of a CostModel)
+    cost_array = np.ravel(np.asarray(cost))
+    if cost_array.dtype not in (np.float64, np.float32):
+        cost_array = cost_array.astype(float)
+    return cost_array
+
+def _get_below_above_sums(sorted_values, n_below):
+    # Sums of the first n_below sorted values and of the remaining ones, for each element of n_below.
+    # Values are summed (in float64) between consecutive distinct n_below, so that memory is proportional
+    # to the number of thresholds; sums above are accumulated from the end, so that empty sums are exactly 0
+    n_below = np.asarray(n_below)
+    n_values = len(sorted_values)
+    starts = np.unique(np.concatenate(([0], np.ravel(n_below))))
+    starts = starts[starts < n_values]
+
+    segment_sums = np.add.reduceat(sorted_values, starts, dtype = float) if len(starts) else np.zeros(0)
+    cum_below = np.concatenate(([0.], np.cumsum(segment_sums)))
+    cum_above = np.concatenate((np.cumsum(segment_sums[::-1])[::-1], [0.]))
+
+    # position of each n_below among the segment starts (n_values is after the last segment)
+    positions = np.searchsorted(np.append(starts, n_values), n_below)
+
+    return cum_below[positions], cum_above[positions]
+
+def _get_threshold_bins(predicted_proba, sorted_thresholds):
+    # Bin of each data point, i.e. number of (ascending) thresholds lower or equal to its predicted proba:
+    # a data point is predicted negative for the j-th threshold if and only if its bin is <= j.
+    # Bins are uint16 up to 65535 thresholds (int64 otherwise) and are computed by chunks,
+    # so that no full-length int64 array is allocated
+    n_data = len(predicted_proba)
+    bins = np.empty(n_data, dtype = np.uint16 if len(sorted_thresholds) <= np.iinfo(np.uint16).max else np.int64)
+    for start in range(0, n_data, _BINS_CHUNK_SIZE):
+        bins[start:start + _BINS_CHUNK_SIZE] = np.searchsorted(sorted_thresholds, predicted_proba[start:start + _BINS_CHUNK_SIZE],
+                                                               side = 'right')
+    return bins
+
+def _get_class_histograms(bins, is_pos, n_bins, weights = None):
+    # Per-bin counts (or sums of weights) of negative and positive data points
+    if weights is None:
+        hist_neg = np.bincount(bins[~is_pos], minlength = n_bins)
+        hist_pos = np.bincount(bins[is_pos], minlength = n_bins)
+    else:
+        hist_neg = np.bincount(bins[~is_pos], weights = weights[~is_pos], minlength = n_bins)
+        hist_pos = np.bincount(bins[is_pos], weights = weights[is_pos], minlength = n_bins)
+    return hist_neg, hist_pos
+
+def _get_below_above_from_hist(hist):
+    # Sums of the histogram below (bins <= j) and above (bins > j) each threshold j, along the last axis.
+    # The sums above are accumulated from the end, so that empty sums are exactly 0
+    below = np.cumsum(hist, axis = -1)[..., :-1]
+    above = np.cumsum(hist[..., ::-1], axis = -1)[..., ::-1][..., 1:]
+    return below, above
+
+class CostModel(Mapping):
+
+    """
+    Costs associated to each confusion class (TN, FP, FN, TP), validated and converted once:
+    classes with a single cost are stored as floats, classes with a cost for each data point as contiguous
+    read-only NumPy arrays (float64, or float32 to halve their memory).
+    A cost model is a read-only mapping with keys "TN", "FP", "FN", "TP", so it can be passed wherever a cost_dict
+    is accepted: its arrays are used by every cost computation without further conversions
+    and are hashed only once by the cache
+
+    Parameters
+    ----------
+    TN: float or sequence of floats, default=0
+        cost associated to true negative predictions
+    FP: float or sequence of floats, default=0
+        cost associated to false positive predictions
+    FN: float or sequence of floats, default=0
+        cost associated to false negative predictions
+    TP: float or sequence of floats, default=0
+        cost associated to true positive predictions
+    n_data: int, default=None
+        number of data points, that per-row costs must match (if None, only their lengths are checked to be equal)
+    dtype: {'float64', 'float32'}, default='float64'
+        data type of the per-row costs
+
+    Attributes
+    ----------
+    n_data: int or None
+        number of data points of the per-row costs (None if all costs are floats)
+    dtype: np.dtype
+        data type of the per-row costs
+
+    Examples
+    ----------
+    >>> cost_model = CostModel(TN = 0, FP = 10, FN = amounts, TP = 1, n_data = len(amounts))
+    >>> cost_TN, cost_FP, cost_FN, cost_TP = cost_model.get_threshold_costs(true_y, predicted_proba, [0.3, 0.5])
+    >>> amount_cost_df = get_amount_cost_df(true_y, predicted_proba, [0.3, 0.5], cost_dict = cost_model)
+    """
+
+    def __init__(self, TN = 0, FP = 0, FN = 0, TP = 0, n_data = None, dtype = 'float64'):
+
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float64, np.float32):
+            raise ValueError("dtype must be 'float64' or 'float32'")
+
+        self.n_data = n_data
+        self._costs = {}
+
+        for confusion_class, cost in zip(['TN', 'FP', 'FN', 'TP'], [TN, FP, FN, TP]):
+            if hasattr(cost, '__iter__'):
+                # validated like amounts (numeric and finite), then copied once to an owned array of the model dtype
+                cost_array = np.array(_get_values_array(cost, f'costs of {confusion_class}'), dtype = self.dtype, order = 'C')
+                if len(cost_array) == 1: # same as a single cost (see get_cost_dict)
+                    cost = float(cost_array[0])
+                else:
+                    if self.n_data is None:
+                        self.n_data = len(cost_array)
+                    elif len(cost_array) != self.n_data:
+                        raise ValueError(f"costs of {confusion_class} must have one element for each data point "
+                                         f"({self.n_data}), got {len(cost_array)}")
+                    cost_array.setflags(write = False)
+                    cost = cost_array
+            self._costs[confusion_class] = cost if isinstance(cost, np.ndarray) else float(cost)
+
+    @classmethod
+    def from_cost_dict(cls, cost_dict, n_data = None, dtype = None):
+
+        """
+        Returns the cost model of a cost_dict (the cost model itself if it is already one, with the same dtype)
+
+        Parameters
+        ----------
+        cost_dict: dict or CostModel
+            dict containing keys: "TN", "FP", "FN", "TP"
+            and values corresponding to lists (with coherent lenghts) and/or floats
+            (output from get_cost_dict)
+        n_data: int, default=None
+            number of data points, that per-row costs must match
+        dtype: {'float64', 'float32'}, default=None
+            data type of the per-row costs (if None, the one of cost_dict if it is a CostModel, float64 otherwise)
+
+        Returns
+        ----------
+        cost_model: CostModel
+        """
+        if isinstance(cost_dict, CostModel) and (dtype is None or np.dtype(dtype) == cost_dict.dtype):
+            if (n_data is not None) and (cost_dict.n_data is not None) and (cost_dict.n_data != n_data):
+                raise ValueError(f"per-row costs must have one element for each data point ({n_data}), "
+                                 f"got {cost_dict.n_data}")
+            return cost_dict
+
+        if set(cost_dict) != {'TN', 'FP', 'FN', 'TP'}:
+            raise ValueError('cost_dict must have keys "TN", "FP", "FN", "TP" (see get_cost_dict)')
+
+        return cls(**{confusion_class: cost_dict[confusion_class] for confusion_class in ['TN', 'FP', 'FN', 'TP']},
+                   n_data = n_data, dtype = 'float64' if dtype is None else dtype)
+
+    def get_threshold_costs(self, true_y, predicted_proba, threshold_values):
+
+        """
+        Computes the total cost of each confusion class (TN, FP, FN, TP) for every given threshold
+        (see get_confusion_costs)
+
+        Parameters
+        ----------
+        true_y: sequence of ints (0 or 1)
+            True labels
+        predicted_proba: sequence of floats
+            predicted probabilities for class 1
+        threshold_values: float or sequence of floats
+            classification thresholds below which prediction label is 0, 1 otherwise
+
+        Returns
+        ----------
+        TN, FP, FN, TP: np.arrays of floats
+            costs of each confusion class, one element for each threshold (in the given order)
+        """
+        if (self.n_data is not None) and (len(true_y) != self.n_data):
+            raise ValueError(f"per-row costs must have one element for each data point ({len(true_y)}), "
+                             f"got {self.n_data}")
+
+        return get_confusion_costs(true_y, predicted_proba, threshold_values, self)
+
+    def __getitem__(self, confusion_class):
+        return self._costs[confusion_class]
+
+    def __iter__(self):
+        return iter(self._costs)
+
+    def __len__(self):
+        return len(self._costs)
+
+    def __repr__(self):
+        costs = [f"{confusion_class}={cost!r}" if not isinstance(cost, np.ndarray)
+                 else f"{confusion_class}=<{len(cost)} {cost.dtype} costs>" for confusion_class, cost in self._costs.items()]
+        return f"CostModel({', '.join(costs)})"
+
+class _ChunkedStatistics:
+    # Base class of the statistics accumulated chunk by chunk (subclasses implement update)
+
+    def update_from_chunks(self, chunks, true_y_column, predicted_proba_column,
+                           amounts_column = None, cost_columns = None):
+
+        """
+        Adds every chunk of an iterable of tables (e.g. pandas.read_csv with chunksize,
+        a generator of dataframes or pyarrow record batches from a Parquet file) to the accumulated statistics
+
+        Parameters
+        ----------
+        chunks: iterable
+            chunks of data whose columns can be selected by name (chunk[column_name])
+        true_y_column: str
+            name of the column containing true labels
+        predicted_proba_column: str
+            name of the column containing predicted probabilities for class 1
+        amounts_column: str, default=None
+            name of the column containing amounts
+        cost_columns: dict, default=None
+            dict containing keys: "TN", "FP", "FN", "TP"
+            and values corresponding to column names (str) and/or floats
+
+        Returns
+        ----------
+        self
+        """
+        for chunk in chunks:
+            amounts = None if amounts_column is None else np.asarray(chunk[amounts_column])
+            cost_dict = None
+            if cost_columns is not None:
+                cost_dict = {confusion_class: np.asarray(chunk[cost]) if isinstance(cost, str) else cost
+                             for confusion_class, cost in cost_columns.items()}
+            self.update(np.asarray(chunk[true_y_column]), np.asarray(chunk[predicted_proba_column]),
+                        amounts = amounts, cost_dict = cost_dict)
+
+        return self
+
+class ConfusionAccumulator(_ChunkedStatistics):
+
+    """
+    Accumulates confusion statistics (counts, amounts and costs of TN, FP, FN, TP for every threshold)
+    over chunks of data, so that datasets that don't fit in memory can be analyzed.
+    Only per-threshold-bin histograms are kept in memory: for each chunk, every data point is assigned to the
+    bin between two consecutive thresholds and counts, amounts and costs are added to the histograms of its class.
+
+    The accumulator can be passed in place of true_y (with predicted_proba=None) to confusion_matrix_plot,
+    confusion_linechart_plot, total_amount_cost_plot and get_invariant_metrics_df; get_amount_cost_df method 
+    returns the same dataframe as utilities.get_amount_cost_df.
+    Accumulators with the same thresholds, computed on separate partitions of the data, can be combined with merge
+    and serialized with to_dict/from_dict (or pickle)
+
+    Parameters
+    ----------
+    threshold_values: sequence of floats, default=None
+        classification thresholds below which prediction label is 0, 1 otherwise.
+        If None, thresholds range from 0 to 1 with step threshold_step (same thresholds used by plots)
+    threshold_step: float, default=0.01
+        step between each classification threshold, used only if threshold_values is None
+
+    Examples
+    ----------
+    >>> accumulator = ConfusionAccumulator(threshold_step = 0.01)
+    >>> for chunk in pd.read_csv('scores.csv', chunksize = 1000000):
+    ...     accumulator.update(chunk['label'], chunk['proba'], amounts = chunk['amount'])
+    >>> amount_cost_df = accumulator.get_amount_cost_df()
+    """
+
+    def __init__(self, threshold_values = None, threshold_step = 0.01):
+
+        if threshold_values is None:
+            threshold_values = np.arange(0, 1 + threshold_step, threshold_step)
+
+        self.threshold_values = np.atleast_1d(np.asarray(threshold_values, dtype = float))
+        self._thresh_order = np.argsort(self.threshold_values, kind = 'mergesort')
+        self._sorted_thresholds = self.threshold_values[self._thresh_order]
+        self._n_bins = len(self.threshold_values) + 1
+
+        self.n_data = 0
+        self.total_amount = None
+        self._hist_neg = np.zeros(self._n_bins, dtype = np.int64)
+        self._hist_pos = np.zeros(self._n_bins, dtype = np.int64)
+        self._amount_hists = None   # (hist_neg, hist_pos) of amounts
+        self._cost_hists = None     # dict of cost histograms, one for each confusion class
+        self._squared_error_sum = 0.
+        # observed range of predicted probabilities in each bin, for each class (used to bound auc errors)
+        self._proba_ranges = np.empty((2, 2, self._n_bins))
+        self._proba_ranges[:, 0] = np.inf
+        self._proba_ranges[:, 1] = -np.inf
+
+    @property
+    def has_amounts(self):
+        return self._amount_hists is not None
+
+    @property
+    def has_costs(self):
+        return self._cost_hists is not None
+
+    def update(self, true_y, predicted_proba, amounts = None, cost_dict = None):
+
+        """
+        Adds a chunk of data to the accumulated statistics.
+        Amounts and costs must be given either for every chunk or for none of them
+
+        Parameters
+        ----------
+        true_y: sequence of ints (0 or 1)
+            True labels of the chunk
+        predicted_proba: sequence of floats
+            predicted probabilities for class 1 of the chunk
+        amounts: sequence of floats, default=None
+            amounts associated to each element of the chunk
+        cost_dict: dict, default=None
+            dict containing keys: "TN", "FP", "FN", "TP"
+            and values corresponding to lists (with the length of the chunk) and/or floats
+            (output from get_cost_dict)
+
+        Returns
+        ----------
+        self: ConfusionAccumulator
+        """
+        true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
+        is_pos = true_y.view(bool)
+
+        if self.n_data > 0:
+            if (amounts is None) == self.has_amounts:
+                raise ValueError("amounts must be given for every chunk or for none of them")
+            if (cost_dict is None) == self.has_costs:
+                raise ValueError("cost_dict must be given for every chunk or for none of them")
+
+        # amounts and per-row costs are validated against the chunk before any statistic is updated
+        if amounts is not None:
+            amounts = _get_values_array(amounts, 'amounts', len(is_pos))
+        if cost_dict is not None:
+            cost_dict = CostModel.from_cost_dict(cost_dict, n_data = len(is_pos))
+
+        bins = _get_threshold_bins(predicted_proba, self._sorted_thresholds)
+
+        hist_neg, hist_pos = _get_class_histograms(bins, is_pos, self._n_bins)
+        self._hist_neg += hist_neg
+        self._hist_pos += hist_pos
+
+        if amounts is not None:
+            if self._amount_hists is None:
+                self._amount_hists = (np.zeros(self._n_bins), np.zeros(self._n_bins))
+                self.total_amount = 0.
+            amount_hist_neg, amount_hist_pos = _get_class_histograms(bins, is_pos, self._n_bins, weights = amounts)
+            self._amount_hists[0][:] += amount_hist_neg
+            self._amount_hists[1][:] += amount_hist_pos
+            self.total_amount += amounts.sum(dtype = float)
+
+        if cost_dict is not None:
+            if self._cost_hists is None:
+                self._cost_hists = {confusion_class: np.zeros(self._n_bins) for confusion_class in ['TN', 'FP', 'FN', 'TP']}
+            for confusion_class, class_pos in [('TN', False), ('FP', False), ('FN', True), ('TP', True)]:
+                cost = cost_dict[confusion_class]
+                if hasattr(cost, '__iter__'):
+                    cost = _get_cost_array(cost)
+                else:
+                    cost = np.full(len(bins), float(cost))
+                class_mask = is_pos == class_pos
+                self._cost_hists[confusion_class] += np.bincount(bins[class_mask], weights = cost[class_mask],
+                                                                 minlength = self._n_bins)
+
+        for class_index, class_mask in enumerate([~is_pos, is_pos]):
+            np.minimum.at(self._proba_ranges[class_index, 0], bins[class_mask], predicted_proba[class_mask])
+            np.maximum.at(self._proba_ranges[class_index, 1], bins[class_mask], predicted_proba[class_mask])
+
+        self._squared_error_sum += np.sum((predicted_proba - is_pos)**2, dtype = float)
+        self.n_data += len(bins)
+
+        return self
+
+    def merge(self, other):
+
+        """
+        Adds the statistics accumulated by another ConfusionAccumulator (e.g. computed on another partition
+        of the data, in another process or machine), with the same thresholds
+
+        Parameters
+        ----------
+        other: ConfusionAccumulator
+            accumulator to be merged
+
+        Returns
+        ----------
+        self: ConfusionAccumulator
+        """
+        if not np.array_equal(self.threshold_values, other.threshold_values):
+            raise ValueError("Only accumulators with the same threshold_values can be merged")
+
+        if (self.n_data > 0) and (other.n_data > 0):
+            if (self.has_amounts != other.has_amounts) or (self.has_costs != other.has_costs):
+                raise ValueError("Only accumulators with the same amounts and costs (given or not) can be merged")
+
+        self._hist_neg += other._hist_neg
+        self._hist_pos += other._hist_pos
+
+        if other.has_amounts:
+            if self._amount_hists is None:
+                self._amount_hists = (np.zeros(self._n_bins), np.zeros(self._n_bins))
+                self.total_amount = 0.
+            self._amount_hists[0][:] += other._amount_hists[0]
+            self._amount_hists[1][:] += other._amount_hists[1]
+            self.total_amount += other.total_amount
+
+        if other.has_costs:
+            if self._cost_hists is None:
+                self._cost_hists = {confusion_class: np.zeros(self._n_bins) for confusion_class in ['TN', 'FP', 'FN', 'TP']}
+            for confusion_class in self._cost_hists:
+                self._cost_hists[confusion_class] += other._cost_hists[confusion_class]
+
+        self._proba_ranges[:, 0] = np.minimum(self._proba_ranges[:, 0], other._proba_ranges[:, 0])
+        self._proba_ranges[:, 1] = np.maximum(self._proba_ranges[:, 1], other._proba_ranges[:, 1])
+        self._squared_error_sum += other._squared_error_sum
+        self.n_data += other.n_data
+
+        return self
+
+    def to_dict(self):
+
+        """
+        Returns the accumulated statistics as a dict of lists and floats (e.g. to be serialized with json)
+        that can be loaded with ConfusionAccumulator.from_dict
+        """
+        return {'threshold_values': self.threshold_values.tolist(),
+                'n_data': self.n_data,
+                'total_amount': self.total_amount,
+                'hist_neg': self._hist_neg.tolist(),
+                'hist_pos': self._hist_pos.tolist(),
+                'amount_hists': None if self._amount_hists is None else [hist.tolist() for hist in self._amount_hists],
+                'cost_hists': None if self._cost_hists is None else {confusion_class: hist.tolist()
+                                                                     for confusion_class, hist in self._cost_hists.items()},
+                'squared_error_sum': self._squared_error_sum,
+                'proba_ranges': self._proba_ranges.tolist()}
+
+    @classmethod
+    def from_dict(cls, accumulator_dict):
+
+        """
+        Creates a ConfusionAccumulator from the output of to_dict
+
+        Parameters
+        ----------
+        accumulator_dict: dict
+            output from ConfusionAccumulator.to_dict
+
+        Returns
+        ----------
+        accumulator: ConfusionAccumulator
+        """
+        accumulator = cls(threshold_values = accumulator_dict['threshold_values'])
+        accumulator.n_data = accumulator_dict['n_data']
+        accumulator.total_amount = accumulator_dict['total_amount']
+        accumulator._hist_neg = np.asarray(accumulator_dict['hist_neg'], dtype = np.int64)
+        accumulator._hist_pos = np.asarray(accumulator_dict['hist_pos'], dtype = np.int64)
+        if accumulator_dict['amount_hists'] is not None:
+            accumulator._amount_hists = tuple(np.asarray(hist, dtype = float) for hist in accumulator_dict['amount_hists'])
+        if accumulator_dict['cost_hists'] is not None:
+            accumulator._cost_hists = {confusion_class: np.asarray(hist, dtype = float)
+                                       for confusion_class, hist in accumulator_dict['cost_hists'].items()}
+        accumulator._squared_error_sum = accumulator_dict['squared_error_sum']
+        accumulator._proba_ranges = np.asarray(accumulator_dict['proba_ranges'], dtype = float)
+
+        return accumulator
+
+    def get_confusion_counts(self):
+
+        """
+        Returns
+        ----------
+        TN, FP, FN, TP: np.arrays of ints
+            counts of each confusion class, one element for each threshold (in the given order)
+        """
+        TN, FP = _get_below_above_from_hist(self._hist_neg)
+        FN, TP = _get_below_above_from_hist(self._hist_pos)
+
+        return self._unsort(TN, FP, FN, TP)
+
+    def get_confusion_amounts(self):
+
+        """
+        Returns
+        ----------
+        TN, FP, FN, TP: np.arrays of floats
+            amounts of each confusion class, one element for each threshold (in the given order)
+        """
+        if not self.has_amounts:
+            raise TypeError("No amounts have been accumulated")
+
+        TN, FP = _get_below_above_from_hist(self._amount_hists[0])
+        FN, TP = _get_below_above_from_hist(self._amount_hists[1])
+
+        return self._unsort(TN, FP, FN, TP)
+
+    def get_confusion_costs(self):
+
+        """
+        Returns
+        ----------
+        TN, FP, FN, TP: np.arrays of floats
+            costs of each confusion class, one element for each threshold (in the given order)
+        """
+        if not self.has_costs:
+            raise TypeError("No costs have been accumulated")
+
+        TN = _get_below_above_from_hist(self._cost_hists['TN'])[0]
+        FP = _get_below_above_from_hist(self._cost_hists['FP'])[1]
+        FN = _get_below_above_from_hist(self._cost_hists['FN'])[0]
+        TP = _get_below_above_from_hist(self._cost_hists['TP'])[1]
+
+        return self._unsort(TN, FP, FN, TP)
+
+    def get_amount_cost_df(self):
+
+        """
+        For each threshold, returns accumulated amounts and/or cost for each class (TN, FP, FN, TP)
+
+        Returns
+        ----------
+        amount_cost_per_threshold_df: pandas dataframe
+            Dataframe containing variables:
+            - threshold
+            - if amounts were given: amounts relative to each class (TN, FP, FN, TP)
+            - if cost_dict was given: cost relative to each class (TN, FP, FN, TP) and total cost
+        """
+        if not (self.has_amounts or self.has_costs):
+            raise TypeError("No amounts or costs have been accumulated")
+
+        amount_cost_per_threshold_df = pd.DataFrame({'threshold': self.threshold_values})
+
+        if self.has_amounts:
+            for confusion_class, amount_values in zip(['TN', 'FP', 'FN', 'TP'], self.get_confusion_amounts()):
+                amount_cost_per_threshold_df['amount_' + confusion_class] = amount_values
+
+        if self.has_costs:
+            cost_grid = self.get_confusion_costs()
+            for confusion_class, cost_values in zip(['TN', 'FP', 'FN', 'TP'], cost_grid):
+                amount_cost_per_threshold_df['cost_' + confusion_class] = cost_values
+            amount_cost_per_threshold_df['total_cost'] = sum(cost_grid)
+
+        return amount_cost_per_threshold_df.sort_values(by='threshold')
+
+    def get_invariant_metrics_df(self):
+
+        """
+        Computes ROC auc, Precision-Recall auc (average precision) and Brier score of the accumulated data.
+        Brier score is exact, while the aucs are approximated placing the data points of each bin (and class)
+        in the middle of their observed range of predicted probabilities
+
+        Returns
+        ----------
+        metrics_df: pandas dataframe
+            Dataframe containing computed metrics and the maximum absolute error of each value
+        """
+        return _get_binned_invariant_metrics_df(self._proba_ranges[0], self._hist_neg, self._proba_ranges[1], self._hist_pos,
+                                                self._squared_error_sum, self.n_data)
+
+    def _unsort(self, *arrays):
+        # Arrays computed on sorted thresholds, back in the given thresholds order
+        thresh_unsort = np.argsort(self._thresh_order)
+        return tuple(array[thresh_unsort] for array in arrays)
+
+class ConfusionSketch(_ChunkedStatistics):
+
+    """
+    Mergeable sketch of the predicted probabilities of each class, in the style of a t-digest, 
+    with attached amount and cost sums. Unlike ConfusionAccumulator, thresholds are not fixed in advance:
+    counts, amounts and costs can be estimated for any thresholds, together with their maximum errors.
+
+    Data points of each class are kept in bins storing the range (min and max) of their predicted probabilities, 
+    their count and the sums of their amounts and costs. Data points with the same predicted probability 
+    share the same bin, so that results are exact as long as the number of distinct predicted probabilities 
+    of a class doesn't exceed max_bins. Otherwise adjacent bins are merged, keeping smaller bins at the tails 
+    of the distribution (t-digest k1 scale function), and only bins whose range contains a threshold 
+    (split linearly in estimates) contribute to the error.
+
+    Sketches computed on separate partitions of the data can be combined with merge 
+    and serialized with to_dict/from_dict (or pickle)
+
+    Parameters
+    ----------
+    max_bins: int, default=1000
+        maximum number of bins of each class (after each update or merge)
+
+    Examples
+    ----------
+    >>> sketch = ConfusionSketch()
+    >>> for chunk in pd.read_csv('scores.csv', chunksize = 1000000):
+    ...     sketch.update(chunk['label'], chunk['proba'], amounts = chunk['amount'])
+    >>> amount_cost_df = sketch.get_amount_cost_df(np.arange(0, 1.001, 0.001))
+    >>> errors_df = sketch.get_max_errors_df(np.arange(0, 1.001, 0.001))
+    """
+
+    # columns of the bins arrays: cost_below is the cost of TN (FN) and cost_above of FP (TP) for negatives (positives)
+    _bin_columns = ['min', 'max', 'count', 'amount', 'cost_below', 'cost_above']
+
+    def __init__(self, max_bins = 1000):
+
+        if max_bins < 1:
+            raise ValueError("max_bins must be a positive integer")
+
+        self.max_bins = int(max_bins)
+        self.n_data = 0
+        self.total_amount = None
+        self._has_amounts = False
+        self._has_costs = False
+        self._bins = [np.empty((0, len(self._bin_columns))), np.empty((0, len(self._bin_columns)))] # negatives, positives
+        self._squared_error_sum = 0.
+
+    @property
+    def has_amounts(self):
+        return self._has_amounts
+
+    @property
+    def has_costs(self):
+        return self._has_costs
+
+    def update(self, true_y, predicted_proba, amounts = None, cost_dict = None):
+
+        """
+        Adds a chunk of data to the sketch.
+        Amounts and costs must be given either for every chunk or for none of them
+
+        Parameters
+        ----------
+        true_y: sequence of ints (0 or 1)
+            True labels of the chunk
+        predicted_proba: sequence of floats
+            predicted probabilities for class 1 of the chunk
+        amounts: sequence of floats, default=None
+            amounts associated to each element of the chunk
+        cost_dict: dict, default=None
+            dict containing keys: "TN", "FP", "FN", "TP"
+            and values corresponding to lists (with the length of the chunk) and/or floats
+            (output from get_cost_dict)
+
+        Returns
+        ----------
+        self: ConfusionSketch
+        """
+        true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
+        is_pos = true_y.view(bool)
+        n_chunk = len(predicted_proba)
+
+        if self.n_data > 0:
+            if (amounts is None) == self.has_amounts:
+                raise ValueError("amounts must be given for every chunk or for none of them")
+            if (cost_dict is None) == self.has_costs:
+                raise ValueError("cost_dict must be given for every chunk or for none of them")
+
+        # amounts and per-row costs are validated against the chunk before the sketch is updated
+        if amounts is not None:
+            amounts = _get_values_array(amounts, 'amounts', n_chunk)
+        if cost_dict is not None:
+            cost_dict = CostModel.from_cost_dict(cost_dict, n_data = n_chunk)
+
+        if amounts is not None:
+            self.total_amount = (self.total_amount or 0.) + amounts.sum(dtype = float)
+            self._has_amounts = True
+        else:
+            amounts = np.zeros(n_chunk)
+
+        costs = {}
+        for confusion_class in ['TN', 'FP', 'FN', 'TP']:
+            cost = 0. if cost_dict is None else cost_dict[confusion_class]
+            if hasattr(cost, '__iter__'):
+                costs[confusion_class] = _get_cost_array(cost)
+            else:
+                costs[confusion_class] = np.full(n_chunk, float(cost))
+        self._has_costs = self._has_costs or (cost_dict is not None)
+
+        for class_index, class_mask, cost_below, cost_above in [(0, ~is_pos, 'TN', 'FP'), (1, is_pos, 'FN', 'TP')]:
+            # one exact bin for each distinct predicted probability of the chunk
+            unique_proba, inverse = np.unique(predicted_proba[class_mask], return_inverse = True)
+            new_bins = np.column_stack([unique_proba, unique_proba] + 
+                                       [np.bincount(inverse, weights = values[class_mask], minlength = len(unique_proba))
+                                        for values in [np.ones(n_chunk), amounts, costs[cost_below], costs[cost_above]]])
+            self._bins[class_index] = self._compress(np.vstack([self._bins[class_index], new_bins]))
+
+        self._squared_error_sum += np.sum((predicted_proba - is_pos)**2, dtype = float)
+        self.n_data += n_chunk
+
+        return self
+
+    def merge(self, other):
+
+        """
+        Adds the data points of another ConfusionSketch (e.g. computed on another partition
+        of the data, in another process or machine)
+
+        Parameters
+        ----------
+        other: ConfusionSketch
+            sketch to be merged
+
+        Returns
+        ----------
+        self: ConfusionSketch
+        """
+        if (self.n_data > 0) and (other.n_data > 0):
+            if (self.has_amounts != other.has_amounts) or (self.has_costs != other.has_costs):
+                raise ValueError("Only sketches with the same amounts and costs (given or not) can be merged")
+
+        for class_index in [0, 1]:
+            self._bins[class_index] = self._compress(np.vstack([self._bins[class_index], other._bins[class_index]]))
+
+        if other.has_amounts:
+            self.total_amount = (self.total_amount or 0.) + other.total_amount
+        self._has_amounts = self._has_amounts or other._has_amounts
+        self._has_costs = self._has_costs or other._has_costs
+        self._squared_error_sum += other._squared_error_sum
+        self.n_data += other.n_data
+
+        return self
+
+    def to_dict(self):
+
+        """
+        Returns the sketch as a dict of lists and floats (e.g. to be serialized with json)
+        that can be loaded with ConfusionSketch.from_dict
+        """
+        return {'max_bins': self.max_bins,
+                'n_data': self.n_data,
+                'total_amount': self.total_amount,
+                'has_amounts': self._has_amounts,
+                'has_costs': self._has_costs,
+                'bins_neg': self._bins[0].tolist(),
+                'bins_pos': self._bins[1].tolist(),
+                'squared_error_sum': self._squared_error_sum}
+
+    @classmethod
+    def from_dict(cls, sketch_dict):
+
+        """
+        Creates a ConfusionSketch from the output of to_dict
+
+        Parameters
+        ----------
+        sketch_dict: dict
+            output from ConfusionSketch.to_dict
+
+        Returns
+        ----------
+        sketch: ConfusionSketch
+        """
+        sketch = cls(max_bins = sketch_dict['max_bins'])
+        sketch.n_data = sketch_dict['n_data']
+        sketch.total_amount = sketch_dict['total_amount']
+        sketch._has_amounts = sketch_dict['has_amounts']
+        sketch._has_costs = sketch_dict['has_costs']
+        sketch._bins = [np.asarray(sketch_dict[key], dtype = float).reshape(-1, len(cls._bin_columns)) 
+                        for key in ['bins_neg', 'bins_pos']]
+        sketch._squared_error_sum = sketch_dict['squared_error_sum']
+
+        return sketch
+
+    def get_confusion_counts(self, threshold_values):
+
+        """
+        Parameters
+        ----------
+        threshold_values: float or sequence of floats
+            classification thresholds below which prediction label is 0, 1 otherwise
+
+        Returns
+        ----------
+        TN, FP, FN, TP: np.arrays of floats
+            estimated counts of each confusion class, one element for each threshold (in the given order)
+        """
+        estimates = self._get_confusion_estimates(threshold_values)[0]
+        return estimates['TN'], estimates['FP'], estimates['FN'], estimates['TP']
+
+    def get_confusion_amounts(self, threshold_values):
+
+        """
+        Parameters
+        ----------
+        threshold_values: float or sequence of floats
+            classification thresholds below which prediction label is 0, 1 otherwise
+
+        Returns
+        ----------
+        TN, FP, FN, TP: np.arrays of floats
+            estimated amounts of each confusion class, one element for each threshold (in the given order)
+        """
+        if not self.has_amounts:
+            raise TypeError("No amounts have been added to the sketch")
+
+        estimates = self._get_confusion_estimates(threshold_values)[0]
+        return estimates['amount_TN'], estimates['amount_FP'], estimates['amount_FN'], estimates['amount_TP']
+
+    def get_confusion_costs(self, threshold_values):
+
+        """
+        Parameters
+        ----------
+        threshold_values: float or sequence of floats
+            classification thresholds below which prediction label is 0, 1 otherwise
+
+        Returns
+        ----------
+        TN, FP, FN, TP: np.arrays of floats
+            estimated costs of each confusion class, one element for each threshold (in the given order)
+        """
+        if not self.has_costs:
+            raise TypeError("No costs have been added to the sketch")
+
+        estimates = self._get_confusion_estimates(threshold_values)[0]
+        return estimates['cost_TN'], estimates['cost_FP'], estimates['cost_FN'], estimates['cost_TP']
+
+    def get_amount_cost_df(self, threshold_values):
+
+        """
+        For each threshold, returns estimated amounts and/or cost for each class (TN, FP, FN, TP)
+
+        Parameters
+        ----------
+        threshold_values: sequence of floats
+            classification thresholds below which prediction label is 0, 1 otherwise
+
+        Returns
+        ----------
+        amount_cost_per_threshold_df: pandas dataframe
+            Dataframe containing variables:
+            - threshold
+            - if amounts were given: amounts relative to each class (TN, FP, FN, TP)
+            - if cost_dict was given: cost relative to each class (TN, FP, FN, TP) and total cost
+        """
+        if not (self.has_amounts or self.has_costs):
+            raise TypeError("No amounts or costs have been added to the sketch")
+
+        estimates = self._get_confusion_estimates(threshold_values)[0]
+        amount_cost_per_threshold_df = pd.DataFrame({'threshold': np.atleast_1d(np.asarray(threshold_values, dtype = float))})
+
+        for variable, is_given in [('amount_', self.has_amounts), ('cost_', self.has_costs)]:
+            if is_given:
+                for confusion_class in ['TN', 'FP', 'FN', 'TP']:
+                    amount_cost_per_threshold_df[variable + confusion_class] = estimates[variable + confusion_class]
+
+        if self.has_costs:
+            amount_cost_per_threshold_df['total_cost'] = sum(estimates['cost_' + confusion_class] 
+                                                             for confusion_class in ['TN', 'FP', 'FN', 'TP'])
+
+        return amount_cost_per_threshold_df.sort_values(by='threshold')
+
+    def get_max_errors_df(self, threshold_values):
+
+        """
+        For each threshold, returns the maximum absolute error of the estimated counts, amounts and costs
+        (assuming non-negative amounts and costs)
+
+        Parameters
+        ----------
+        threshold_values: sequence of floats
+            classification thresholds below which prediction label is 0, 1 otherwise
+
+        Returns
+        ----------
+        max_errors_df: pandas dataframe
+            Dataframe containing variables:
+            - threshold
+            - maximum errors of counts relative to each class (TN, FP, FN, TP)
+            - if amounts were given: maximum errors of amounts relative to each class
+            - if cost_dict was given: maximum errors of costs relative to each class
+        """
+        errors = self._get_confusion_estimates(threshold_values)[1]
+        max_errors_df = pd.DataFrame({'threshold': np.atleast_1d(np.asarray(threshold_values, dtype = float))})
+
+        for variable, is_given in [('', True), ('amount_', self.has_amounts), ('cost_', self.has_costs)]:
+            if is_given:
+                for confusion_class in ['TN', 'FP', 'FN', 'TP']:
+                    max_errors_df[variable + confusion_class] = errors[variable + confusion_class]
+
+        return max_errors_df.sort_values(by='threshold')
+
+    def get_invariant_metrics_df(self):
+
+        """
+        Computes ROC auc, Precision-Recall auc (average precision) and Brier score of the sketched data.
+        Brier score is exact, while the aucs are approximated placing the data points of each bin
+        in the middle of its range of predicted probabilities
+
+        Returns
+        ----------
+        metrics_df: pandas dataframe
+            Dataframe containing computed metrics and the maximum absolute error of each value
+        """
+        bins_neg, bins_pos = self._bins
+        return _get_binned_invariant_metrics_df(bins_neg[:, :2].T, bins_neg[:, 2], bins_pos[:, :2].T, bins_pos[:, 2],
+                                                self._squared_error_sum, self.n_data)
+
+    def _compress(self, bins):
+        # Sorts bins by range and, if they are more than max_bins, merges adjacent bins whose quantiles
+        # fall in the same unit of the t-digest k1 scale function (at most max_bins + 1 merged bins)
+        bins = bins[np.lexsort((bins[:, 1], bins[:, 0]))]
+
+        if len(bins) <= self.max_bins:
+            return bins
+
+        cum_count = np.cumsum(bins[:, 2])
+        quantiles = (cum_count - bins[:, 2]/2) / cum_count[-1]
+        k_units = np.floor(self.max_bins / np.pi * np.arcsin(2*quantiles - 1))
+        starts = np.flatnonzero(np.r_[True, k_units[1:] != k_units[:-1]])
+
+        return np.column_stack([np.minimum.reduceat(bins[:, 0], starts),
+                                np.maximum.reduceat(bins[:, 1], starts),
+                                np.add.reduceat(bins[:, 2:], starts, axis = 0)])
+
+    def _get_confusion_estimates(self, threshold_values):
+        # Estimates and maximum errors of counts, amounts and costs of each confusion class, for each threshold:
+        # bins entirely below a threshold are predicted negative, bins whose range contains it are split linearly
+        thresholds = np.atleast_1d(np.asarray(threshold_values, dtype = float))[:, None]
+        estimates, errors = {}, {}
+
+        for bins, below_class, above_class in [(self._bins[0], 'TN', 'FP'), (self._bins[1], 'FN', 'TP')]:
+            bin_min, bin_max = bins[:, 0], bins[:, 1]
+
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                fraction_below = np.clip((thresholds - bin_min) / (bin_max - bin_min), 0, 1)
+            fraction_below = np.where(bin_max < thresholds, 1., np.where(bin_min >= thresholds, 0., fraction_below))
+            is_split = (bin_min < thresholds) & (bin_max >= thresholds)
+
+            below = fraction_below @ bins[:, 2:]
+            error = (is_split * np.maximum(fraction_below, 1 - fraction_below)) @ np.abs(bins[:, 2:])
+            total = bins[:, 2:].sum(axis = 0)
+
+            # columns: count, amount, cost_below, cost_above
+            estimates[below_class], estimates[above_class] = below[:, 0], total[0] - below[:, 0]
+            estimates['amount_' + below_class], estimates['amount_' + above_class] = below[:, 1], total[1] - below[:, 1]
+            estimates['cost_' + below_class], estimates['cost_' + above_class] = below[:, 2], total[3] - below[:, 3]
+
+            errors[below_class], errors[above_class] = error[:, 0], error[:, 0]
+            errors['amount_' + below_class], errors['amount_' + above_class] = error[:, 1], error[:, 1]
+            errors['cost_' + below_class], errors['cost_' + above_class] = error[:, 2], error[:, 3]
+
+        return estimates, errors
+
+class ConfusionCategoryIndex:
+
+    """
+    Index of the data points of each confusion category (TN, FP, FN, TP), for repeated retrievals of their features
+    at any threshold. Data points are sorted once by true label and then by predicted probability, so that
+    the data points of a confusion category are a contiguous slice of the index, found with a binary search:
+    negatives below the threshold are TN and the following ones FP, positives below the threshold are FN
+    and the following ones TP.
+
+    Feature tables can be pandas DataFrames, NumPy arrays (also memory-mapped, of which only the retrieved rows
+    are read) or Parquet files (read with pyarrow: only the requested columns of the row groups containing
+    the retrieved rows are read). With sort_data, the rows of the feature table are reordered once as the index,
+    so that observations are returned as views of the sorted table instead of copies.
+    The data points that change category when the threshold moves are a slice of the index as well: they are
+    returned by get_transitions_df, with the change of their amounts and costs
+
+    Parameters
+    ----------
+    true_y: sequence of ints (0 or 1)
+        True labels
+    predicted_proba: sequence of floats
+        predicted probabilities for class 1
+        (e.g. output from model.predict_proba(data)[:,1])
+    X_data: pandas DataFrame, nd.array (or np.memmap) or str, default=None
+        set of features, with one row for each data point (in the order of true_y), or path of a Parquet file.
+        If None, only the indices of the observations can be retrieved
+    sort_data: bool or str, default=False
+        if True, the feature table is copied in memory in the order of the index;
+        if a path is given, the sorted NumPy feature table is written to a memory-mapped .npy file at that path
+    amounts: sequence of floats, default=None
+        amounts associated to each element of data, returned with the data points that change category
+        (see get_transitions_df)
+    cost_dict: dict or CostModel, default=None
+        dict containing costs associated to each class (TN, FP, FN, TP)
+        with keys "TN", "FP", "FN", "TP"
+        and values that can be both lists (with coherent lenghts) and/or floats
+        (output from get_cost_dict), converted once to a CostModel
+
+    Attributes
+    ----------
+    order: np.array of ints
+        read-only positions of the data points, sorted by true label and then by predicted probability
+    n_neg: int
+        number of negatives (the first n_neg positions of order)
+
+    Examples
+    ----------
+    >>> index = ConfusionCategoryIndex(y_test, test_predicted_proba, X_test_df, sort_data = True)
+    >>> for threshold in [0.3, 0.4, 0.5]:
+    ...     FP_df = index.get_observations_df('FP', threshold = threshold, columns = ['amount', 'country'])
+    >>> transitions_df = index.get_transitions_df(0.5, 0.3, columns = ['country'])
+    """
+
+    def __init__(self, true_y, predicted_proba, X_data = None, sort_data = False, amounts = None, cost_dict = None,
+                 _sorted_predictions = None):
+
+        order, sorted_proba, sorted_pos = _sort_predictions(true_y, predicted_proba, _sorted_predictions)
+
+        # stable partition by true label: predicted probabilities stay sorted within each class
+        self.order = np.concatenate((order[~sorted_pos], order[sorted_pos]))
+        self._sorted_proba = np.concatenate((sorted_proba[~sorted_pos], sorted_proba[sorted_pos]))
+        self.order.setflags(write = False)
+        self.n_neg = len(self.order) - int(np.count_nonzero(sorted_pos))
+
+        self._parquet_file = None
+        self._is_sorted = False
+        self.X_data = None
+
+        if isinstance(X_data, (str, os.PathLike)):
+            if pq is None:
+                raise ImportError("pyarrow is required to read Parquet feature tables")
+            if sort_data is not False:
+                raise TypeError("sort_data is not supported for Parquet feature tables")
+            self._parquet_file = pq.ParquetFile(X_data)
+            n_rows = self._parquet_file.metadata.num_rows
+        elif X_data is not None:
+            if not isinstance(X_data, pd.DataFrame):
+                X_data = np.asarray(X_data)
+                if X_data.ndim == 1:
+                    X_data = X_data.reshape(-1, 1)
+            n_rows = len(X_data)
+            if sort_data is not False:
+                X_data = _get_sorted_table(X_data, self.order, None if sort_data is True else sort_data)
+                self._is_sorted = True
+            self.X_data = X_data
+
+        if (X_data is not None) and n_rows != len(self.order):
+            raise ValueError("X_data must have one row for each element of true_y")
+
+        self.amounts = None
+        if amounts is not None:
+            self.amounts = _get_values_array(amounts, 'amounts', len(self.order))
+
+        self.cost_dict = None if cost_dict is None else CostModel.from_cost_dict(cost_dict, n_data = len(self.order))
+
+    def get_slice(self, confusion_category, threshold = 0.5):
+
+        """
+        Returns the slice of the index (and of the sorted feature table) of the data points in a confusion category
+
+        Parameters
+        ----------
+        confusion_category: str {'TN', 'FP', 'FN', 'TP'}
+            confusion category is either True Negative TN, False Positive FP, False Negative FN, True Positive TP
+        threshold: float, default=0.5
+            classification threshold below which prediction label is 0, 1 otherwise
+
+        Returns
+        ----------
+        category_slice: slice
+            positions in order of the data points in the confusion category
+        """
+        if confusion_category not in ['TN', 'FP', 'FN', 'TP']:
+            raise ValueError("confusion_category must be one of {'TN', 'FP', 'FN', 'TP'}")
+
+        if confusion_category in ['TN', 'FP']:
+            start, stop = 0, self.n_neg
+        else:
+            start, stop = self.n_neg, len(self.order)
+        n_below = int(np.searchsorted(self._sorted_proba[start:stop], threshold, side = 'left'))
+
+        if confusion_category in ['TN', 'FN']:
+            return slice(start, start + n_below)
+        return slice(start + n_below, stop)
+
+    def get_indices(self, confusion_category, threshold = 0.5):
+
+        """
+        Returns the positions of the data points in a confusion category, sorted by predicted probability
+        (read-only view of the index)
+
+        Parameters
+        ----------
+        confusion_category: str {'TN', 'FP', 'FN', 'TP'}
+            confusion category is either True Negative TN, False Positive FP, False Negative FN, True Positive TP
+        threshold: float, default=0.5
+            classification threshold below which prediction label is 0, 1 otherwise
+
+        Returns
+        ----------
+        indices: np.array of ints
+            positions of the data points in true_y (and in X_data)
+        """
+        return self.order[self.get_slice(confusion_category, threshold)]
+
+    def get_observations_df(self, confusion_category, threshold = 0.5, columns = None):
+
+        """
+        Returns X (features) dataframe of data points related to a chosen confusion category
+        (same rows as utilities.get_confusion_category_observations_df, sorted by predicted probability).
+        If the feature table is sorted, the dataframe is a view of it
+
+        Parameters
+        ----------
+        confusion_category: str {'TN', 'FP', 'FN', 'TP'}
+            confusion category is either True Negative TN, False Positive FP, False Negative FN, True Positive TP
+        threshold: float, default=0.5
+            classification threshold below which prediction label is 0, 1 otherwise
+        columns: list, default=None
+            columns to be returned (names for DataFrames and Parquet files, positions for NumPy arrays).
+            If None, all the columns are returned
+
+        Returns
+        ----------
+        X_filtered_df: pandas DataFrame
+            X DataFrame of features for data points in chosen confusion category,
+            indexed by their index in X_data (their position, for NumPy arrays and Parquet files)
+        """
+        if self.X_data is None and self._parquet_file is None:
+            raise TypeError("X_data must be given to the index to retrieve observations")
+
+        return self._get_rows_df(self.get_slice(confusion_category, threshold), columns)
+
+    def get_transitions_df(self, threshold_from, threshold_to, columns = None):
+
+        """
+        Returns the data points that change confusion category when the threshold moves from threshold_from
+        to threshold_to, i.e. the ones whose predicted probability lies between the two thresholds:
+        in [threshold_from, threshold_to) FP become TN and TP become FN, in [threshold_to, threshold_from)
+        TN become FP and FN become TP. Both are a contiguous slice of the index for each true class,
+        so that only the data points that move are read
+
+        Parameters
+        ----------
+        threshold_from: float
+            classification threshold before the move
+        threshold_to: float
+            classification threshold after the move
+        columns: list, default=None
+            columns of X_data to be returned (names for DataFrames and Parquet files, positions for NumPy arrays).
+            If None, all the columns are returned (none if X_data was not given)
+
+        Returns
+        ----------
+        transitions_df: pandas DataFrame
+            Dataframe with one row for each data point that changes category, grouped by true class and
+            sorted by predicted probability, containing: true_class, transition (e.g. 'FP->TN'), predicted_proba,
+            amount (moving from the old category to the new one, if amounts were given),
+            cost_delta (cost of the new category minus cost of the old one, if cost_dict was given)
+            and the features of the data point (if X_data was given)
+        """
+        lower, upper = sorted([threshold_from, threshold_to])
+        transitions_dfs = []
+
+        for true_class, start, stop in [(0, 0, self.n_neg), (1, self.n_neg, len(self.order))]:
+            below_class, above_class = ('TN', 'FP') if true_class == 0 else ('FN', 'TP')
+            old_class, new_class = (above_class, below_class) if threshold_to > threshold_from \
+                                   else (below_class, above_class)
+
+            n_below = np.searchsorted(self._sorted_proba[start:stop], [lower, upper], side = 'left')
+            moving_slice = slice(start + n_below[0], start + n_below[1])
+            indices = self.order[moving_slice]
+
+            transitions_df = pd.DataFrame({'true_class': np.full(len(indices), true_class),
+                                           'transition': f'{old_class}->{new_class}',
+                                           'predicted_proba': self._sorted_proba[moving_slice]}, index = indices)
+            if self.amounts is not None:
+                transitions_df['amount'] = self.amounts[indices]
+            if self.cost_dict is not None:
+                transitions_df['cost_delta'] = self._get_costs(new_class, indices) - self._get_costs(old_class, indices)
+
+            if self.X_data is not None or self._parquet_file is not None:
+                features_df = self._get_rows_df(moving_slice, columns)
+                transitions_df.index = features_df.index
+                transitions_df = pd.concat([transitions_df, features_df], axis = 1)
+
+            transitions_dfs.append(transitions_df)
+
+        return pd.concat(transitions_dfs)
+
+    def _get_costs(self, confusion_class, indices):
+        # Costs of a confusion class for the given data points (costs can be floats or arrays)
+        cost = self.cost_dict[confusion_class]
+        return cost[indices] if isinstance(cost, np.ndarray) else np.full(len(indices), cost, dtype = float)
+
+    def _get_rows_df(self, category_slice, columns):
+        # Features of the data points in a slice of the index (a view of the table, if it is sorted)
+        indices = self.order[category_slice]
+        # rows of a sorted table are a contiguous slice of it
+        rows = category_slice if self._is_sorted else indices
+
+        if self._parquet_file is not None:
+            return self._read_parquet_rows(indices, columns)
+
+        if isinstance(self.X_data, pd.DataFrame):
+            if columns is None:
+                return self.X_data.iloc[rows]
+            column_positions = self.X_data.columns.get_indexer(pd.Index(columns))
+            if (column_positions < 0).any():
+                raise KeyError(f"columns not found in X_data: {list(pd.Index(columns)[column_positions < 0])}")
+            return self.X_data.iloc[rows, column_positions]
+
+        if columns is None:
+            X_filtered = self.X_data[rows]
+            columns = range(X_filtered.shape[1])
+        elif self._is_sorted:
+            X_filtered = self.X_data[rows][:, columns]
+        else:
+            X_filtered = self.X_data[np.ix_(rows, columns)]
+
+        return pd.DataFrame(X_filtered, index = indices, columns = columns, copy = False)
+
+    def _read_parquet_rows(self, indices, columns):
+        # Reads only the row groups that contain the given rows (and only the given columns),
+        # then takes the rows from the concatenated row groups
+        metadata = self._parquet_file.metadata
+        group_sizes = np.array([metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)], dtype = np.int64)
+        group_starts = np.cumsum(group_sizes) - group_sizes
+
+        row_groups = np.searchsorted(group_starts, indices, side = 'right') - 1
+        read_groups = np.unique(row_groups)
+        # start of each read row group in the concatenated table
+        read_starts = np.cumsum(group_sizes[read_groups]) - group_sizes[read_groups]
+        positions = indices - group_starts[row_groups] + read_starts[np.searchsorted(read_groups, row_groups)]
+
+        table = self._parquet_file.read_row_groups(read_groups.tolist(),
+                                                   columns = None if columns is None else list(columns))
+        X_filtered_df = table.take(positions).to_pandas()
+        X_filtered_df.index = indices
+
+        return X_filtered_df
+
+def _get_sorted_table(X_data, order, path = None):
+    # Copy of the feature table with rows in the given order: in memory or, if a path is given,
+    # in a memory-mapped .npy file written by chunks of rows (so that the table is never entirely in memory)
+    if path is None:
+        return X_data.take(order) if isinstance(X_data, pd.DataFrame) else X_data[order]
+    if isinstance(X_data, pd.DataFrame):
+        raise TypeError("only NumPy feature tables can be sorted to a memory-mapped file")
+
+    sorted_X = np.lib.format.open_memmap(path, mode = 'w+', dtype = X_data.dtype, shape = X_data.shape)
+    chunk_size = max(1, 2**26 // max(1, X_data[:1].nbytes))
+    for start in range(0, len(order), chunk_size):
+        sorted_X[start:start + chunk_size] = X_data[order[start:start + chunk_size]]
+    sorted_X.flush()
+
+    return sorted_X
+
+def _get_binned_invariant_metrics_df(ranges_neg, weights_neg, ranges_pos, weights_pos, squared_error_sum, n_data):
+    # Invariant metrics of binned data, where the predicted probabilities of each bin lie in its range (min, max).
+    # Values place each bin in the middle of its range, while the lowest (highest) aucs compatible with the ranges
+    # place positives at their min (max) and negatives at their max (min): the maximum error is the largest distance
+    (min_neg, max_neg), weights_neg = ranges_neg[:, weights_neg > 0], weights_neg[weights_neg > 0]
+    (min_pos, max_pos), weights_pos = ranges_pos[:, weights_pos > 0], weights_pos[weights_pos > 0]
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'): # aucs are nan if one of the classes is missing
+        aucs = _get_weighted_aucs((min_pos + max_pos)/2, weights_pos, (min_neg + max_neg)/2, weights_neg)
+        lowest_aucs = _get_weighted_aucs(min_pos, weights_pos, max_neg, weights_neg)
+        highest_aucs = _get_weighted_aucs(max_pos, weights_pos, min_neg, weights_neg)
+    max_errors = np.maximum(aucs - lowest_aucs, highest_aucs - aucs)
+
+    metrics_df = pd.DataFrame({'invariant_metric': ['roc_auc', 'pr_auc', 'brier_score'],
+                               'value': np.round([aucs[0], aucs[1], squared_error_sum / n_data], 4),
+                               'max_error': np.round([max_errors[0], max_errors[1], 0.], 4)})
+    return metrics_df
+
+def _get_weighted_aucs(scores_pos, weights_pos, scores_neg, weights_neg):
+    # ROC auc and average precision of weighted data points, with ties handled as in sklearn
+    unique_scores, inverse = np.unique(np.concatenate([scores_pos, scores_neg]), return_inverse = True)
+    hist_pos = np.bincount(inverse[:len(scores_pos)], weights = weights_pos, minlength = len(unique_scores))
+    hist_neg = np.bincount(inverse[len(scores_pos):], weights = weights_neg, minlength = len(unique_scores))
+    n_pos, n_neg = hist_pos.sum(), hist_neg.sum()
+
+    # ROC auc: probability that a positive is ranked above a negative, ties count 1/2
+    neg_below = np.cumsum(hist_neg) - hist_neg
+    roc_auc = np.sum(hist_pos * (neg_below + hist_neg/2)) / (n_pos * n_neg)
+
+    # average precision: precision at each score (from the highest) weighted by the increase in recall
+    tp = np.cumsum(hist_pos[::-1])
+    fp = np.cumsum(hist_neg[::-1])
+    precision = tp / np.maximum(tp + fp, 1e-300)
+    pr_auc = np.sum(hist_pos[::-1] * precision) / n_pos
+
+    return np.array([roc_auc, pr_auc])
+
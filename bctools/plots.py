@@ -1,21 +1,29 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import heapq
+import warnings
+
 import numpy as np
 import pandas as pd
 
-from sklearn.metrics import roc_curve, auc, precision_recall_curve, fbeta_score, confusion_matrix
+from sklearn.metrics import roc_curve, auc, precision_recall_curve
 
 import plotly.graph_objects as go
 import plotly.express as px 
 from plotly.subplots import make_subplots
 
-from .utilities import _get_amount_matrix, _get_cost_matrix, _get_density_curve_data
-from .utilities import get_amount_cost_df, get_invariant_metrics_df, get_confusion_matrix_and_metrics_df
+from .utilities import get_density_curve_data
+from .utilities import get_amount_cost_df, get_invariant_metrics_df, get_metrics_dep_on_threshold_df
 
 from .thresholds import get_optimized_thresholds_df
+from .confusion import get_confusion_counts, get_confusion_amounts, get_confusion_costs, ConfusionAccumulator, CostModel
+from .validation import _get_values_array, _get_labels_scores_arrays
+from .bootstrap import get_bootstrap_confidence_bands
 
-def curve_PR_plot(true_y, predicted_proba, beta = 1, title = "Precision Recall Curve", show_display_modebar = True):
+def curve_PR_plot(true_y, predicted_proba, beta = 1, title = "Precision Recall Curve", show_display_modebar = True, 
+                  max_points = None, tolerance = None,
+                  confidence_level = None, n_bootstraps = 200, random_state = None, n_jobs = None):
     
     """
     - Plots interactive Precision-Recall curve with plotly 
@@ -40,34 +48,87 @@ def curve_PR_plot(true_y, predicted_proba, beta = 1, title = "Precision Recall C
         The main title of the plot.
     show_display_modebar: bool, default=True
         Determines wether plotly displayModeBar will be shown
+    max_points: int, default=None
+        If given, the plotted curve is simplified to at most max_points vertices (Ramer-Douglas-Peucker:
+        the points farthest from the simplified curve are kept first), so that huge curves render quickly.
+        The area under the PR curve is always computed on the whole curve
+    tolerance: float, default=None
+        If given, the plotted curve is simplified to the fewest vertices such that both the distance of every point 
+        of the curve from the simplified curve and the error of the area under the simplified curve are within tolerance;
+        together with max_points, more than max_points vertices are kept (with a warning) if needed to meet tolerance.
+        The number of points and the errors are saved in the meta of the figure layout
+    confidence_level: float, default=None
+        If given, the bootstrap confidence band of the curve at confidence_level (e.g. 0.95) is drawn 
+        and the confidence interval of the area under the curve is shown in the legend 
+        (see bootstrap.get_bootstrap_confidence_bands)
+    n_bootstraps: int, default=200
+        Number of bootstrap replicates (only used if confidence_level is given)
+    random_state: int, default=None
+        Controls the randomness of the bootstrap (only used if confidence_level is given)
+    n_jobs: int, default=None
+        Number of worker processes the bootstrap replicates are distributed to (only used if confidence_level is given)
     
     Returns
     ----------   
     area_under_PR_curve: float
         value of area under the PR curve
     """
+    full_fig, area_under_pr_curve = build_curve_PR_plot(true_y, predicted_proba, beta = beta, max_points = max_points, 
+                                                        tolerance = tolerance, confidence_level = confidence_level,
+                                                        n_bootstraps = n_bootstraps, random_state = random_state,
+                                                        n_jobs = n_jobs, title = title)
+    full_fig.show(config = dict(displayModeBar = show_display_modebar))
+    
+    return area_under_pr_curve
+
+def build_curve_PR_plot(true_y, predicted_proba, beta = 1, title = "Precision Recall Curve", 
+                        max_points = None, tolerance = None,
+                        confidence_level = None, n_bootstraps = 200, random_state = None, n_jobs = None,
+                        _sorted_predictions = None):
+    
+    """
+    Builds the figure of curve_PR_plot and returns it, together with the computed data, without displaying it
+    (e.g. to export it, cache it or generate reports without a renderer)
+    
+    Parameters
+    ----------
+    see curve_PR_plot (show_display_modebar is not needed, since the figure is not displayed)
+    
+    Returns
+    ----------
+    fig: plotly.graph_objects.Figure
+        the figure (it can be displayed with fig.show())
+    area_under_PR_curve: float
+        value of area under the PR curve
+    """
     main_title = f"<b>{title}</b>"
     
     if beta < 0:
         raise ValueError("beta should be >=0 in the F-beta score") 
 
+    true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
     precision, recall, thresholds = precision_recall_curve(true_y, predicted_proba)
        
     listTr = thresholds.tolist()
     
-    listFbeta = []
-    
-    for threshold in listTr:
-        y_pred = [int(x >= threshold) for x in predicted_proba]
-        F_beta_score = fbeta_score(true_y, y_pred, beta=beta, zero_division=0)
-        listFbeta.append(F_beta_score)
+    # F-beta score for each threshold, directly from precision and recall (zero_division = 0)
+    fbeta_num = (1 + beta**2) * precision[:-1] * recall[:-1]
+    fbeta_den = beta**2 * precision[:-1] + recall[:-1]
+    listFbeta = np.divide(fbeta_num, fbeta_den, out = np.zeros(len(thresholds)), where = fbeta_den != 0).tolist()
         
     listTr.append(None)
     listFbeta.append(0)
     
     area_under_pr_curve = auc(recall, precision)
     
-    baseline = len(true_y[true_y==1]) / len(true_y)
+    curve_meta = None
+    if (max_points is not None) or (tolerance is not None):
+        curve_index, curve_meta = _get_simplified_curve_index(recall, precision, max_points, tolerance)
+        recall, precision = recall[curve_index], precision[curve_index]
+        listTr = [listTr[i] for i in curve_index]
+        listFbeta = [listFbeta[i] for i in curve_index]
+    
+    baseline = np.count_nonzero(true_y) / len(true_y)
     
     curve_df = pd.DataFrame({"Thresholds": listTr,
                              "Recall":recall.tolist(),
@@ -81,6 +142,16 @@ def curve_PR_plot(true_y, predicted_proba, beta = 1, title = "Precision Recall C
     full_fig.update_traces(hovertemplate='Threshold: %{customdata[0]:.4f} <br>Precision: %{y:.4f} <br>Recall: %{x:.4f} ' + fbeta_hover_str + '<extra></extra>')
     
     full_fig.update_traces(textposition="top center", name = f'PR Curve (AUC={area_under_pr_curve:.2f})') 
+    
+    if confidence_level is not None:
+        bands = get_bootstrap_confidence_bands(true_y, predicted_proba, n_bootstraps = n_bootstraps, 
+                                               confidence_level = confidence_level, random_state = random_state, 
+                                               n_jobs = n_jobs, _sorted_predictions = _sorted_predictions)
+        band_traces = _get_confidence_band_traces(bands['PR']['recall'], bands['PR']['lower'], bands['PR']['upper'],
+                                                  '#636efa', f'{confidence_level:.0%} confidence band')
+        auc_interval = bands['invariant_metrics'].set_index('invariant_metric').loc['pr_auc']
+        full_fig.update_traces(name = f'PR Curve (AUC={area_under_pr_curve:.2f}, ' \
+                                      + f'CI {auc_interval["lower"]:.2f}-{auc_interval["upper"]:.2f})')
 
     f_scores = np.linspace(0.2, 0.8, num=4)
     
@@ -119,16 +190,20 @@ def curve_PR_plot(true_y, predicted_proba, beta = 1, title = "Precision Recall C
     full_fig['data'][1]['showlegend']= True  #first iso curve
     full_fig['data'][-1]['showlegend']= True #baseline
     
+    if confidence_level is not None:
+        full_fig.add_traces(band_traces)
+    
     full_fig.update_layout(legend=dict(yanchor="top", y=0.18, xanchor="left", x=0.03),
                            legend_font_size=9, 
                            width=550, height=550)
     
-    full_fig.update_layout(margin=dict(l=40, r=40, t=40, b=40))
-    full_fig.show(config = dict(displayModeBar = show_display_modebar))
+    full_fig.update_layout(margin=dict(l=40, r=40, t=40, b=40), meta = curve_meta)
     
-    return area_under_pr_curve
+    return full_fig, area_under_pr_curve
 
-def curve_ROC_plot(true_y, predicted_proba, title = "Receiver Operating Characteristic Curve",  show_display_modebar = True):
+def curve_ROC_plot(true_y, predicted_proba, title = "Receiver Operating Characteristic Curve",  show_display_modebar = True,
+                   max_points = None, tolerance = None,
+                   confidence_level = None, n_bootstraps = 200, random_state = None, n_jobs = None):
     
     """
     - Plots interactive ROC curve with plotly 
@@ -150,18 +225,67 @@ def curve_ROC_plot(true_y, predicted_proba, title = "Receiver Operating Characte
         The main title of the plot.
     show_display_modebar: bool, default=True
         Determines wether plotly displayModeBar will be shown
+    max_points: int, default=None
+        If given, the plotted curve is simplified to at most max_points vertices (see curve_PR_plot).
+        The area under the ROC curve is always computed on the whole curve
+    tolerance: float, default=None
+        If given, maximum distance of the points of the curve and maximum error of the area under the curve 
+        allowed by the simplification (see curve_PR_plot)
+    confidence_level: float, default=None
+        If given, the bootstrap confidence band of the curve at confidence_level (e.g. 0.95) is drawn 
+        and the confidence interval of the area under the curve is shown in the legend 
+        (see bootstrap.get_bootstrap_confidence_bands)
+    n_bootstraps: int, default=200
+        Number of bootstrap replicates (only used if confidence_level is given)
+    random_state: int, default=None
+        Controls the randomness of the bootstrap (only used if confidence_level is given)
+    n_jobs: int, default=None
+        Number of worker processes the bootstrap replicates are distributed to (only used if confidence_level is given)
 
     Returns
     ----------   
     area_under_ROC_curve: float
         value of area under the ROC curve
     """
+    fig, area_under_ROC_curve = build_curve_ROC_plot(true_y, predicted_proba, max_points = max_points, tolerance = tolerance, 
+                                                     confidence_level = confidence_level, n_bootstraps = n_bootstraps, 
+                                                     random_state = random_state, n_jobs = n_jobs, title = title)
+    fig.show(config = dict(displayModeBar = show_display_modebar))
+    
+    return area_under_ROC_curve
+
+def build_curve_ROC_plot(true_y, predicted_proba, title = "Receiver Operating Characteristic Curve", 
+                         max_points = None, tolerance = None,
+                         confidence_level = None, n_bootstraps = 200, random_state = None, n_jobs = None,
+                         _sorted_predictions = None):
+    
+    """
+    Builds the figure of curve_ROC_plot and returns it, together with the computed data, without displaying it
+    (e.g. to export it, cache it or generate reports without a renderer)
+    
+    Parameters
+    ----------
+    see curve_ROC_plot (show_display_modebar is not needed, since the figure is not displayed)
+    
+    Returns
+    ----------
+    fig: plotly.graph_objects.Figure
+        the figure (it can be displayed with fig.show())
+    area_under_ROC_curve: float
+        value of area under the ROC curve
+    """
     main_title = f"<b>{title}</b>"
     
+    true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
     fpr, tpr, thresholds = roc_curve(true_y, predicted_proba)
     
     area_under_ROC_curve = auc(fpr, tpr)
     
+    curve_meta = None
+    if (max_points is not None) or (tolerance is not None):
+        curve_index, curve_meta = _get_simplified_curve_index(fpr, tpr, max_points, tolerance)
+        fpr, tpr, thresholds = fpr[curve_index], tpr[curve_index], thresholds[curve_index]
+    
     curve_df = pd.DataFrame({"Thresholds": thresholds.tolist(),
                              "False Positive Rate":fpr.tolist(),
                              "True Positive Rate":tpr.tolist()})
@@ -185,6 +309,17 @@ def curve_ROC_plot(true_y, predicted_proba, title = "Receiver Operating Characte
     fig["data"][0]["showlegend"]= True
     fig["data"][1]["showlegend"]= True
     
+    if confidence_level is not None:
+        bands = get_bootstrap_confidence_bands(true_y, predicted_proba, n_bootstraps = n_bootstraps, 
+                                               confidence_level = confidence_level, random_state = random_state, 
+                                               n_jobs = n_jobs, _sorted_predictions = _sorted_predictions)
+        fig.add_traces(_get_confidence_band_traces(bands['ROC']['false_positive_rate'], bands['ROC']['lower'], 
+                                                   bands['ROC']['upper'], '#636efa', 
+                                                   f'{confidence_level:.0%} confidence band'))
+        auc_interval = bands['invariant_metrics'].set_index('invariant_metric').loc['roc_auc']
+        fig.update_traces(name = f"ROC Curve (AUC={area_under_ROC_curve:.3f}, " \
+                                 + f"CI {auc_interval['lower']:.3f}-{auc_interval['upper']:.3f})", selector = 0)
+    
     fig.update_layout(legend = dict(yanchor="top", y=0.18, xanchor="right", x=0.97), 
                       legend_font_size=9,
                       width=550, height=550) 
@@ -192,14 +327,13 @@ def curve_ROC_plot(true_y, predicted_proba, title = "Receiver Operating Characte
     fig.update_yaxes(range=[0.0, 1.03])
     fig.update_xaxes(range=[-0.03, 1.0]) 
     
-    fig.update_layout(margin=dict(l=40, r=40, t=40, b=40))
-
-    fig.show(config = dict(displayModeBar = show_display_modebar))
+    fig.update_layout(margin=dict(l=40, r=40, t=40, b=40), meta = curve_meta)
     
-    return area_under_ROC_curve
+    return fig, area_under_ROC_curve
 
 def predicted_proba_violin_plot(true_y, predicted_proba, threshold_step = 0.01, marker_size = 3, 
-                                title = "Interactive Probabilities Violin Plot", show_display_modebar = True):
+                                title = "Interactive Probabilities Violin Plot", show_display_modebar = True,
+                                compact = False, max_points = None):
     
     """
     Plots interactive and customized violin plots of predicted probabilties with plotly, 
@@ -227,11 +361,38 @@ def predicted_proba_violin_plot(true_y, predicted_proba, threshold_step = 0.01,
         The main title of the plot.
     show_display_modebar: bool, default=True
         Determines wether plotly displayModeBar will be shown
+    compact: bool, default=False
+        If True, each point is plotted only once and the slider just recolors the points,
+        so that the size of the figure does not depend on the number of thresholds (recommended for large data)
+    max_points: int, default=None
+        If given, at most max_points points are displayed, sampled evenly along the sorted predicted probabilities
+        of each true class (stratified sample); the counts in the title always refer to all the data
+    """
+    full_fig = build_predicted_proba_violin_plot(true_y, predicted_proba, threshold_step = threshold_step, 
+                                                 marker_size = marker_size, compact = compact, max_points = max_points,
+                                                 title = title)
+    full_fig.show(config = dict(displayModeBar = show_display_modebar))
+
+def build_predicted_proba_violin_plot(true_y, predicted_proba, threshold_step = 0.01, marker_size = 3, 
+                                      title = "Interactive Probabilities Violin Plot", compact = False, max_points = None,
+                                      _sorted_predictions = None):
+    
+    """
+    Builds the figure of predicted_proba_violin_plot and returns it without displaying it
+    (e.g. to export it, cache it or generate reports without a renderer)
+    
+    Parameters
+    ----------
+    see predicted_proba_violin_plot (show_display_modebar is not needed, since the figure is not displayed)
+    
+    Returns
+    ----------
+    fig: plotly.graph_objects.Figure
+        the figure (it can be displayed with fig.show())
     """
     np.random.seed(11)
     
-    data_df=pd.DataFrame({'class': true_y,
-                          'pred': predicted_proba}).sort_values('pred')
+    true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
     
     try:
         n_of_decimals = len(str(threshold_step).rsplit('.')[1])
@@ -242,51 +403,73 @@ def predicted_proba_violin_plot(true_y, predicted_proba, threshold_step = 0.01,
     
     main_title = f"<b>{title}</b><br>"
     
+    choices = ['TN', 'FP', 'FN', 'TP']
+    colors = {'FN':'#EF71D9', 'FP':'#EF553B', 'TP':'#00CC96', 'TN':'#636EFA'}
+
+    # counts are computed on all the data with the sorted predicted probabilities, even if a sample of points is plotted
+    confusion_counts = get_confusion_counts(true_y, predicted_proba, threshold_values, _sorted_predictions = _sorted_predictions)
+
+    sample_note = ''
+    if (max_points is not None) and (len(true_y) > max_points):
+        sample_index = _get_stratified_sample_index(true_y, predicted_proba, max_points)
+        sample_note = f"  ({len(sample_index)} of {len(true_y)} points displayed)"
+    else:
+        sample_index = np.arange(len(true_y))
+
+    data_df=pd.DataFrame({'class': true_y[sample_index],
+                          'pred': predicted_proba[sample_index]}, index = sample_index).sort_values('pred')
+
+    titles = {}
+    for i, threshold in enumerate(threshold_values):
+        titles[threshold] = ",  ".join([x + ": " + str(counts[i])
+                                        for x, counts in zip(choices, confusion_counts) if counts[i] > 0]) + sample_note
+
     # VIOLIN PLOT 
     full_fig=go.Figure(data=go.Violin(y=data_df['pred'], x=data_df['class'], line_color='#0D2A63', 
                                      meanline_visible=True, points=False, fillcolor=None, opacity=0.3, box=None,
                                      scalemode='count', showlegend = False))
     
     length_fig_list=[] # saves lenghts of strip figure data (can contain 1,2,3,4 classes)
-    titles = {}
-    
-    choices = ['TN', 'FP', 'FN', 'TP']
     
     # STRIP PLOT
-    for threshold in threshold_values:
+    if compact:
+        # points of each true class are plotted once, colored by a colorscale that changes color at the threshold
+        rng = np.random.RandomState(11)
+        class_df_list = [data_df[data_df['class'] == true_class] for true_class in [0, 1]]
         
-        threshold_string = "thresh_" + str(round(threshold, n_of_decimals))
+        for true_class, class_df in enumerate(class_df_list):
+            full_fig.add_trace(go.Scattergl(x = true_class + rng.uniform(-0.35, 0.35, len(class_df)), y = class_df['pred'],
+                                            customdata = class_df.index, mode = 'markers', showlegend = False,
+                                            marker = dict(size = marker_size, color = class_df['pred'], cmin = 0, cmax = 1,
+                                                          colorscale = _get_threshold_colorscale(class_df['pred'].values,
+                                                                                                 threshold_values[0],
+                                                                                                 colors[choices[2 * true_class]],
+                                                                                                 colors[choices[2 * true_class + 1]])),
+                                            hovertemplate = 'Idx = %{customdata}<br>Class = ' + str(true_class) + '<br>Pred = %{y}'))
         
+        # legend entries of the confusion classes, since colors are given by the colorscales
+        for x in choices:
+            full_fig.add_trace(go.Scattergl(x = [None], y = [None], mode = 'markers', name = x,
+                                            marker = dict(size = marker_size, color = colors[x])))
+    else:
+        for threshold in threshold_values:
         
-        conditions = [(data_df['class'] == 0) & (data_df['pred'] < threshold), 
-                      (data_df['class'] == 0) & (data_df['pred'] >= threshold),
-                      (data_df['class'] == 1) & (data_df['pred'] < threshold),
-                      (data_df['class'] == 1) & (data_df['pred'] >= threshold)]
+            # confusion class of each point, without adding a column to data_df for each threshold
+            confusion_classes = np.array(choices)[2 * data_df['class'].values + (data_df['pred'].values >= threshold)]
                                             
-        data_df[threshold_string] = np.select(conditions, choices)
+            # NOTE: px strip generates n plots, one for each color class (TN, FP, FN, TP) it finds)
+            strip_points_fig = px.strip(data_df, x='class', y='pred', color=confusion_classes,
+                                        color_discrete_map = colors, labels = {'color': 'thresh_' + str(round(threshold, n_of_decimals))},
+                                        log_y=True, width=550, height=550, hover_data = [data_df.index])
         
-        count_class = data_df[threshold_string].value_counts()
+            strip_points_fig.update_traces(hovertemplate = 'Idx = %{customdata}<br>Class = %{x}<br>Pred = %{y}', jitter = 1, marker_size=marker_size)
         
-        titles[threshold] = ''
-        for x in count_class.index:
-            titles[threshold] += x + ": " + str(count_class[x]) + ",  "
+            length_fig_list.append(len(strip_points_fig.data))
         
-        titles[threshold] = titles[threshold][:-3] #removes last 3 char (2 spaces and comma)
+            for i in range(len(strip_points_fig.data)):
+                strip_points_fig.data[i].visible=False
                             
-        # NOTE: px strip generates n plots, one for each color class (TN, FP, FN, TP) it finds)
-        strip_points_fig = px.strip(data_df, x='class', y='pred', color=threshold_string, 
-                                    color_discrete_map = {'FN':'#EF71D9', 'FP':'#EF553B',
-                                                          'TP':'#00CC96', 'TN':'#636EFA'},
-                                    log_y=True, width=550, height=550, hover_data = [data_df.index])
-            
-        strip_points_fig.update_traces(hovertemplate = 'Idx = %{customdata}<br>Class = %{x}<br>Pred = %{y}', jitter = 1, marker_size=marker_size)
-        
-        length_fig_list.append(len(strip_points_fig.data))
-        
-        for i in range(len(strip_points_fig.data)):
-            strip_points_fig.data[i].visible=False
-        
-        full_fig.add_traces(list(strip_points_fig.select_traces()))
+            full_fig.add_traces(list(strip_points_fig.select_traces()))
                 
     full_fig.update_layout(legend_font_size=9.5, legend_itemsizing='constant', legend_traceorder='grouped', 
                            title=dict(text = main_title + '<span style="font-size: 13px;">' \
@@ -297,8 +480,9 @@ def predicted_proba_violin_plot(true_y, predicted_proba, threshold_step = 0.01,
     full_fig.update_layout(margin=dict(l=40, r=40, t=60, b=40))
        
     # makes visible the first strip points figure
-    for j in range(length_fig_list[0]):
-        full_fig.data[j+1].visible = True #j+1 becouse figure 0 is the violin plot
+    if not compact:
+        for j in range(length_fig_list[0]):
+            full_fig.data[j+1].visible = True #j+1 becouse figure 0 is the violin plot
 
     # STEPS AND SLIDER
     # Create and add slider
@@ -307,16 +491,25 @@ def predicted_proba_violin_plot(true_y, predicted_proba, threshold_step = 0.01,
     
     for i in range(len(threshold_values)): 
         
+        layout_update = {"title": dict(text = main_title + '<span style="font-size: 13px;">' \
+                                       + titles[threshold_values[i]] + '</span>',
+                                       y = 0.965, yanchor = 'bottom')
+                        }
+
+        if compact: # only the colorscales of the two strip plots are updated
+            colorscales = [_get_threshold_colorscale(class_df['pred'].values, threshold_values[i],
+                                                     colors[choices[2 * true_class]], colors[choices[2 * true_class + 1]])
+                           for true_class, class_df in enumerate(class_df_list)]
+
+            steps.append(dict(method="update",
+                              args=[{"marker.colorscale": colorscales}, layout_update, [1, 2]],
+                              label = str(round(threshold_values[i], n_of_decimals))))
+            continue
+
         step = dict(
             method="update",
             args=[{"visible": [False] * len(full_fig.data)},
-                  {"title": dict(text = main_title + '<span style="font-size: 13px;">' \
-                                 + titles[threshold_values[i]] + '</span>',
-                                 y = 0.965, yanchor = 'bottom')
-                  },
-                  #{"title": dict(text = main_title + '<span style="font-size: 13px;">' \
-                   #                           + subtitle + titles[threshold] + '</span>', 
-                   #                      y = 0.965, yanchor = 'bottom')}
+                  layout_update,
                   {"value": "set "}],
             label = str(round(threshold_values[i], n_of_decimals)),
         )
@@ -344,12 +537,14 @@ def predicted_proba_violin_plot(true_y, predicted_proba, threshold_step = 0.01,
             
     full_fig.update_xaxes(title_text = "True class")
     full_fig.update_yaxes(title_text = "Predicted probabilties")
-    full_fig.show(config = dict(displayModeBar = show_display_modebar))
     
+    return full_fig
+
 def predicted_proba_density_curve_plot(true_y, predicted_proba, 
                                        threshold_step = 0.01,  
                                        curve_type = 'kde',
-                                       title = "Interactive Probabilities Density Plot", show_display_modebar = True):
+                                       title = "Interactive Probabilities Density Plot", show_display_modebar = True,
+                                       compact = False, bandwidth = 'scott'):
     
     """
     Plots interactive and customized density curve of predicted probabilties with plotly, 
@@ -378,9 +573,37 @@ def predicted_proba_density_curve_plot(true_y, predicted_proba,
         The main title of the plot.
     show_display_modebar: bool, default=True
         Determines wether plotly displayModeBar will be shown
+    compact: bool, default=False
+        If True, the figure contains a single set of threshold dependent traces, whose data are swapped by the slider,
+        so that its size grows linearly with the number of thresholds (recommended for small threshold_step)
+    bandwidth: {'scott', 'silverman'} or float, default='scott'
+        bandwidth of the kernel density estimation (see utilities.get_density_curve_data)
     """
-    predicted_proba = np.array(predicted_proba)
-    true_y = np.array(true_y)
+    fig = build_predicted_proba_density_curve_plot(true_y, predicted_proba, threshold_step = threshold_step, 
+                                                   curve_type = curve_type, bandwidth = bandwidth, compact = compact, 
+                                                   title = title)
+    fig.show(config = dict(displayModeBar = show_display_modebar))
+
+def build_predicted_proba_density_curve_plot(true_y, predicted_proba, 
+                                             threshold_step = 0.01,  
+                                             curve_type = 'kde',
+                                             title = "Interactive Probabilities Density Plot", compact = False,
+                                             bandwidth = 'scott', _sorted_predictions = None):
+    
+    """
+    Builds the figure of predicted_proba_density_curve_plot and returns it without displaying it
+    (e.g. to export it, cache it or generate reports without a renderer)
+    
+    Parameters
+    ----------
+    see predicted_proba_density_curve_plot (show_display_modebar is not needed, since the figure is not displayed)
+    
+    Returns
+    ----------
+    fig: plotly.graph_objects.Figure
+        the figure (it can be displayed with fig.show())
+    """
+    true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
 
     try:
         n_of_decimals = len(str(threshold_step).rsplit('.')[1])
@@ -391,8 +614,8 @@ def predicted_proba_density_curve_plot(true_y, predicted_proba,
     main_title = f"<b>{title}</b><br>"
 
     # get density curve data
-    x_N,  y_N = _get_density_curve_data([predicted_proba[true_y==0]], curve_type = curve_type)
-    x_P,  y_P = _get_density_curve_data([predicted_proba[true_y==1]], curve_type = curve_type)
+    x_N,  y_N = get_density_curve_data(predicted_proba[true_y==0], curve_type = curve_type, bandwidth = bandwidth)
+    x_P,  y_P = get_density_curve_data(predicted_proba[true_y==1], curve_type = curve_type, bandwidth = bandwidth)
 
     # initialize figure
     fig = make_subplots(rows=2, cols=1,
@@ -401,12 +624,27 @@ def predicted_proba_density_curve_plot(true_y, predicted_proba,
     annotations={}
     titles = {}
 
-    for threshold in threshold_values:
+    restyle_data = [] # only used if compact
+    max_y = max(list(y_N) + list(y_P)) # needed to set y axis domain
 
-        y_pred = [int(x >= threshold) for x in predicted_proba]
-        cf_matrix = confusion_matrix(true_y, y_pred)
+    # confusion matrix counts for all thresholds
+    TN, FP, FN, TP = get_confusion_counts(true_y, predicted_proba, threshold_values, _sorted_predictions = _sorted_predictions)
+
+    for i, threshold in enumerate(threshold_values):
+
+        cf_matrix = np.array([[TN[i], FP[i]], 
+                              [FN[i], TP[i]]])
         titles[threshold] = "TN: {0}, FP: {1}, FN: {2}, TP: {3}".format(*cf_matrix.ravel())
 
+        # Create annotation that will slide with threshold line
+        annotations[threshold] = go.layout.Annotation(text="Predicted Negative        Predicted Positive",
+                                                      y=0.5,
+                                                      yref = "paper",
+                                                      x=threshold,
+                                                      visible=True,
+                                                      font=dict(size=14),
+                                                      showarrow=False) 
+
         # Select data for each confusion class
         first_idx_N = np.searchsorted(x_N, threshold)
         x_TN = x_N[:first_idx_N]
@@ -420,6 +658,17 @@ def predicted_proba_density_curve_plot(true_y, predicted_proba,
         x_TP = x_P[first_idx_P:]
         y_TP = y_P[first_idx_P:]
 
+        if compact:
+            # data of the 4 density curves and of the 2 threshold lines, swapped by the slider
+            restyle_data.append({'x': [x_TN.tolist(), x_FP.tolist(), x_FN.tolist(), x_TP.tolist(), 
+                                       [threshold, threshold], [threshold, threshold]],
+                                 'y': [y_TN.tolist(), y_FP.tolist(), y_FN.tolist(), y_TP.tolist(), 
+                                       [-1, max_y*1.1], [-1, max_y*1.1]],
+                                 'hovertemplate': ["Probability: %{x:.4~}<br>Count: " + str(count) 
+                                                   for count in cf_matrix.ravel()] + [None, None]})
+            if i > 0:
+                continue
+
         # Add 4 density curves
         fig.add_trace(go.Scatter(x=x_TN, y=y_TN,
                                  mode='lines',
@@ -469,8 +718,6 @@ def predicted_proba_density_curve_plot(true_y, predicted_proba,
                                 ), row=2, col = 1
                      )
 
-        max_y = max(list(y_N) + list(y_P)) # needed to set y axis domain
-
         # Add 2 threshold dotted line 
         fig.add_trace(go.Scatter(line=dict(dash='dash', color = '#20313e'), 
                                  x=[threshold, threshold], y=[-1, max_y*1.1],
@@ -481,16 +728,6 @@ def predicted_proba_density_curve_plot(true_y, predicted_proba,
 
         fig['data'][-1]['showlegend'] = True 
 
-        # Create annotation that will slide with threshold line
-        annotations[threshold] = go.layout.Annotation(text="Predicted Negative        Predicted Positive",
-                                                      y=0.5,
-                                                      yref = "paper",
-                                                      x=threshold,
-                                                      visible=True,
-                                                      font=dict(size=14),
-                                                      showarrow=False) 
-
-
     # Create label for each quadrant
     TN_annotation = go.layout.Annotation(text="TN",
                                          y=0.97, yref = "y domain", x=0.025,
@@ -527,7 +764,7 @@ def predicted_proba_density_curve_plot(true_y, predicted_proba,
     steps = []
     j = 0   # figure.data count
 
-    for threshold in threshold_values:
+    for i, threshold in enumerate(threshold_values):
 
         # Select annotations to be shown for each step: 
         # the correct annotation relative to the threshold line and the quadrant label (if there is enough space)
@@ -540,13 +777,21 @@ def predicted_proba_density_curve_plot(true_y, predicted_proba,
         else:
             annotation_list = [annotations[threshold], TN_annotation, FP_annotation, 
                                                        FN_annotation, TP_annotation]    
+        layout_update = {"title": dict(text = main_title + '<span style="font-size: 13px;">' \
+                                              + titles[threshold] + '</span>', 
+                                       y = 0.965, yanchor = 'bottom'),
+                         "annotations": annotation_list}
+        
+        if compact: # update data of the density curves and of the threshold lines
+            steps.append(dict(method="update",
+                              args=[restyle_data[i], layout_update, list(range(6))],
+                              label = str(round(threshold, n_of_decimals))))
+            continue
+        
         # Create slider step
         step = dict(method="update",
                     args=[{"visible": [False] * len(fig.data)},
-                          {"title": dict(text = main_title + '<span style="font-size: 13px;">' \
-                                                + titles[threshold] + '</span>', 
-                                         y = 0.965, yanchor = 'bottom'),
-                          "annotations": annotation_list}
+                          layout_update
                          ],
                     label = str(round(threshold, n_of_decimals))
                    )
@@ -581,14 +826,14 @@ def predicted_proba_density_curve_plot(true_y, predicted_proba,
                       yaxis1_title_text = 'Actual Negatives',
                       yaxis2_title_text = 'Actual Positives',
                       yaxis1_range=[0, max_y*1.1], yaxis2_range=[0, max_y*1.1])
-
-    fig.show(config = dict(displayModeBar = show_display_modebar))
+    
+    return fig
 
 def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01, 
                           amounts = None, cost_dict = None, optimize_threshold = None, 
                           N_subsets = 70, subsets_size = 0.2, with_replacement = False,
-                          currency = '€', random_state = None, 
-                          title = 'Interactive Confusion Matrix', show_display_modebar = True):
+                          currency = '€', random_state = None,
+                          title = 'Interactive Confusion Matrix', show_display_modebar = True, n_jobs = None, compact = False):
     
     """ 
     Plots interactive and customized confusion matrix with plotly, 
@@ -604,7 +849,7 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
     - table displaying metrics that vary based on the threshold selected:
       Accuracy, Balanced Acc., F1, Precision, Recall, MCC, Cohen's K
     - table displaying metrics that don't depend on threshold:
-      ROC auc, Pecision-Recall auc, Brier score 
+      ROC auc, Precision-Recall auc, Brier score, log-loss, calibration error 
     - when optimize_threshold is given:
       table displayng thresholds optimized using GHOST method for any of the following metrics:
       Kohen's Kappa, Matthew's Correlation Coefficient, ROC, F-beta scores (beta = 1, 0.5, 2) 
@@ -615,8 +860,10 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
 
     Parameters
     ----------
-    true_y: sequence of ints (0 or 1)
-        True labels 
+    true_y: sequence of ints (0 or 1) or ConfusionAccumulator
+        True labels, or accumulated statistics of data that don't fit in memory 
+        (in which case predicted_proba, amounts and cost_dict must be None, thresholds are the accumulator ones 
+        and threshold optimization is not available)
     predicted_proba: sequence of floats
         predicted probabilities for class 1
         (e.g. output from model.predict_proba(data)[:,1]) 
@@ -653,8 +900,50 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
         The main title of the plot.
     show_display_modebar: bool, default=True
         Determines wether plotly displayModeBar will be shown
+    n_jobs: int, default=None
+        Number of worker processes used when optimizing thresholds with GHOST method. 
+        None or 1 means no parallelism, -1 means using all processors
+    compact: bool, default=False
+        If True, the figure contains a single set of threshold dependent traces, whose data are swapped by the slider,
+        so that its size grows linearly with the number of thresholds (recommended for small threshold_step)
     
     """
+    fig, metrics_dep_on_threshold_df, constant_metrics_df, optimal_thresholds_df = \
+        build_confusion_matrix_plot(true_y, predicted_proba, threshold_step = threshold_step, 
+                                    amounts = amounts, cost_dict = cost_dict, optimize_threshold = optimize_threshold, 
+                                    N_subsets = N_subsets, subsets_size = subsets_size, with_replacement = with_replacement,
+                                    currency = currency, random_state = random_state, n_jobs = n_jobs, compact = compact, 
+                                    title = title)
+    fig.show(config = dict(displayModeBar = show_display_modebar))
+    
+    return metrics_dep_on_threshold_df, constant_metrics_df, optimal_thresholds_df
+
+def build_confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01, 
+                                amounts = None, cost_dict = None, optimize_threshold = None, 
+                                N_subsets = 70, subsets_size = 0.2, with_replacement = False,
+                                currency = '€', random_state = None,
+                                title = 'Interactive Confusion Matrix', n_jobs = None, compact = False,
+                                _sorted_predictions = None):
+    
+    """
+    Builds the figure of confusion_matrix_plot and returns it, together with the computed data, without displaying it
+    (e.g. to export it, cache it or generate reports without a renderer)
+    
+    Parameters
+    ----------
+    see confusion_matrix_plot (show_display_modebar is not needed, since the figure is not displayed)
+    
+    Returns
+    ----------
+    fig: plotly.graph_objects.Figure
+        the figure (it can be displayed with fig.show())
+    metrics_dep_on_threshold_df: pandas dataframe
+        metrics that depend on threshold, for each threshold
+    constant_metrics_df: pandas dataframe
+        metrics that don't depend on threshold
+    optimal_thresholds_df: pandas dataframe
+        optimized thresholds (None if optimize_threshold is None)
+    """
     if currency == '$': #correct dollar symbol for plotly in its HTML code
         currency = '&#36;'
     
@@ -663,14 +952,30 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
     except:
         n_of_decimals = 4
         
-    threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step)) #define thresholds array  
-    n_data = len(true_y)
+    if isinstance(true_y, ConfusionAccumulator):
+        accumulator = _check_accumulator_inputs(true_y, predicted_proba, amounts, cost_dict)
+        if optimize_threshold is not None:
+            raise ValueError("Threshold optimization is not available for a ConfusionAccumulator")
+        threshold_values = list(accumulator.threshold_values)
+        n_data = accumulator.n_data
+        amounts = accumulator.has_amounts or None # only used as flag from here on
+        cost_dict = accumulator.has_costs or None
+        tot_amount = accumulator.total_amount
+    else:
+        accumulator = None
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step)) #define thresholds array  
+        true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
+        n_data = len(true_y)
+        if amounts is not None:     
+            amounts = _get_values_array(amounts, 'amounts', n_data)
+            tot_amount = float(amounts.sum(dtype = float))
+        if cost_dict is not None:
+            cost_dict = CostModel.from_cost_dict(cost_dict, n_data = n_data)
+        
     main_title = f"<b>{title}</b><br>"
     subtitle = "Total obs: " + '{:,}'.format(n_data)
     
     if amounts is not None:     
-        amounts = list(amounts)
-        tot_amount = sum(amounts)
         subtitle += "<br>Total amount: " + currency + '{:,.2f}'.format(tot_amount)
     
     # initialize annotation matrix 
@@ -685,7 +990,7 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
                         horizontal_spacing = 0.01)
     
     # compute invariant metrics and create table with invariant metrics:
-    constant_metrics_df = get_invariant_metrics_df(true_y, predicted_proba)
+    constant_metrics_df = get_invariant_metrics_df(true_y, predicted_proba, _sorted_predictions = _sorted_predictions)
     fig.add_trace(
             go.Table(header=dict(values=['Invariant Metric', 'Value']),
                      cells=dict(values=[constant_metrics_df['invariant_metric'], constant_metrics_df['value']])
@@ -696,7 +1001,9 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
         
         # compute optimized thresholds and create dataframe
         optimal_thresholds_df = get_optimized_thresholds_df(optimize_threshold, threshold_values[1:-1], true_y, predicted_proba, 
-                                                            cost_dict, random_state)
+                                                            cost_dict, N_subsets = N_subsets, subsets_size = subsets_size, 
+                                                            with_replacement = with_replacement, 
+                                                            random_state = random_state, n_jobs = n_jobs)
         fig.add_trace(
                 go.Table(header=dict(values=['Optimized Metric', 'Optimal Threshold']),
                          cells=dict(values=[optimal_thresholds_df['optimized_metric'], optimal_thresholds_df['optimal_threshold']])
@@ -707,38 +1014,59 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
         
     # create dynamic titles dictionary (will be empty if cost is not given)
     titles = {}
+    restyle_data = [] # only used if compact
 
-    # initialize dataframe to store metrics dependent on threshold
-    metrics_dep_on_threshold_df = pd.DataFrame() 
+    # confusion matrix counts and metrics dependent on threshold, for all thresholds
+    if accumulator is not None:
+        TN, FP, FN, TP = accumulator.get_confusion_counts()
+    else:
+        TN, FP, FN, TP = get_confusion_counts(true_y, predicted_proba, threshold_values, _sorted_predictions = _sorted_predictions)
+    metrics_dep_on_threshold_df = get_metrics_dep_on_threshold_df(threshold_values, TN, FP, FN, TP)
+    
+    metrics_names = ['accuracy', 'balanced_accuracy', 'f1_score', 'precision', 'recall', "cohens_kappa", 'matthews_corr_coef']
+    metrics_values = metrics_dep_on_threshold_df[metrics_names].values
     
-    for threshold in threshold_values:
+    # amounts and costs for all thresholds
+    if accumulator is not None:
+        if amounts is not None:
+            amount_TN, amount_FP, amount_FN, amount_TP = accumulator.get_confusion_amounts()
+        if cost_dict:
+            cost_TN, cost_FP, cost_FN, cost_TP = accumulator.get_confusion_costs()
+    else:
+        if amounts is not None:
+            amount_TN, amount_FP, amount_FN, amount_TP = get_confusion_amounts(true_y, predicted_proba, threshold_values, amounts,
+                                                                               _sorted_predictions = _sorted_predictions)
+        if cost_dict:
+            cost_TN, cost_FP, cost_FN, cost_TP = get_confusion_costs(true_y, predicted_proba, threshold_values, cost_dict,
+                                                                     _sorted_predictions = _sorted_predictions)
+    
+    for i, threshold in enumerate(threshold_values):
         
         titles[threshold] = '' #set empty title
         
-        # get confusion matrix and metrics dep. on threshold
-        matrix, temp_metrics_df = get_confusion_matrix_and_metrics_df(true_y, predicted_proba, 
-                                                                      threshold = threshold, normalize = None)
-        # concat to metrics_dep_on_threshold_df
-        temp_metrics_df['threshold'] = threshold
-        metrics_dep_on_threshold_df = pd.concat([metrics_dep_on_threshold_df, temp_metrics_df])
+        # get confusion matrix
+        matrix = np.array([[TN[i], FP[i]], 
+                           [FN[i], TP[i]]])
         
         annotations = np.dstack((annotations_fixed, matrix/n_data)) # add count percentage to annotations matrix 
         
         # define dynamic annotations and hover text  
         template = "%{z} (%{text[2]:.2~%})"       # total count and perc.           
 
-        if amounts or cost_dict:
+        if (amounts is not None) or cost_dict:
             annotations_max_index = 2
         
-            if amounts:
-                amount_matrix = _get_amount_matrix(true_y, predicted_proba, threshold, amounts)
+            if amounts is not None:
+                amount_matrix = np.array([[amount_TN[i], amount_FP[i]],
+                                          [amount_FN[i], amount_TP[i]]])
                 annotations = np.dstack((annotations, amount_matrix, amount_matrix/tot_amount)) # add amount matrix and perc. matrix
                 annotations_max_index += 2
                 #add to template "Amount:" total and perc.
                 template +=  "<br>Amount: "+ currency + "%{text[3]:~s} (%{text[4]:.2~%})"       
 
             if cost_dict:
-                cost_matrix = _get_cost_matrix(true_y, predicted_proba, threshold, cost_dict)
+                cost_matrix = np.array([[cost_TN[i], cost_FP[i]],
+                                        [cost_FN[i], cost_TP[i]]])
                 total_cost = cost_matrix.sum()
                 annotations = np.dstack((annotations, cost_matrix, cost_matrix/total_cost))     # add cost matrix and perc. matrix
                 annotations_max_index += 2
@@ -752,10 +1080,20 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
         matrix[[0, 1]] = matrix[[1, 0]] 
         annotations[[0, 1]] = annotations[[1, 0]]
         
+        if compact:
+            # data of the variable metrics table and of the confusion matrix, swapped by the slider 
+            # (None resets attributes that the other trace doesn't have)
+            restyle_data.append({'cells.values': [[metrics_names, metrics_values[i].tolist()], None],
+                                 'z': [None, matrix.tolist()],
+                                 'text': [None, annotations.tolist()],
+                                 'name': [None, "threshold: " + str(round(threshold, n_of_decimals))]})
+            if i > 0:
+                continue
+        
         # table with metrics that depend on threshold        
         fig.add_trace(
             go.Table(header=dict(values=['Variable Metric', 'Value']),
-                     cells=dict(values=[temp_metrics_df[k].tolist() for k in temp_metrics_df.columns[:-1]]),
+                     cells=dict(values=[metrics_names, metrics_values[i].tolist()]),
                      visible=False
                     ),
             row=1, col=1)
@@ -772,11 +1110,6 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
                                showscale = False,
                                visible=False), row=2, col=1)  
     
-    # pivot metrics_dep_on_threshold_df 
-    name_col = metrics_dep_on_threshold_df.columns[0]
-    value_col = metrics_dep_on_threshold_df.columns[1]
-    metrics_dep_on_threshold_df = metrics_dep_on_threshold_df.pivot(columns = name_col, values = value_col, index = 'threshold').reset_index('threshold').rename_axis(None, axis=1)    
-    
     # fig.data[0] is the constant metrcis table, fig.data[1] is the optimal threshold table, always visible
     fig.data[2].visible = True   # first variable metrics table
     fig.data[3].visible = True   # first confusion matrix
@@ -785,12 +1118,20 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
     steps = []
     j = 2   # skip first and second trace (invariant metric table, opt. thresholds/empty table)
     
-    for threshold in threshold_values:
+    for i, threshold in enumerate(threshold_values):
+        layout_update = {"title": dict(text = main_title + '<span style="font-size: 13px;">' \
+                                              + subtitle + titles[threshold] + '</span>', 
+                                       y = 0.965, yanchor = 'bottom')}
+        
+        if compact: # update data of the variable metrics table and of the confusion matrix
+            steps.append(dict(method="update",
+                              args=[restyle_data[i], layout_update, [2, 3]],
+                              label = str(round(threshold, n_of_decimals))))
+            continue
+            
         step = dict(method="update",
                     args=[{"visible": [False] * len(fig.data)},
-                          {"title": dict(text = main_title + '<span style="font-size: 13px;">' \
-                                              + subtitle + titles[threshold] + '</span>', 
-                                         y = 0.965, yanchor = 'bottom')}
+                          layout_update
                          ],
                     label = str(round(threshold, n_of_decimals))
                    )
@@ -815,13 +1156,13 @@ def confusion_matrix_plot(true_y, predicted_proba, threshold_step = 0.01,
     
     fig.update_xaxes(title_text = "Predicted")
     fig.update_yaxes(title_text = "Actual")
-    fig.show(config = dict(displayModeBar = show_display_modebar))
     
-    return metrics_dep_on_threshold_df, constant_metrics_df, optimal_thresholds_df
+    return fig, metrics_dep_on_threshold_df, constant_metrics_df, optimal_thresholds_df
 
 def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01, 
                              amounts = None, cost_dict = None, currency = '€',
-                             title = 'Interactive Confusion Line Chart', show_display_modebar = True):
+                             title = 'Interactive Confusion Line Chart', show_display_modebar = True, compact = False,
+                             confidence_level = None, n_bootstraps = 200, random_state = None, n_jobs = None):
     
     """
     - Plots interactive and customized line-plots with plotly, one for each "confusion class" (TN, FP, FN, TP), 
@@ -837,8 +1178,9 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
 
     Parameters
     ----------
-    true_y: sequence of ints (0 or 1)
-        True labels 
+    true_y: sequence of ints (0 or 1) or ConfusionAccumulator
+        True labels, or accumulated statistics of data that don't fit in memory 
+        (in which case predicted_proba, amounts and cost_dict must be None and thresholds are the accumulator ones)
     predicted_proba: sequence of floats
         predicted probabilities for class 1
         (e.g. output from model.predict_proba(data)[:,1]) 
@@ -860,6 +1202,18 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
         The main title of the plot.
     show_display_modebar: bool, default=True
         Determines wether plotly displayModeBar will be shown
+    compact: bool, default=False
+        If True, the figure contains a single set of threshold dependent traces, whose data are swapped by the slider,
+        so that its size grows linearly with the number of thresholds (recommended for small threshold_step)
+    confidence_level: float, default=None
+        If given, the bootstrap confidence bands of amounts and costs at confidence_level (e.g. 0.95) are drawn 
+        around the line charts (see bootstrap.get_bootstrap_confidence_bands). Not available for a ConfusionAccumulator
+    n_bootstraps: int, default=200
+        Number of bootstrap replicates (only used if confidence_level is given)
+    random_state: int, default=None
+        Controls the randomness of the bootstrap (only used if confidence_level is given)
+    n_jobs: int, default=None
+        Number of worker processes the bootstrap replicates are distributed to (only used if confidence_level is given)
         
     Returns
     ----------   
@@ -872,6 +1226,39 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
     total_amounts: float
         sum of the amounts (or None if amounts is None)
     """
+    fig, amount_cost_df, tot_amount = build_confusion_linechart_plot(true_y, predicted_proba, threshold_step = threshold_step, 
+                                                                     amounts = amounts, cost_dict = cost_dict, 
+                                                                     currency = currency, compact = compact, 
+                                                                     confidence_level = confidence_level, 
+                                                                     n_bootstraps = n_bootstraps, random_state = random_state,
+                                                                     n_jobs = n_jobs, title = title)
+    fig.show(config = dict(displayModeBar = show_display_modebar))
+    
+    return amount_cost_df, tot_amount
+
+def build_confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01, 
+                                   amounts = None, cost_dict = None, currency = '€',
+                                   title = 'Interactive Confusion Line Chart', compact = False,
+                                   confidence_level = None, n_bootstraps = 200, random_state = None, n_jobs = None,
+                                   _sorted_predictions = None):
+    
+    """
+    Builds the figure of confusion_linechart_plot and returns it, together with the computed data, without displaying it
+    (e.g. to export it, cache it or generate reports without a renderer)
+    
+    Parameters
+    ----------
+    see confusion_linechart_plot (show_display_modebar is not needed, since the figure is not displayed)
+    
+    Returns
+    ----------
+    fig: plotly.graph_objects.Figure
+        the figure (it can be displayed with fig.show())
+    amount_cost_df: pandas dataframe
+        amounts and/or costs of each class (TN, FP, FN, TP) and total cost, for each threshold
+    total_amounts: float
+        sum of the amounts (or None if amounts is None)
+    """
     
     if currency == '$':
         currency = '&#36;'
@@ -881,22 +1268,42 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
     except:
         n_of_decimals = 4
         
-    threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+    if isinstance(true_y, ConfusionAccumulator):
+        accumulator = _check_accumulator_inputs(true_y, predicted_proba, amounts, cost_dict)
+        if confidence_level is not None:
+            raise TypeError("Confidence bands can't be computed from accumulated statistics")
+        threshold_values = list(accumulator.threshold_values)
+        n_data = accumulator.n_data
+        amounts = accumulator.has_amounts or None # only used as flag from here on
+        cost_dict = accumulator.has_costs or None
+        tot_amount = accumulator.total_amount
+    else:
+        accumulator = None
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+        true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
+        n_data = len(true_y)
+        if amounts is not None:
+            amounts = _get_values_array(amounts, 'amounts', n_data)
+            tot_amount = float(amounts.sum(dtype = float))
+        if cost_dict is not None:
+            cost_dict = CostModel.from_cost_dict(cost_dict, n_data = n_data)
+        
     middle_x = (threshold_values[0] + threshold_values[-1])/2  
-    n_data = len(true_y)
     main_title = f"<b>{title}</b><br>"
     subtitle = "Total obs: " + '{:,}'.format(n_data)
     
     if amounts is not None:
-        amounts = list(amounts)
-        tot_amount = sum(amounts)
         subtitle += "<br>Total amount: " + currency + '{:,.2f}'.format(tot_amount)
         
     # Create labels for titles
     label_lst = ["True Negative", "False Positive", "False Negative", "True Positive"]
 
     # get threshold-amount-cost dataframe (throws error if both cost_dict and amounts are None)
-    amount_cost_df = get_amount_cost_df(true_y, predicted_proba, threshold_values, amounts, cost_dict)
+    if accumulator is not None:
+        amount_cost_df = accumulator.get_amount_cost_df()
+    else:
+        amount_cost_df = get_amount_cost_df(true_y, predicted_proba, threshold_values, amounts, cost_dict,
+                                            _sorted_predictions = _sorted_predictions)
     
     # Create figure
     fig = make_subplots(
@@ -912,6 +1319,7 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
         annotation['y'] = annotation['y'] + 0.04  #move subplots title up 
     
     middle_y_lst = []
+    markers_restyle_data = [] # only used if compact
 
     if (amounts is not None) and (cost_dict is not None):
         static_charts_num = 12
@@ -983,8 +1391,10 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
                                    text=intercepts_str, row=row_index, col=col_index)
         
         # Create indicator markers
-        for threshold in threshold_values:
-            amount_cost_row = amount_cost_df.loc[amount_cost_df['threshold'] == threshold]
+        for i, threshold in enumerate(threshold_values):
+            amount_cost_row = amount_cost_df.iloc[i]
+            markers_data = {'x': [], 'y': [], 'textposition': []} # only used if compact
+            markers_restyle_data.append(markers_data)
             
             if threshold > middle_x:
                 left_or_right = ' left'
@@ -1024,6 +1434,13 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
                     else:
                         textposition_amount = 'bottom' + left_or_right
 
+                if compact:
+                    markers_data['x'] += [[threshold], [threshold]]
+                    markers_data['y'] += [[y_point_amount], [y_point_cost]]
+                    markers_data['textposition'] += [[textposition_amount], [textposition_cost]]
+                    if i > 0:
+                        continue
+
                 fig.add_trace(
                     go.Scatter(x = [threshold], 
                                y = [y_point_amount], 
@@ -1084,14 +1501,16 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
             middle_y_lst.append((max(fig.data[i]['y']) + min(fig.data[i]['y']))/2)
         
         # Create indicator markers
-        for threshold in threshold_values:
+        for i, threshold in enumerate(threshold_values):
             
             if threshold > middle_x:
                 left_or_right = ' left'
             else:
                 left_or_right = ' right'
                 
-            amount_cost_row = amount_cost_df.loc[amount_cost_df['threshold'] == threshold]     
+            amount_cost_row = amount_cost_df.iloc[i]     
+            markers_data = {'x': [], 'y': [], 'textposition': [], 'name': []} # only used if compact
+            markers_restyle_data.append(markers_data)
             
             for confusion_index, row_index, col_index, middle_y, color in zip([var_to_plot + '_TN', var_to_plot + '_FP',
                                                                                var_to_plot + '_FN', var_to_plot + '_TP'],
@@ -1106,6 +1525,14 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
                     textposition = 'top' + left_or_right
                 else:
                     textposition = 'bottom' + left_or_right
+                
+                if compact:
+                    markers_data['x'].append([threshold])
+                    markers_data['y'].append([y_point])
+                    markers_data['textposition'].append(textposition)
+                    markers_data['name'].append(str(round(threshold, n_of_decimals)))
+                    if i > 0:
+                        continue
                     
                 fig.add_trace(
                     go.Scatter(x = [threshold], 
@@ -1122,6 +1549,28 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
                                visible=False),
                 row = row_index, col = col_index)
 
+    # Create confidence bands of the line charts (after the markers, so that the indices of the markers are unchanged)
+    bands_num = 0
+    if confidence_level is not None:
+        bands_df = get_bootstrap_confidence_bands(true_y, predicted_proba, threshold_values, amounts, cost_dict, 
+                                                  n_bootstraps = n_bootstraps, confidence_level = confidence_level, 
+                                                  random_state = random_state, n_jobs = n_jobs,
+                                                  _sorted_predictions = _sorted_predictions)['amount_cost']
+        band_colors = {'amount': ['blue', 'red', '#EF71D9', '#00CC96'],
+                       'cost': ['blue', 'red', '#EF71D9', '#00CC96'] if amounts is None else \
+                               ['rgb(128, 177, 211)', 'rgb(251, 128, 114)', 'rgb(220, 186, 218)', 'rgb(141, 211, 199)']}
+        
+        for var_to_band, is_given in [('amount', amounts is not None), ('cost', cost_dict is not None)]:
+            if not is_given:
+                continue
+            for confusion_index, row_index, col_index, color in zip(['TN', 'FP', 'FN', 'TP'], [1, 1, 2, 2], [1, 2, 1, 2],
+                                                                    band_colors[var_to_band]):
+                column = var_to_band + '_' + confusion_index
+                for band_trace in _get_confidence_band_traces(bands_df['threshold'], bands_df[column + '_lower'], 
+                                                              bands_df[column + '_upper'], color):
+                    fig.add_trace(band_trace, row = row_index, col = col_index)
+                    bands_num += 1
+    
     # if both amounts and cost are given, static_charts_num = 12  
     # (4 linecharts for amount, 4 for cost, 4 for intercepts) from fig.data[0] to fig.data[11]
     # if either amounts or cost is not given, static_charts_num = 4 
@@ -1135,18 +1584,28 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
     steps = []
     j = static_charts_num 
     
-    for threshold in threshold_values:
+    for i, threshold in enumerate(threshold_values):
+        layout_update = {"title": dict(text = main_title + '<span style="font-size: 13px;">' \
+                                              + subtitle + titles[threshold] + '</span>',
+                                       y = 0.965, yanchor = 'bottom')}
+        
+        if compact: # update data of the line chart markers
+            steps.append(dict(method="update",
+                              args=[markers_restyle_data[i], layout_update, 
+                                    list(range(static_charts_num, static_charts_num + markers_num))],
+                              label = str(round(threshold, n_of_decimals))))
+            continue
+        
         step = dict(
             method="update",
             args=[{"visible": [False] * len(fig.data)},
-                  {"title": dict(text = main_title + '<span style="font-size: 13px;">' \
-                                          + subtitle + titles[threshold] + '</span>',
-                                 y = 0.965, yanchor = 'bottom')}
+                  layout_update
                  ],
             label = str(round(threshold, n_of_decimals))
         )
         step["args"][0]["visible"][:static_charts_num] = [True]*static_charts_num   # line charts 
         step["args"][0]["visible"][j:j+markers_num] = [True]*markers_num            # line chart markers 
+        step["args"][0]["visible"][len(fig.data)-bands_num:] = [True]*bands_num     # confidence bands
             
         j += markers_num
         steps.append(step)
@@ -1173,15 +1632,13 @@ def confusion_linechart_plot(true_y, predicted_proba, threshold_step = 0.01,
     # Update yaxis properties
     fig.update_yaxes(title_text="Amount/Cost", title_font_size=12, row=1, col=1)
     fig.update_yaxes(title_text="Amount/Cost", title_font_size=12, row=2, col=1)
-
-    fig.show(config = dict(displayModeBar = show_display_modebar))
     
     try:
         tot_amount = round(tot_amount, 2)
     except:
         tot_amount = None    
         
-    return amount_cost_df, tot_amount
+    return fig, amount_cost_df, tot_amount
 
 def total_amount_cost_plot(true_y, predicted_proba, threshold_step = 0.01,
                            amounts = None, cost_dict = None,
@@ -1200,8 +1657,9 @@ def total_amount_cost_plot(true_y, predicted_proba, threshold_step = 0.01,
 
     Parameters
     ----------
-    true_y: sequence of ints (0 or 1)
-        True labels 
+    true_y: sequence of ints (0 or 1) or ConfusionAccumulator
+        True labels, or accumulated statistics of data that don't fit in memory 
+        (in which case predicted_proba, amounts and cost_dict must be None and thresholds are the accumulator ones)
     predicted_proba: sequence of floats
         predicted probabilities for class 1
         (e.g. output from model.predict_proba(data)[:,1]) 
@@ -1238,6 +1696,34 @@ def total_amount_cost_plot(true_y, predicted_proba, threshold_step = 0.01,
         - if cost_dict/cost_classes are given: cost relative to the user-selected classes and sum
 
     """
+    fig, amount_cost_df = build_total_amount_cost_plot(true_y, predicted_proba, threshold_step = threshold_step, 
+                                                       amounts = amounts, cost_dict = cost_dict, 
+                                                       amount_classes = amount_classes, cost_classes = cost_classes, 
+                                                       currency = currency, title = title)
+    fig.show(config = dict(displayModeBar = show_display_modebar))
+    
+    return amount_cost_df
+
+def build_total_amount_cost_plot(true_y, predicted_proba, threshold_step = 0.01,
+                                 amounts = None, cost_dict = None,
+                                 amount_classes = 'all', cost_classes = 'all', currency = '€',
+                                 title = 'Interactive Amount-Cost Line Chart', _sorted_predictions = None):
+    
+    """
+    Builds the figure of total_amount_cost_plot and returns it, together with the computed data, without displaying it
+    (e.g. to export it, cache it or generate reports without a renderer)
+    
+    Parameters
+    ----------
+    see total_amount_cost_plot (show_display_modebar is not needed, since the figure is not displayed)
+    
+    Returns
+    ----------
+    fig: plotly.graph_objects.Figure
+        the figure (it can be displayed with fig.show())
+    amount_cost_df: pandas dataframe
+        amounts and/or costs of the user-selected classes and their sums, for each threshold
+    """
     
     if currency == '$':
         currency = '&#36;'
@@ -1247,13 +1733,25 @@ def total_amount_cost_plot(true_y, predicted_proba, threshold_step = 0.01,
     except:
         n_of_decimals = 4
         
-    threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step)) 
+    if isinstance(true_y, ConfusionAccumulator):
+        accumulator = _check_accumulator_inputs(true_y, predicted_proba, amounts, cost_dict)
+        threshold_values = list(accumulator.threshold_values)
+        amounts = accumulator.has_amounts or None # only used as flags from here on
+        cost_dict = accumulator.has_costs or None
+    else:
+        accumulator = None
+        true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step)) 
+        if cost_dict is not None:
+            cost_dict = CostModel.from_cost_dict(cost_dict, n_data = len(true_y))
+    
     middle_x = (threshold_values[0] + threshold_values[-1])/2  
     
     supported_label = ["TN", "FP", "FN", "TP"]
     
     if amounts is not None:      # if amount_classes not given or 'all', set to ["TN", "FP", "FN", "TP"]
-        amounts = list(amounts)
+        if accumulator is None:
+            amounts = _get_values_array(amounts, 'amounts', len(true_y))
         if (amount_classes is None) or (amount_classes == 'all'):
             amount_classes = supported_label
     elif amount_classes is not None:
@@ -1266,7 +1764,11 @@ def total_amount_cost_plot(true_y, predicted_proba, threshold_step = 0.01,
         raise TypeError("if cost_classes is given, cost_dict can't be None.") 
         
     # get threshold-amount-cost dataframe (throws error if both cost_dict and amounts are None)
-    amount_cost_df = get_amount_cost_df(true_y, predicted_proba, threshold_values, amounts, cost_dict)
+    if accumulator is not None:
+        amount_cost_df = accumulator.get_amount_cost_df()
+    else:
+        amount_cost_df = get_amount_cost_df(true_y, predicted_proba, threshold_values, amounts, cost_dict,
+                                            _sorted_predictions = _sorted_predictions)
     
     # Create figure
     fig = go.Figure()
@@ -1282,7 +1784,7 @@ def total_amount_cost_plot(true_y, predicted_proba, threshold_step = 0.01,
             amount_classes = [amount_classes]
         
         amount_col_lst = ['amount_' + amount_class for amount_class in amount_classes]
-        amount_cost_df['amount_sum'] = amount_cost_df[amount_col_lst].apply(sum, axis = 1)        
+        amount_cost_df['amount_sum'] = amount_cost_df[amount_col_lst].sum(axis = 1)        
         col_lst += amount_col_lst + ['amount_sum']
         fig.add_trace(
             go.Scatter(x = amount_cost_df['threshold'],
@@ -1302,7 +1804,7 @@ def total_amount_cost_plot(true_y, predicted_proba, threshold_step = 0.01,
             cost_classes = [cost_classes]
 
         cost_col_lst = ['cost_' + cost_class for cost_class in cost_classes]
-        amount_cost_df['cost_sum'] = amount_cost_df[cost_col_lst].apply(sum, axis = 1)        
+        amount_cost_df['cost_sum'] = amount_cost_df[cost_col_lst].sum(axis = 1)        
         col_lst += cost_col_lst + ['cost_sum']
         fig.add_trace(
             go.Scatter(x = amount_cost_df['threshold'],
@@ -1356,10 +1858,105 @@ def total_amount_cost_plot(true_y, predicted_proba, threshold_step = 0.01,
     fig.update_xaxes(title_text="Threshold")
     fig.update_yaxes(title_text="Amount/Cost")
     
-    fig.show(config = dict(displayModeBar = show_display_modebar))
-    
-    return amount_cost_df[['threshold'] + col_lst]
+    return fig, amount_cost_df[['threshold'] + col_lst]
 
 
 
                    
+
+def _check_accumulator_inputs(accumulator, predicted_proba, amounts, cost_dict):
+    # When a ConfusionAccumulator is given, data, amounts and costs are already accumulated
+    if (predicted_proba is not None) or (amounts is not None) or (cost_dict is not None):
+        raise TypeError("When a ConfusionAccumulator is given, predicted_proba, amounts and cost_dict must be None")
+    return accumulator
+
+def _get_stratified_sample_index(true_y, predicted_proba, max_points):
+    # Indices of at most max_points observations, evenly spaced along the sorted predicted probabilities of each class
+    sample_index = []
+    for true_class in [0, 1]:
+        class_index = np.flatnonzero(true_y == true_class)
+        class_index = class_index[np.argsort(predicted_proba[class_index], kind = 'stable')]
+        n_class_points = int(round(max_points * len(class_index) / len(true_y)))
+        if (n_class_points == 0) and (len(class_index) > 0):
+            n_class_points = 1
+        positions = np.unique(np.linspace(0, len(class_index) - 1, n_class_points).round().astype(int))
+        sample_index.append(class_index[positions])
+    return np.sort(np.concatenate(sample_index))
+
+def _get_threshold_colorscale(sorted_proba, threshold, color_below, color_above):
+    # Colorscale (on [0, 1]) coloring predicted probabilities below the threshold with color_below and the others with color_above;
+    # the color changes halfway between the given sorted probabilities, so that no point lies on the boundary
+    n_below = np.searchsorted(sorted_proba, threshold, side = 'left')
+    if n_below == 0:
+        return [[0, color_above], [1, color_above]]
+    if n_below == len(sorted_proba):
+        return [[0, color_below], [1, color_below]]
+    boundary = float(sorted_proba[n_below - 1] + sorted_proba[n_below]) / 2
+    return [[0, color_below], [boundary, color_below], [boundary, color_above], [1, color_above]]
+
+def _get_simplified_curve_index(x, y, max_points = None, tolerance = None):
+    # Sorted indices of the vertices of the simplified polyline (x, y), endpoints included, chosen greedily 
+    # as in Ramer-Douglas-Peucker: the vertex farthest from the simplified polyline is added first, until there are
+    # max_points vertices, or until both the distance of every vertex from the simplified polyline and the error 
+    # of its (trapezoidal) area are within tolerance. Returns also a dict with the number of points and the errors
+    if (max_points is not None) and (max_points < 2):
+        raise ValueError("max_points must be at least 2, to keep the endpoints of the curve")
+    if (tolerance is not None) and (tolerance < 0):
+        raise ValueError("tolerance must be non-negative")
+    x, y = np.asarray(x, dtype = float), np.asarray(y, dtype = float)
+    
+    # area under the polyline up to each vertex, and error of the area of a segment that skips the inner vertices
+    cum_area = np.concatenate([[0], np.cumsum(np.diff(x) * (y[:-1] + y[1:]) / 2)])
+    segment_area_error = lambda start, end: cum_area[end] - cum_area[start] - (x[end] - x[start]) * (y[start] + y[end]) / 2
+
+    curve_index = [0, len(x) - 1]
+    area_error = segment_area_error(0, len(x) - 1)
+    segments_heap = []
+    _push_farthest_vertex(segments_heap, x, y, 0, len(x) - 1)
+    
+    while segments_heap:
+        max_distance = -segments_heap[0][0]
+        if (tolerance is not None) and (max_distance <= tolerance) and (abs(area_error) <= tolerance):
+            break
+        if (max_points is not None) and (len(curve_index) >= max_points) and (tolerance is None):
+            break
+        
+        _, start, end, index = heapq.heappop(segments_heap)
+        curve_index.append(index)
+        area_error += segment_area_error(start, index) + segment_area_error(index, end) - segment_area_error(start, end)
+        _push_farthest_vertex(segments_heap, x, y, start, index)
+        _push_farthest_vertex(segments_heap, x, y, index, end)
+    
+    if (max_points is not None) and (len(curve_index) > max_points):
+        warnings.warn(f"{len(curve_index)} points (more than max_points) are needed to simplify the curve within tolerance")
+    
+    curve_meta = dict(n_points = len(x), n_plotted_points = len(curve_index),
+                      max_distance = float(-segments_heap[0][0]) if segments_heap else 0., 
+                      area_error = float(abs(area_error)))
+    
+    return np.sort(curve_index), curve_meta
+
+def _push_farthest_vertex(segments_heap, x, y, start, end):
+    # Pushes on the heap the vertex between start and end farthest from the segment joining them,
+    # as (- distance, start, end, index), so that the farthest vertex of all segments is popped first
+    if end - start < 2:
+        return
+    dx, dy = x[end] - x[start], y[end] - y[start]
+    inner_dx, inner_dy = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+    length = np.hypot(dx, dy)
+    if length == 0:
+        distances = np.hypot(inner_dx, inner_dy)
+    else:
+        distances = np.abs(dx * inner_dy - dy * inner_dx) / length
+    farthest = int(np.argmax(distances))
+    heapq.heappush(segments_heap, (-distances[farthest], start, end, start + 1 + farthest))
+
+def _get_confidence_band_traces(x, lower, upper, color, name = None):
+    # Traces of a confidence band: the upper bound line and the lower bound line filled up to it,
+    # both without line and hover information (the band is in the legend only if name is given)
+    upper_trace = go.Scatter(x = list(x), y = list(upper), mode = 'lines', line = dict(width = 0, color = color),
+                             showlegend = False, hoverinfo = 'skip')
+    lower_trace = go.Scatter(x = list(x), y = list(lower), mode = 'lines', line = dict(width = 0, color = color),
+                             fill = 'tonexty', fillcolor = color, opacity = 0.2, name = name, 
+                             showlegend = name is not None, hoverinfo = 'skip')
+    return [upper_trace, lower_trace]
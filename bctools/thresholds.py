@@ -4,22 +4,37 @@
 import pandas as pd
 import numpy as np
 import os
-import warnings
+import atexit
 
-from sklearn import metrics
 from sklearn.model_selection import train_test_split
 from sklearn.utils import resample
 
-from itertools import repeat
 from multiprocessing import Pool
 
+try:
+    from multiprocessing import shared_memory
+except ImportError: # python < 3.8: subsets are processed serially
+    shared_memory = None
+
+from .cache import _memoize
+from .confusion import get_breakpoint_thresholds, _get_threshold_bins, _get_class_histograms, _get_below_above_from_hist
+from .confusion import CostModel, _get_cost_array
+from .validation import _get_labels_array, _get_labels_scores_arrays
+from .utilities import _safe_divide, _get_cohens_kappa, _get_matthews_corr_coef
+
+# process pool reused across GHOST optimizations and bootstraps (see _get_pool)
+_pool = None
+_pool_n_workers = None
+
+@_memoize(ignore = ['n_jobs'], seed_argument = 'random_state')
 def get_optimized_thresholds_df(optimize_threshold, threshold_values, true_y, predicted_proba,
                                 cost_dict = None, 
                                 N_subsets = 70, subsets_size = 0.2, with_replacement = False,
-                                random_state = None):
+                                random_state = None, n_jobs = None, return_curves = False, n_breakpoints = None):
    
     """ 
     Returns a dataframe with optimal decision thresholds, for given metrics, computed with GHOST method.
+    The subsets are drawn once and all the metrics are evaluated on the same subsets.
     
     Parameters
     ----------
@@ -27,23 +42,51 @@ def get_optimized_thresholds_df(optimize_threshold, threshold_values, true_y, pr
                         or list containing allowed values except 'all' 
         metrics for which thresholds will be optimized 
         'all' is equvalent to ['ROC', 'MCC', 'Kappa', 'Fscore'] if cost_dict=None, ['ROC', 'MCC', 'Kappa', 'Fscore', 'Cost'] otherwise
-    threshold_values: list of three floats 
-        List of decision thresholds to screen for classification
+    threshold_values: list of floats or 'exact'
+        List of decision thresholds to screen for classification.
+        If 'exact', every distinct value of predicted_proba is screened 
+        (i.e. every threshold at which the confusion matrix changes)
     true_y: sequence of ints
         True labels 
     predicted_proba: sequence of floats
         predicted probabilities for class 1
+    cost_dict: dict, default=None
+        dict containing costs associated to each class (TN, FP, FN, TP)
+        with keys "TN", "FP", "FN", "TP" 
+        and values that can be both lists (with coherent lenghts) and/or floats  
+        (output from get_cost_dict), necessary when optimizing threshold for minimal total costs
+    N_subsets: int, default=70
+        Number of subsets used in the optimization process
+    subsets_size: float or int, default=0.2
+        Size of the subsets used in the optimization process. 
+        If float, represents the proportion of the dataset to include in the subsets. 
+        If integer, it represents the actual number of instances to include in the subsets. 
+    with_replacement: bool, default=False
+        If True, the subsets are drawn randomly with replacement, without otherwise.
     random_state: int, default=None
         Controls the randomness of the bootstrapping of the samples when optimizing thresholds with GHOST method
+    n_jobs: int, default=None
+        Number of worker processes used by GHOST method. 
+        None or 1 means no parallelism, -1 means using all processors
+    return_curves: bool, default=False
+        If True, the dataframe of the GHOST curves is returned too
+    n_breakpoints: int, default=None
+        Only used if threshold_values is 'exact': if given, thresholds are compressed 
+        to at most n_breakpoints quantiles of predicted_proba (recommended for large datasets, 
+        since memory grows with N_subsets * number of thresholds)
     
     Returns
     ----------
     optimal_thresholds_df: pandas dataframe
         Dataframe containing optimal thresholds
+    ghost_curves_df: pandas dataframe (only if return_curves is True)
+        Dataframe containing, for each threshold and optimized metric: 
+        - <metric>_median: curve maximized (minimized for cost) by GHOST method, i.e. median of the metric over the subsets
+          (for roc and F-scores, computed from the medians of sensitivity/specificity and precision/recall)
+        - <metric>_std: standard deviation of the metric over the subsets
     """
     
     threshold_names_lst = []
-    threshold_array = np.array([])
     supported_metrics = ['Kappa', 'MCC', 'ROC', 'Fscore', 'Cost']
 
     if optimize_threshold == 'all':
@@ -70,31 +113,38 @@ def get_optimized_thresholds_df(optimize_threshold, threshold_values, true_y, pr
             threshold_names_lst.append('f05_score')
         else:
             threshold_names_lst.append(metric_name.lower())
-        
-        if metric_name == 'Cost':
-            threshold_array = np.append(threshold_array, 
-                                        np.round(get_cost_optimal_threshold(true_y, predicted_proba,
-                                                                          threshold_values, cost_dict, 
-                                                                          N_subsets = N_subsets, subsets_size = subsets_size, 
-                                                                          with_replacement = with_replacement, 
-                                                                          random_seed = random_state),
-                                                5))
-        else:
-            threshold_array = np.append(threshold_array, 
-                                        np.round(get_optimal_threshold(true_y, predicted_proba,
-                                                                     threshold_values, ThOpt_metrics = metric_name, 
-                                                                     N_subsets = N_subsets, subsets_size = subsets_size,
-                                                                     with_replacement = with_replacement, 
-                                                                     random_seed = random_state),
-                                                 5))
-        
-    threshold_array = np.ravel(threshold_array)
+    
+    exact_thresholds = isinstance(threshold_values, str)
+    if exact_thresholds:
+        if threshold_values != 'exact':
+            raise ValueError(f"threshold_values must be a list of floats or 'exact', got '{threshold_values}'")
+        threshold_values = get_breakpoint_thresholds(predicted_proba, n_breakpoints)
+    
+    # draw the subsets once and compute counts (and costs) for all the metrics 
+    tensors = _get_subsets_confusion_tensors(true_y, predicted_proba, threshold_values, N_subsets, subsets_size, 
+                                             with_replacement, random_state, 
+                                             cost_dict = cost_dict if 'Cost' in optimize_threshold else None, 
+                                             n_jobs = n_jobs)
+    ghost_curves = _get_ghost_curves(tensors, threshold_names_lst)
+    
+    threshold_array = np.array([_get_ghost_optimal_threshold(threshold_values, ghost_curves, threshold_name) 
+                                for threshold_name in threshold_names_lst])
+    if not exact_thresholds: # breakpoints are not rounded, since rounding could change the confusion matrix
+        threshold_array = np.round(threshold_array, 5)
     optimal_thresholds_df = pd.DataFrame(zip(threshold_names_lst, threshold_array), columns = ['optimized_metric', 'optimal_threshold']) 
+    
+    if return_curves:
+        ghost_curves_df = pd.DataFrame({'threshold': np.asarray(threshold_values, dtype = float)})
+        for threshold_name in threshold_names_lst:
+            ghost_curves_df[threshold_name + '_median'], ghost_curves_df[threshold_name + '_std'] = ghost_curves[threshold_name]
+        return optimal_thresholds_df, ghost_curves_df
+    
     return optimal_thresholds_df
 
+@_memoize(ignore = ['n_jobs'], seed_argument = 'random_seed')
 def get_optimal_threshold(labels, probs, thresholds, 
                           ThOpt_metrics = 'Kappa', N_subsets = 70, 
-                          subsets_size = 0.2, with_replacement = False, random_seed = None):
+                          subsets_size = 0.2, with_replacement = False, random_seed = None, n_jobs = None):
 
     """ Optimize the decision threshold based on subsets of the given set (GHOST method).
     The threshold that maximizes the chosen metric on the subsets is chosen as optimal.
@@ -120,6 +170,10 @@ def get_optimal_threshold(labels, probs, thresholds,
         If True, the subsets are drawn randomly with replacement, without otherwise.
     random_seed: int,  default=None
         Controls the randomness of the bootstrapping of the samples 
+    n_jobs: int, default=None
+        Number of worker processes the subsets are distributed to. 
+        None or 1 means no parallelism, -1 means using all processors. 
+        Data are placed once in shared memory and the process pool is reused across calls.
     
     Returns
     ----------
@@ -136,116 +190,31 @@ def get_optimal_threshold(labels, probs, thresholds,
     
     if ThOpt_metrics not in supported_metrics:
         raise ValueError(f"Metric {ThOpt_metrics} not supported. Supported metrics: {str(supported_metrics)}")
-            
-    # seeding
-    np.random.seed(random_seed)
-    random_seeds = np.random.randint(N_subsets*10, size=N_subsets)  
-    
-    df_preds = pd.DataFrame({'labels':labels,'probs':probs})
-    thresh_names = [str(x) for x in thresholds]
-    for thresh in thresholds:
-        df_preds = pd.concat([df_preds, pd.Series([1 if x>=thresh else 0 for x in probs], name=str(thresh))], axis=1)
-        
-    n = max(os.cpu_count()-1, 1)
-            
-    if ThOpt_metrics == 'ROC':
-        sensitivity_accum = []
-        specificity_accum = []
-        pool = Pool(n)
-        
-        # Calculate sensitivity and specificity for a range of thresholds and N_subsets
-        for i in range(N_subsets):
-            if with_replacement:
-                if isinstance(subsets_size, float):
-                    Nsamples = int(df_preds.shape[0]*subsets_size)
-                elif isinstance(subsets_size, int):
-                    Nsamples = subsets_size                    
-                df_subset = resample(df_preds, n_samples = Nsamples, stratify=labels, random_state = random_seeds[i])
-                labels_subset = list(df_subset['labels'])
-            else:
-                df_tmp, df_subset, labels_tmp, labels_subset = train_test_split(df_preds, labels, test_size = subsets_size, 
-                                                                                stratify = labels, random_state = random_seeds[i])
-
-            result = pool.starmap(_compute_sensitivity_specificity, 
-                                  zip(repeat(labels_subset), [list(df_subset[threshold]) for threshold in thresh_names]))
-            result_array = np.array(result)
-            sensitivity_accum.append(result_array[:, 0])
-            specificity_accum.append(result_array[:, 1])
-        pool.close()
-    
-        # determine the threshold that provides the best results on the training subsets
-        median_sensitivity, std_sensitivity = _helper_calc_median_std(sensitivity_accum)
-        median_specificity, std_specificity = _helper_calc_median_std(specificity_accum)
-        roc_dist_01corner = (2*median_sensitivity*median_specificity)/(median_sensitivity+median_specificity)
-        opt_thresh = thresholds[np.argmax(roc_dist_01corner)]
-        
-        return opt_thresh
-        
-    elif ThOpt_metrics == 'Fscore':
-        recall_accum = []
-        precision_accum = []
-        pool = Pool(n)
+    
+    # confusion counts of every subset for every threshold, arrays with shape (N_subsets, len(thresholds))
+    tensors = _get_subsets_confusion_tensors(labels, probs, thresholds, N_subsets, subsets_size, 
+                                             with_replacement, random_seed, n_jobs = n_jobs)
+    
+    # determine the threshold that provides the best results on the training subsets
+    if ThOpt_metrics == 'Fscore':
+        ghost_curves = _get_ghost_curves(tensors, ['f1_score', 'f2_score', 'f05_score'])
         
-        # Calculate sensitivity and specificity for a range of thresholds and N_subsets
-        for i in range(N_subsets):
-            if with_replacement:
-                if isinstance(subsets_size, float):
-                    Nsamples = int(df_preds.shape[0]*subsets_size)
-                elif isinstance(subsets_size, int):
-                    Nsamples = subsets_size                    
-                df_subset = resample(df_preds, n_samples = Nsamples, stratify=labels, random_state = random_seeds[i])
-                labels_subset = list(df_subset['labels'])
-            else:
-                df_tmp, df_subset, labels_tmp, labels_subset = train_test_split(df_preds, labels, test_size = subsets_size, 
-                                                                                stratify = labels, random_state = random_seeds[i])
-
-            result = pool.starmap(_compute_precision_recall, 
-                                  zip(repeat(labels_subset), [list(df_subset[threshold]) for threshold in thresh_names]))
-            result_array = np.array(result)
-            precision_accum.append(result_array[:, 0])
-            recall_accum.append(result_array[:, 1])
-        pool.close()
-    
-        # determine the threshold that provides the best results on the training subsets
-        median_precision, std_precision = _helper_calc_median_std(precision_accum)
-        median_recall, std_recall = _helper_calc_median_std(recall_accum)
-        f1 = (2*median_precision*median_recall)/(median_precision+median_recall)
-        opt_thresh_f1 = thresholds[np.argmax(f1)]
-        f2 = (5*median_precision*median_recall)/(4*median_precision+median_recall) 
-        opt_thresh_f2 = thresholds[np.argmax(f2)]
-        fpoint5 = (1.25*median_precision*median_recall)/(0.25*median_precision+median_recall)
-        opt_thresh_fpoint5 = thresholds[np.argmax(fpoint5)]
+        opt_thresh_f1 = _get_ghost_optimal_threshold(thresholds, ghost_curves, 'f1_score')
+        opt_thresh_f2 = _get_ghost_optimal_threshold(thresholds, ghost_curves, 'f2_score')
+        opt_thresh_fpoint5 = _get_ghost_optimal_threshold(thresholds, ghost_curves, 'f05_score')
         
         return opt_thresh_f1, opt_thresh_f2, opt_thresh_fpoint5
         
     else:
-        score_accum = []
-        pool = Pool(n)
-        for i in range(N_subsets):
-            if with_replacement:
-                if isinstance(subsets_size, float):
-                    Nsamples = int(df_preds.shape[0]*subsets_size)
-                elif isinstance(subsets_size, int):
-                    Nsamples = subsets_size                    
-                df_subset = resample(df_preds, replace=True, n_samples = Nsamples, stratify=labels, random_state = random_seeds[i])
-                labels_subset = df_subset['labels']
-            else:
-                df_tmp, df_subset, labels_tmp, labels_subset = train_test_split(df_preds, labels, test_size = subsets_size, 
-                                                                                stratify = labels, random_state = random_seeds[i])
-            result = pool.starmap(_get_metric_function(ThOpt_metrics), 
-                                  zip(repeat(labels_subset), [list(df_subset[threshold]) for threshold in thresh_names]))
-            score_accum.append(result)
-        pool.close()
-
-        # determine the threshold that provides the best results on the training subsets
-        y_values_median, y_values_std = _helper_calc_median_std(score_accum)
-        opt_thresh = thresholds[np.argmax(y_values_median)]
+        ghost_curves = _get_ghost_curves(tensors, [ThOpt_metrics.lower()])
+        opt_thresh = _get_ghost_optimal_threshold(thresholds, ghost_curves, ThOpt_metrics.lower())
         
         return opt_thresh
 
+@_memoize(ignore = ['n_jobs'], seed_argument = 'random_seed')
 def get_cost_optimal_threshold(labels, probs, thresholds, cost_dict, 
                                N_subsets = 70, subsets_size = 0.2, 
-                               with_replacement = False, random_seed = None):
+                               with_replacement = False, random_seed = None, n_jobs = None):
 
     """ Optimize the decision threshold for minimal cost based on subsets of the given set (GHOST method).
     
@@ -273,6 +242,10 @@ def get_cost_optimal_threshold(labels, probs, thresholds, cost_dict,
         If True, the subsets are drawn randomly with replacement, without otherwise.
     random_seed: int,  default=None
         Controls the randomness of the bootstrapping of the samples 
+    n_jobs: int, default=None
+        Number of worker processes the subsets are distributed to. 
+        None or 1 means no parallelism, -1 means using all processors. 
+        Data are placed once in shared memory and the process pool is reused across calls.
     
     Returns
     ----------
@@ -280,88 +253,290 @@ def get_cost_optimal_threshold(labels, probs, thresholds, cost_dict,
         Optimal decision threshold 
     """
     
-    # seeding
-    np.random.seed(random_seed)
-    random_seeds = np.random.randint(N_subsets*10, size=N_subsets)  
+    # costs of every subset for every threshold, arrays with shape (N_subsets, len(thresholds))
+    tensors = _get_subsets_confusion_tensors(labels, probs, thresholds, N_subsets, subsets_size, 
+                                             with_replacement, random_seed, cost_dict = cost_dict, n_jobs = n_jobs)
+
+    # determine the threshold that provides the best results on the training subsets
+    ghost_curves = _get_ghost_curves(tensors, ['cost'])
+    opt_thresh = _get_ghost_optimal_threshold(thresholds, ghost_curves, 'cost')
+
+    return opt_thresh
+
+def _get_ghost_curves(tensors, threshold_names):
+    
+    """ 
+    Computes GHOST curves of the given metrics from the counts (and costs) of the subsets
+    
+    Parameters
+    ----------
+    tensors: dict
+        output from _get_subsets_confusion_tensors
+    threshold_names: list of str {'kappa', 'mcc', 'roc', 'f1_score', 'f2_score', 'f05_score', 'cost'}
+        names of the metrics
+    
+    Returns
+    ----------
+    ghost_curves: dict
+        for each metric name, a tuple of two np.arrays (one element for each threshold): 
+        the curve to be maximized (minimized for cost) and the standard deviation of the metric over the subsets
+    """
+    
+    TN, FP, FN, TP = tensors['TN'], tensors['FP'], tensors['FN'], tensors['TP']
+    fbeta_names = {'f1_score': 1, 'f2_score': 2, 'f05_score': 0.5}
+    ghost_curves = {}
     
-    df_preds_costs = pd.DataFrame({'labels':labels,'probs':probs, 
-                                   'cost_TN':cost_dict['TN'],
-                                   'cost_FP':cost_dict['FP'],
-                                   'cost_FN':cost_dict['FN'],
-                                   'cost_TP':cost_dict['TP']})
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        if 'roc' in threshold_names:
+            # sensitivity and specificity (zero_division = 1), combined from their medians
+            sensitivity_accum = _safe_divide(TP, TP + FN, 1)
+            specificity_accum = _safe_divide(TN, TN + FP, 1)
+            median_sensitivity, std_sensitivity = _helper_calc_median_std(sensitivity_accum)
+            median_specificity, std_specificity = _helper_calc_median_std(specificity_accum)
+            roc_dist_01corner = (2*median_sensitivity*median_specificity)/(median_sensitivity+median_specificity)
+            roc_accum = _safe_divide(2*sensitivity_accum*specificity_accum, sensitivity_accum+specificity_accum, 0)
+            ghost_curves['roc'] = (roc_dist_01corner, np.std(roc_accum, axis = 0))
+        
+        if any(threshold_name in fbeta_names for threshold_name in threshold_names):
+            # precision and recall (zero_division = 1), combined from their medians
+            precision_accum = _safe_divide(TP, TP + FP, 1)
+            recall_accum = _safe_divide(TP, TP + FN, 1)
+            median_precision, std_precision = _helper_calc_median_std(precision_accum)
+            median_recall, std_recall = _helper_calc_median_std(recall_accum)
+            for threshold_name, beta in fbeta_names.items():
+                fbeta = ((1+beta**2)*median_precision*median_recall)/(beta**2*median_precision+median_recall)
+                fbeta_accum = _safe_divide((1+beta**2)*precision_accum*recall_accum, beta**2*precision_accum+recall_accum, 0)
+                ghost_curves[threshold_name] = (fbeta, np.std(fbeta_accum, axis = 0))
     
-    thresh_names = [str(x) for x in thresholds]
-    for thresh in thresholds:
-        df_preds_costs = pd.concat([df_preds_costs, pd.Series([1 if x>=thresh else 0 for x in probs], name=str(thresh))], axis=1)
+    if 'kappa' in threshold_names:
+        ghost_curves['kappa'] = _helper_calc_median_std(_get_cohens_kappa(TN, FP, FN, TP))
         
-    n = max(os.cpu_count()-1, 1)
+    if 'mcc' in threshold_names:
+        ghost_curves['mcc'] = _helper_calc_median_std(_get_matthews_corr_coef(TN, FP, FN, TP))
+    
+    if 'cost' in threshold_names:
+        ghost_curves['cost'] = _helper_calc_median_std(tensors['cost_TN'] + tensors['cost_FP'] + 
+                                                       tensors['cost_FN'] + tensors['cost_TP'])
+    
+    return ghost_curves
 
-    score_accum = []
-    pool = Pool(n)
-    for i in range(N_subsets):
-        if with_replacement:
-            if isinstance(subsets_size, float):
-                Nsamples = int(df_preds.shape[0]*subsets_size)
-            elif isinstance(subsets_size, int):
-                Nsamples = subsets_size                    
-            df_subset = resample(df_preds_costs, replace=True, n_samples = Nsamples, stratify=labels, random_state = random_seeds[i])
-            labels_subset = df_subset['labels']
-        else:
-            df_tmp, df_subset, labels_tmp, labels_subset = train_test_split(df_preds_costs, labels, test_size = subsets_size, 
-                                                                            stratify = labels, random_state = random_seeds[i])
-            
-        result = pool.starmap(_get_total_cost, 
-                              zip(repeat(labels_subset), 
-                                  [df_subset[[threshold, 'cost_TN', 'cost_FP', 'cost_FN', 'cost_TP']] for threshold in thresh_names]))
-        score_accum.append(result)
-    pool.close()
+def _get_ghost_optimal_threshold(thresholds, ghost_curves, threshold_name):
+    # Threshold maximizing the GHOST curve of the metric (minimizing, for cost)
+    if threshold_name == 'cost':
+        return thresholds[np.argmin(ghost_curves[threshold_name][0])]
+    return thresholds[np.argmax(ghost_curves[threshold_name][0])]
 
-    # determine the threshold that provides the best results on the training subsets
-    y_values_median, y_values_std = _helper_calc_median_std(score_accum)
-    opt_thresh = thresholds[np.argmin(y_values_median)]
+def _get_subsets_seeds(N_subsets, random_seed):
+    # Random seeds of the subsets used in the GHOST optimization process
+    return np.random.RandomState(random_seed).randint(N_subsets*10, size=N_subsets)
 
-    return opt_thresh
+def _get_subsets_indices(labels, N_subsets, subsets_size, with_replacement, random_seed):
+    
+    """ 
+    Draws the indices of the stratified subsets used in the GHOST optimization process
+    
+    Parameters
+    ----------
+    labels: sequence of ints
+        True labels
+    N_subsets: int
+        Number of subsets
+    subsets_size: float or int
+        Size of the subsets. 
+        If float, represents the proportion of the dataset to include in the subsets. 
+        If integer, it represents the actual number of instances to include in the subsets. 
+    with_replacement: bool
+        If True, the subsets are drawn randomly with replacement, without otherwise.
+    random_seed: int
+        Controls the randomness of the bootstrapping of the samples 
+    
+    Returns
+    ----------
+    subsets_indices: list of np.arrays of ints
+        positional indices of the data points of each subset
+    """
+    
+    return [_get_subset_indices(labels, subsets_size, with_replacement, seed) 
+            for seed in _get_subsets_seeds(N_subsets, random_seed)]
 
-def _get_metric_function(metric_name):  
-    # Returns the scikit function relative to the metric_name
-    if metric_name == 'Kappa':
-        return metrics.cohen_kappa_score
-    elif metric_name == 'MCC': 
-        return _MCC_wrapper
-    
-def _MCC_wrapper(labels, preds):
-    # Wraps scikit matthews_corrcoef function suppressing zerodivision warnings
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        return metrics.matthews_corrcoef(labels, preds)
+def _get_subset_indices(labels, subsets_size, with_replacement, seed):
+    # Draws the indices of one stratified subset (with or without replacement)
+    labels_array = _get_labels_array(labels, 'labels')
+    indices = np.arange(len(labels_array))
+    
+    if with_replacement:
+        if isinstance(subsets_size, float):
+            Nsamples = int(len(labels_array)*subsets_size)
+        else:
+            Nsamples = subsets_size
+        return resample(indices, replace = True, n_samples = Nsamples, stratify = labels_array, random_state = seed)
+    else:
+        indices_tmp, indices_subset = train_test_split(indices, test_size = subsets_size, 
+                                                       stratify = labels_array, random_state = seed)
+        return indices_subset
 
-def _precision_score_wrapper(labels, preds):
-    # Wraps scikit precision_score function with parameter zero_division = 1
-    return metrics.precision_score(labels, preds, zero_division = 1)
+def _get_subsets_confusion_tensors(labels, probs, thresholds, N_subsets = 70, subsets_size = 0.2, 
+                                   with_replacement = False, random_seed = None, cost_dict = None, n_jobs = None):
+    
+    """ 
+    Computes confusion counts (or costs) of every GHOST subset for every threshold. 
+    Each data point is assigned once to a threshold bin, then the counts of each subset 
+    are cumulative sums of the per-bin counts of its data points
+    
+    Parameters
+    ----------
+    labels: sequence of ints
+        True labels
+    probs: sequence of floats
+        predicted probabilities for class 1
+    thresholds: list of floats
+        List of decision thresholds
+    N_subsets: int, default=70
+        Number of subsets
+    subsets_size: float or int, default=0.2
+        Size of the subsets. 
+        If float, represents the proportion of the dataset to include in the subsets. 
+        If integer, it represents the actual number of instances to include in the subsets. 
+    with_replacement: bool, default=False
+        If True, the subsets are drawn randomly with replacement, without otherwise.
+    random_seed: int, default=None
+        Controls the randomness of the bootstrapping of the samples 
+    cost_dict: dict, default=None
+        dict containing costs associated to each class (TN, FP, FN, TP) (output from get_cost_dict).
+        If given, costs are returned together with counts
+    n_jobs: int, default=None
+        Number of worker processes the subsets are distributed to (see get_optimal_threshold)
+    
+    Returns
+    ----------
+    tensors: dict
+        np.arrays with shape (N_subsets, len(thresholds)), thresholds in the given order, with keys: 
+        "TN", "FP", "FN", "TP" for counts and, if cost_dict is given, "cost_TN", "cost_FP", "cost_FN", "cost_TP" for costs
+    """
+    
+    thresholds_array = np.asarray(thresholds, dtype = float)
+    thresh_order = np.argsort(thresholds_array, kind = 'mergesort')
+    n_bins = len(thresholds_array) + 1
+    
+    # data shared by all subsets: threshold bin and class of each data point, per-row costs
+    labels_array, probs_array = _get_labels_scores_arrays(labels, probs)
+    arrays = {'bins': _get_threshold_bins(probs_array, thresholds_array[thresh_order]), 'is_pos': labels_array.view(bool)}
+    scalar_costs = {}
+    
+    if cost_dict is not None:
+        cost_model = CostModel.from_cost_dict(cost_dict, n_data = len(labels_array))
+        for confusion_class in ['TN', 'FP', 'FN', 'TP']:
+            cost = cost_model[confusion_class]
+            if hasattr(cost, '__iter__'):
+                arrays['cost_' + confusion_class] = _get_cost_array(cost)
+            else:
+                scalar_costs[confusion_class] = float(cost)
+    
+    subsets_seeds = _get_subsets_seeds(N_subsets, random_seed)
+    n_workers = _get_n_workers(n_jobs)
+    
+    if (n_workers > 1) and (shared_memory is not None):
+        hists = _map_with_shared_arrays(_get_subset_histograms, arrays, 
+                                        [(n_bins, subsets_size, with_replacement, seed) for seed in subsets_seeds], n_workers)
+    else:
+        hists = [_get_subset_histograms(arrays, n_bins, subsets_size, with_replacement, seed) for seed in subsets_seeds]
+    
+    # hists has shape (N_subsets, n_histograms, n_bins): negatives counts, positives counts, per-row costs
+    hists = np.array(hists)
+    TN, FP = _get_below_above_from_hist(hists[:, 0])
+    FN, TP = _get_below_above_from_hist(hists[:, 1])
+    tensors = {'TN': TN, 'FP': FP, 'FN': FN, 'TP': TP}
+    
+    if cost_dict is not None:
+        cost_hist_idx = 2
+        for confusion_class, is_above in [('TN', False), ('FP', True), ('FN', False), ('TP', True)]:
+            if confusion_class in scalar_costs:
+                tensors['cost_' + confusion_class] = tensors[confusion_class] * scalar_costs[confusion_class]
+            else:
+                tensors['cost_' + confusion_class] = _get_below_above_from_hist(hists[:, cost_hist_idx])[int(is_above)]
+                cost_hist_idx += 1
+    
+    # restore the given order of thresholds
+    thresh_unsort = np.argsort(thresh_order)
+    
+    return {key: tensor[:, thresh_unsort] for key, tensor in tensors.items()}
+
+def _get_subset_histograms(arrays, n_bins, subsets_size, with_replacement, seed):
+    # Draws one subset and computes its per-bin histograms: 
+    # counts of negatives and positives, then sums of each per-row cost over its confusion class (TN, FP: negatives)
+    indices = _get_subset_indices(arrays['is_pos'], subsets_size, with_replacement, seed)
+    bins_subset = arrays['bins'][indices]
+    is_pos_subset = arrays['is_pos'][indices]
+    
+    hists = list(_get_class_histograms(bins_subset, is_pos_subset, n_bins))
+    
+    for confusion_class, class_is_pos in [('TN', False), ('FP', False), ('FN', True), ('TP', True)]:
+        if 'cost_' + confusion_class in arrays:
+            hists.append(_get_class_histograms(bins_subset, is_pos_subset, n_bins, 
+                                               weights = arrays['cost_' + confusion_class][indices])[int(class_is_pos)])
+    
+    return np.array(hists, dtype = float)
 
-def _recall_score_wrapper(labels, preds, pos_label=1):
-    # Wraps scikit recall_score function with parameter zero_division = 1
-    return metrics.recall_score(labels, preds, pos_label=pos_label, zero_division = 1)
+def _map_with_shared_arrays(function, arrays, tasks_args, n_workers):
+    # Places the data arrays in shared memory once and distributes only the arguments of each task 
+    # (e.g. the subsets seeds) to the worker processes, which compute function(arrays, *args)
+    shms = []
+    try:
+        shared_specs = {}
+        for key, array in arrays.items():
+            shm = shared_memory.SharedMemory(create = True, size = max(array.nbytes, 1))
+            shms.append(shm)
+            np.ndarray(array.shape, dtype = array.dtype, buffer = shm.buf)[:] = array
+            shared_specs[key] = (shm.name, array.shape, array.dtype.str)
+        
+        tasks = [(function, shared_specs, args) for args in tasks_args]
+        return _get_pool(n_workers).map(_shared_arrays_worker, tasks)
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
 
-def _compute_sensitivity_specificity(labels, preds):
-    # Computes sensitivity (recall) and specificity through wrapped scikit functions
-    return [_recall_score_wrapper(labels, preds), 
-            _recall_score_wrapper(labels, preds, pos_label=0)]
+def _shared_arrays_worker(task):
+    # Worker process function: attaches to the shared data arrays and computes the result of one task
+    function, shared_specs, args = task
+    shms = [shared_memory.SharedMemory(name = name) for name, shape, dtype in shared_specs.values()]
+    try:
+        arrays = {key: np.ndarray(shape, dtype = dtype, buffer = shm.buf) 
+                  for (key, (name, shape, dtype)), shm in zip(shared_specs.items(), shms)}
+        result = function(arrays, *args)
+        del arrays
+        return result
+    finally:
+        for shm in shms:
+            shm.close()
 
-def _get_total_cost(true_y, prediction_data_df):
-    # Computes total cost
-    y_pred = prediction_data_df.iloc[:,0]
-    cost_TN = sum(prediction_data_df[(true_y == 0) & (y_pred == 0)]['cost_TN'])
-    cost_FP = sum(prediction_data_df[(true_y == 0) & (y_pred == 1)]['cost_FP'])
-    cost_FN = sum(prediction_data_df[(true_y == 1) & (y_pred == 0)]['cost_FN'])
-    cost_TP = sum(prediction_data_df[(true_y == 1) & (y_pred == 1)]['cost_TP'])
+def _get_n_workers(n_jobs):
+    # Number of worker processes for n_jobs (None or 1: no parallelism, -1: all CPUs)
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(os.cpu_count() + 1 + n_jobs, 1)
+    return max(n_jobs, 1)
 
-    return cost_TN + cost_FP + cost_FN + cost_TP
+def _get_pool(n_workers):
+    # Returns the process pool shared by all the GHOST and bootstrap calls, (re)creating it if the number of workers changed
+    global _pool, _pool_n_workers
+    
+    if (_pool is None) or (_pool_n_workers != n_workers):
+        _close_pool()
+        _pool = Pool(n_workers)
+        _pool_n_workers = n_workers
+    
+    return _pool
 
-def _compute_precision_recall(labels, preds):
-    # Computes precision and recall through wrapped scikit functions
-    return [_precision_score_wrapper(labels, preds), 
-            _recall_score_wrapper(labels, preds)]
+def _close_pool():
+    # Terminates the shared process pool, if any
+    global _pool, _pool_n_workers
+    
+    if _pool is not None:
+        _pool.close()
+        _pool.join()
+    _pool, _pool_n_workers = None, None
 
 def _helper_calc_median_std(specificity): 
     # Calculate median and std of the columns of a pandas dataframe
@@ -370,3 +545,4 @@ def _helper_calc_median_std(specificity):
     y_values_std = np.std(arr,axis=0) 
     return y_values_median, y_values_std 
 
+atexit.register(_close_pool)
@@ -7,7 +7,13 @@ import warnings
 
 from sklearn import metrics
 
-import plotly.figure_factory as ff 
+from .confusion import get_confusion_counts, get_confusion_amounts, get_confusion_costs
+from .confusion import ConfusionAccumulator, ConfusionSketch, CostModel
+from .cache import _memoize
+from .validation import _get_values_array, _get_labels_scores_arrays
+from .confusion import _sort_predictions, _get_n_below, _get_amounts_from_sorted, _get_costs_from_sorted, _resolve_threshold_values
+
+_DENSITY_CHUNK_SIZE = 2**18
 
 def get_cost_dict(TN = 0, FP = 0, FN = 0, TP = 0):
     
@@ -30,7 +36,8 @@ def get_cost_dict(TN = 0, FP = 0, FN = 0, TP = 0):
     ----------
     cost_dict: dict, default=None
         dict containing keys: "TN", "FP", "FN", "TP"
-        and values corresponding to lists (with coherent lenghts) and/or floats  
+        and values corresponding to lists (with coherent lenghts) and/or floats.
+        To validate and convert per-row costs only once, see confusion.CostModel  
     """
     confusion_class_lenghts = []
     
@@ -50,7 +57,6 @@ def get_cost_dict(TN = 0, FP = 0, FN = 0, TP = 0):
         
         if hasattr(confusion_class, '__iter__'):
             
-            confusion_class = list(confusion_class)
             confusion_class_lenghts.append(len(confusion_class))
             it = iter(confusion_class_lenghts)
             the_len = next(it)
@@ -69,7 +75,8 @@ def get_confusion_category_observations_df(confusion_category, X_data, true_y, p
     
     """ Returns X (features) dataframe of data points related to a chosen "confusion category",
     based on given true label, predicted probabilities and decision threshold
-    (confusion category is either True Negative TN, False Positive FP, False Negative FN, True Positive TP)
+    (confusion category is either True Negative TN, False Positive FP, False Negative FN, True Positive TP).
+    For repeated retrievals at different thresholds, see confusion.ConfusionCategoryIndex
     
     Parameters
     ----------
@@ -95,24 +102,25 @@ def get_confusion_category_observations_df(confusion_category, X_data, true_y, p
         raise ValueError("confusion_class must be one of {'TN', 'FP', 'FN', 'TP'}") 
 
     X_df = pd.DataFrame(X_data)
-    true_y_array = np.squeeze(np.array(true_y))
-    predicted_proba_array = np.squeeze(np.array(predicted_proba))
+    true_y_array, predicted_proba_array = _get_labels_scores_arrays(true_y, predicted_proba)
 
     if confusion_category == 'TN':
-        X_filtered_df = X_df[(true_y_array == 0) & (predicted_proba < threshold)] 
+        X_filtered_df = X_df[(true_y_array == 0) & (predicted_proba_array < threshold)] 
 
     elif confusion_category == 'FP':
-        X_filtered_df =  X_df[(true_y_array == 0) & (predicted_proba >= threshold)] 
+        X_filtered_df =  X_df[(true_y_array == 0) & (predicted_proba_array >= threshold)] 
 
     elif confusion_category == 'FN':
-        X_filtered_df = X_df[(true_y_array == 1) & (predicted_proba < threshold)] 
+        X_filtered_df = X_df[(true_y_array == 1) & (predicted_proba_array < threshold)] 
 
     else: #'TP'
-        X_filtered_df = X_df[(true_y_array == 1) & (predicted_proba >= threshold)] 
+        X_filtered_df = X_df[(true_y_array == 1) & (predicted_proba_array >= threshold)] 
         
     return X_filtered_df
 
-def get_amount_cost_df(true_y, predicted_proba, threshold_values, amounts = None, cost_dict = None):
+@_memoize(ignore = ['_sorted_predictions'])
+def get_amount_cost_df(true_y, predicted_proba, threshold_values, amounts = None, cost_dict = None, n_breakpoints = None,
+                       _sorted_predictions = None):
     
     """ 
     For each threshold, computes relative amounts and/or cost for each class (TN, FP, FN, TP)
@@ -124,14 +132,19 @@ def get_amount_cost_df(true_y, predicted_proba, threshold_values, amounts = None
     predicted_proba: sequence of floats
         predicted probabilities for class 1
         (e.g. output from model.predict_proba(data)[:,1]) 
-    threshold_values: sequence of floats 
-        list of classification thresholds below which prediction label is 0, 1 otherwise
+    threshold_values: sequence of floats or 'exact'
+        list of classification thresholds below which prediction label is 0, 1 otherwise.
+        If 'exact', every distinct value of predicted_proba is used as threshold 
+        (i.e. every threshold at which amounts and costs change)
     amounts: sequence of floats, default=None
         amounts associated to each element of data 
-    cost_dict: dict, default=None
+    cost_dict: dict or CostModel, default=None
         dict containing keys: "TN", "FP", "FN", "TP"
         and values corresponding to lists (with coherent lenghts) and/or floats  
         (output from get_cost_dict)
+    n_breakpoints: int, default=None
+        Only used if threshold_values is 'exact': if given, thresholds are compressed 
+        to at most n_breakpoints quantiles of predicted_proba
     Returns
     ----------   
     amount_cost_per_threshold_df: pandas dataframe
@@ -141,114 +154,78 @@ def get_amount_cost_df(true_y, predicted_proba, threshold_values, amounts = None
         - if cost_dict is given: cost relative to each class (TN, FP, FN, TP) and total cost
     
     """                                                    
-    if (amounts is not None) and (cost_dict is not None): #both cost and amounts 
-        amount_TN = []
-        amount_FP = []
-        amount_FN = []
-        amount_TP = []
-    
-        cost_TN = []
-        cost_FP = []
-        cost_FN = []
-        cost_TP = []
-
-        for threshold in threshold_values:
-            amount_matrix = _get_amount_matrix(true_y, predicted_proba, threshold, amounts)
-            amount_TN.append(amount_matrix[0,0])
-            amount_FP.append(amount_matrix[0,1])
-            amount_FN.append(amount_matrix[1,0])
-            amount_TP.append(amount_matrix[1,1])
-
-            cost_matrix = _get_cost_matrix(true_y, predicted_proba, threshold, cost_dict)
-            cost_TN.append(cost_matrix[0,0])
-            cost_FP.append(cost_matrix[0,1])
-            cost_FN.append(cost_matrix[1,0])
-            cost_TP.append(cost_matrix[1,1])
-        
-        amount_cost_per_threshold_df = pd.DataFrame(zip(threshold_values, 
-                                                        amount_TN, amount_FP, amount_FN, amount_TP, 
-                                                        cost_TN, cost_FP, cost_FN, cost_TP), 
-                                                    columns = ['threshold', 
-                                                               'amount_TN', 'amount_FP', 'amount_FN', 'amount_TP',
-                                                               'cost_TN', 'cost_FP', 'cost_FN', 'cost_TP']).sort_values(by='threshold')
-        
-        amount_cost_per_threshold_df['total_cost'] = amount_cost_per_threshold_df[['cost_TN', 'cost_FP', 
-                                                                                   'cost_FN', 'cost_TP']].apply(sum, axis = 1)        
-    elif amounts is not None: # only amounts
-        total_amount = sum(amounts)
-        amount_TN = []
-        amount_FP = []
-        amount_FN = []
-        amount_TP = []
-        
-        for threshold in threshold_values:
-            amount_matrix = _get_amount_matrix(true_y, predicted_proba, threshold, amounts)
-            amount_TN.append(amount_matrix[0,0])
-            amount_FP.append(amount_matrix[0,1])
-            amount_FN.append(amount_matrix[1,0])
-            amount_TP.append(amount_matrix[1,1])
-            
-        amount_cost_per_threshold_df = pd.DataFrame(zip(threshold_values, 
-                                                        amount_TN, amount_FP, amount_FN, amount_TP),
-                                                    columns = ['threshold', 
-                                                               'amount_TN', 'amount_FP', 
-                                                               'amount_FN', 'amount_TP']).sort_values(by='threshold')
-
-        
-    elif cost_dict is not None: # only cost
-        cost_TN = []
-        cost_FP = []
-        cost_FN = []
-        cost_TP = []
-        
-        for threshold in threshold_values:
-            cost_matrix = _get_cost_matrix(true_y, predicted_proba, threshold, cost_dict)
-            cost_TN.append(cost_matrix[0,0])
-            cost_FP.append(cost_matrix[0,1])
-            cost_FN.append(cost_matrix[1,0])
-            cost_TP.append(cost_matrix[1,1])
-                           
-        amount_cost_per_threshold_df = pd.DataFrame(zip(threshold_values, 
-                                                        cost_TN, cost_FP, cost_FN, cost_TP), 
-                                                    columns = ['threshold', 
-                                                               'cost_TN', 'cost_FP', 'cost_FN', 'cost_TP']).sort_values(by='threshold')
-        
-        amount_cost_per_threshold_df['total_cost'] = amount_cost_per_threshold_df[['cost_TN', 'cost_FP', 
-                                                                                   'cost_FN', 'cost_TP']].apply(sum, axis = 1)
-    
-    else: # no cost or amount
+    if (amounts is None) and (cost_dict is None): # no cost or amount
         raise TypeError("cost_dict and amounts can't be both None.") 
     
+    # validate every input up front, then sort predicted probabilities once and get amounts and costs 
+    # for all thresholds with cumulative sums 
+    true_y, predicted_proba = _get_labels_scores_arrays(true_y, predicted_proba)
+    if amounts is not None:
+        amounts = _get_values_array(amounts, 'amounts', len(true_y))
+    if cost_dict is not None:
+        cost_dict = CostModel.from_cost_dict(cost_dict, n_data = len(true_y))
+    
+    order, sorted_proba, sorted_pos = _sort_predictions(true_y, predicted_proba, _sorted_predictions)
+    threshold_values = _resolve_threshold_values(threshold_values, sorted_proba, n_breakpoints)
+    n_below = _get_n_below(sorted_proba, threshold_values)
+    
+    amount_cost_per_threshold_df = pd.DataFrame({'threshold': np.asarray(threshold_values, dtype = float)})
+    
+    if amounts is not None:
+        amount_grid = _get_amounts_from_sorted(order, sorted_pos, n_below, amounts)
+        for confusion_class, amount_values in zip(['TN', 'FP', 'FN', 'TP'], amount_grid):
+            amount_cost_per_threshold_df['amount_' + confusion_class] = amount_values
+    
+    if cost_dict is not None:
+        cost_grid = _get_costs_from_sorted(order, sorted_pos, n_below, cost_dict)
+        for confusion_class, cost_values in zip(['TN', 'FP', 'FN', 'TP'], cost_grid):
+            amount_cost_per_threshold_df['cost_' + confusion_class] = cost_values
+        amount_cost_per_threshold_df['total_cost'] = sum(cost_grid)
+    
+    amount_cost_per_threshold_df = amount_cost_per_threshold_df.sort_values(by='threshold')
+    
     return amount_cost_per_threshold_df
 
 
-def get_invariant_metrics_df(true_y, predicted_proba):
+@_memoize(ignore = ['_sorted_predictions'])
+def get_invariant_metrics_df(true_y, predicted_proba, sample_weight = None, _sorted_predictions = None):
    
     """ 
     Computes following metrics (based on non-thresholded predicted probabilities): 
-    ROC auc macro, ROC auc weighted, Pecision-Recall auc, Brier score
+    ROC auc, Precision-Recall auc (average precision), Brier score, log-loss and calibration error 
+    (expected calibration error on 10 uniform bins, as sklearn.calibration.calibration_curve).
+    Predicted probabilities of each class are sorted once and all the metrics are computed from the same pass,
+    with the same results as the scikit-learn scorers (ROC auc counts ties as one half, as the Mann-Whitney statistic;
+    ROC auc and average precision are NaN if a class is missing)
     
     Parameters
     ----------
-    true_y: sequence of ints 
-        True labels
+    true_y: sequence of ints, ConfusionAccumulator or ConfusionSketch
+        True labels, or accumulated statistics of the data (in which case predicted_proba must be None, 
+        aucs are approximated and only ROC auc, PR auc and Brier score are computed, 
+        see ConfusionSketch.get_invariant_metrics_df)
     predicted_proba: sequence of floats
         predicted probabilities for class 1 
         (e.g. output from model.predict_proba(data)[:,1]) 
+    sample_weight: sequence of non-negative floats, default=None
+        weight of each data point, with a positive sum; if None, each data point has the same weight
 
     Returns
     ----------
     metrics_df: pandas dataframe
-        Dataframe containing computed metrics
+        Dataframe containing computed metrics 
+        (and their maximum absolute errors, if true_y is a ConfusionAccumulator or ConfusionSketch)
     """
     
-    metrics_names = ['roc_auc', 'pr_auc', 'brier_score']
-    metrics_lst = []
-    metrics_lst.append(round(metrics.roc_auc_score(true_y, predicted_proba), 4))
-    metrics_lst.append(round(metrics.average_precision_score(true_y, predicted_proba), 4))
-    metrics_lst.append(round(metrics.brier_score_loss(true_y, predicted_proba), 4))
+    if isinstance(true_y, (ConfusionAccumulator, ConfusionSketch)):
+        if (predicted_proba is not None) or (sample_weight is not None):
+            raise TypeError("When accumulated statistics are given, predicted_proba and sample_weight must be None")
+        return true_y.get_invariant_metrics_df()
+    
+    metrics_values = _get_invariant_metrics(true_y, predicted_proba, sample_weight, sorted_predictions = _sorted_predictions)
     
-    metrics_df = pd.DataFrame(zip(metrics_names, metrics_lst), columns = ['invariant_metric', 'value']) 
+    metrics_df = pd.DataFrame({'invariant_metric': list(metrics_values), 
+                               'value': [round(value, 4) for value in metrics_values.values()]}) 
     return metrics_df
 
 def get_confusion_matrix_and_metrics_df(true_y, predicted_proba, threshold = 0.5, normalize = None):
@@ -278,26 +255,224 @@ def get_confusion_matrix_and_metrics_df(true_y, predicted_proba, threshold = 0.5
         Dataframe containing metrics
     """
     
-    y_pred = [int(x >= threshold) for x in predicted_proba]
-    cf_matrix = metrics.confusion_matrix(true_y, y_pred, normalize = normalize)
+    if normalize not in ['true', 'pred', 'all', None]:
+        raise ValueError("normalize must be one of {'true', 'pred', 'all', None}")
     
-    metrics_names = ['accuracy', 'balanced_accuracy', 'f1_score', 'precision', 'recall', "cohens_kappa", 'matthews_corr_coef']
-    metrics_lst = []
-    metrics_lst.append(round(metrics.accuracy_score(true_y, y_pred), 4)) 
-    metrics_lst.append(round(metrics.balanced_accuracy_score(true_y, y_pred), 4))
-    metrics_lst.append(round(metrics.f1_score(true_y, y_pred, zero_division = 0), 4))
-    metrics_lst.append(round(metrics.precision_score(true_y, y_pred, zero_division = 1), 4))
-    metrics_lst.append(round(metrics.recall_score(true_y, y_pred, zero_division = 1), 4))
-    metrics_lst.append(round(metrics.cohen_kappa_score(true_y, y_pred), 4))
+    TN, FP, FN, TP = get_confusion_counts(true_y, predicted_proba, [threshold])
+    cf_matrix = np.array([[TN[0], FP[0]], 
+                          [FN[0], TP[0]]])
     
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        metrics_lst.append(round(metrics.matthews_corrcoef(true_y, y_pred), 4))    
+    with np.errstate(all = 'ignore'):
+        if normalize == 'true':
+            cf_matrix = cf_matrix / cf_matrix.sum(axis = 1, keepdims = True)
+        elif normalize == 'pred':
+            cf_matrix = cf_matrix / cf_matrix.sum(axis = 0, keepdims = True)
+        elif normalize == 'all':
+            cf_matrix = cf_matrix / cf_matrix.sum()
+        cf_matrix = np.nan_to_num(cf_matrix)
+    
+    metrics_names = ['accuracy', 'balanced_accuracy', 'f1_score', 'precision', 'recall', "cohens_kappa", 'matthews_corr_coef']
+    metrics_row = get_metrics_dep_on_threshold_df([threshold], TN, FP, FN, TP).iloc[0]
     
-    metrics_df = pd.DataFrame(zip(metrics_names, metrics_lst), columns = ['threshold_dependent_metric', 'value']) 
+    metrics_df = pd.DataFrame(zip(metrics_names, metrics_row[metrics_names]), columns = ['threshold_dependent_metric', 'value']) 
         
     return cf_matrix, metrics_df
 
+def get_metrics_dep_on_threshold_df(threshold_values, TN, FP, FN, TP):
+    
+    """ 
+    Computes, for every threshold at once, the following metrics from confusion matrix counts: 
+    Accuracy, Balanced accuracy, F1 score, Precision, Recall, Matthews corr. coeff, Cohen's Kappa.
+    Zero divisions are handled as in the scikit-learn scorers used by get_confusion_matrix_and_metrics_df
+    (F1 score: 0, Precision and Recall: 1, Matthews corr. coeff: 0, Cohen's Kappa: NaN)
+    
+    Parameters
+    ----------
+    threshold_values: sequence of floats 
+        list of classification thresholds below which prediction label is 0, 1 otherwise
+    TN, FP, FN, TP: sequences of ints
+        counts of each confusion class, one element for each threshold 
+        (e.g. output from confusion.get_confusion_counts)
+        
+    Returns
+    ----------
+    metrics_dep_on_threshold_df: pandas dataframe
+        Dataframe containing a row for each threshold and variables: 
+        threshold, accuracy, balanced_accuracy, cohens_kappa, f1_score, matthews_corr_coef, precision, recall
+    """
+    
+    metrics_dep_on_threshold_df = pd.DataFrame({'threshold': np.asarray(threshold_values, dtype = float),
+                                                **_get_metrics_dep_on_threshold(TN, FP, FN, TP)})
+    
+    metric_cols = metrics_dep_on_threshold_df.columns[1:]
+    metrics_dep_on_threshold_df[metric_cols] = metrics_dep_on_threshold_df[metric_cols].round(4)
+    
+    return metrics_dep_on_threshold_df
+
+def get_density_curve_data(data, curve_type = 'kde', bandwidth = 'scott', weights = None, n_points = 500):
+    
+    """ 
+    Computes the density curve of data on n_points evenly spaced between the minimum and the maximum of data.
+    The kernel density estimation is computed by binning the data on a regular grid and convolving the bins 
+    with a gaussian kernel through FFT, so that its cost is linear in the number of data
+    
+    Parameters
+    ----------
+    data: sequence of floats
+        data of which the density curve will be computed (e.g. predicted probabilities of a true class)
+    curve_type: {'kde', 'normal'},  default=kde 
+        type of curve, either kernel density estimation or normal curve
+    bandwidth: {'scott', 'silverman'} or float, default='scott'
+        bandwidth of the gaussian kernel: a rule of thumb (computed on the weighted standard deviation 
+        and on the effective number of data, as scipy.stats.gaussian_kde) or the standard deviation of the kernel.
+        Only used if curve_type is 'kde'
+    weights: sequence of non-negative floats, default=None
+        weight of each data point (e.g. amounts); if None, each data point has the same weight
+    n_points: int, default=500
+        number of points of the curve
+    
+    Returns
+    ----------
+    x_dist_data: np.array
+         array with x coordinates data for the density curve 
+    y_dist_data: np.array
+         array with y coordinates data for the density curve
+    """
+    
+    data = _get_values_array(data, 'data')
+    weights = None if weights is None else _get_values_array(weights, 'weights', len(data))
+    
+    if (weights is not None) and ((weights.min(initial = 0) < 0) or (weights.sum(dtype = float) <= 0)):
+        raise ValueError("weights must be non-negative, with a positive sum")
+    if curve_type not in ['kde', 'normal']:
+        raise ValueError("curve_type must be either 'kde' or 'normal'")
+    
+    x_dist_data = np.linspace(data.min(), data.max(), n_points)
+    
+    sum_weights, sum_squared_weights, mean, sum_squared_deviations = _get_weighted_moments(data, weights)
+    std = np.sqrt(sum_squared_deviations / sum_weights)
+    if std == 0:
+        raise ValueError("data must contain at least two distinct values to compute a density curve")
+    
+    if curve_type == 'normal':
+        y_dist_data = np.exp(-0.5 * ((x_dist_data - mean) / std)**2) / (std * np.sqrt(2 * np.pi))
+    else:
+        kde_bandwidth = _get_kde_bandwidth(sum_weights, sum_squared_weights, sum_squared_deviations, bandwidth)
+        y_dist_data = _get_binned_kde(data, weights, x_dist_data, kde_bandwidth) / sum_weights
+    
+    return x_dist_data, y_dist_data
+
+def _get_metrics_dep_on_threshold(TN, FP, FN, TP):
+    # Element-wise threshold dependent metrics from confusion counts of any shape (e.g. bootstrap replicates x thresholds),
+    # as dict of arrays with the columns names of get_metrics_dep_on_threshold_df
+    TN, FP, FN, TP = [np.asarray(x, dtype = float) for x in (TN, FP, FN, TP)]
+    n_data = TN + FP + FN + TP
+    
+    # balanced accuracy averages recalls of the classes present in true labels
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        balanced_accuracy = np.nanmean([_safe_divide(TP, TP + FN, np.nan), 
+                                        _safe_divide(TN, TN + FP, np.nan)], axis = 0)
+    
+    return {'accuracy': _safe_divide(TP + TN, n_data, 0),
+            'balanced_accuracy': balanced_accuracy,
+            'cohens_kappa': _get_cohens_kappa(TN, FP, FN, TP),
+            'f1_score': _safe_divide(2 * TP, 2 * TP + FP + FN, 0),
+            'matthews_corr_coef': _get_matthews_corr_coef(TN, FP, FN, TP),
+            'precision': _safe_divide(TP, TP + FP, 1),
+            'recall': _safe_divide(TP, TP + FN, 1)}
+
+def _get_invariant_metrics(true_y, predicted_proba, sample_weight = None, n_calibration_bins = 10, sorted_predictions = None):
+    # Invariant metrics from the predicted probabilities of each class, sorted once (with np.sort, much faster than 
+    # an argsort, if there are no sample weights): weights of the negatives below (or tied with) each positive give 
+    # the Mann-Whitney statistic, weights of both classes above each positive its precision (average precision), 
+    # cumulative sums at the uniform bins edges the calibration error.
+    # Given sorted predictions of the data (see confusion._sort_predictions) are split by class, without sorting again
+    true_y_array, predicted_proba_array = _get_labels_scores_arrays(true_y, predicted_proba)
+    if sample_weight is not None:
+        sample_weight = _get_values_array(sample_weight, 'sample_weight', len(true_y_array)).astype(float, copy = False)
+        if (sample_weight.min(initial = 0) < 0) or (sample_weight.sum() <= 0):
+            raise ValueError("sample_weight must be non-negative, with a positive sum")
+    
+    is_pos = true_y_array.view(bool)
+    sorted_proba, sorted_weights, cum_weights, cum_weighted_proba = {}, {}, {}, {}
+    
+    for class_is_pos in [False, True]:
+        if (sorted_predictions is not None) and (sample_weight is None):
+            _, all_sorted_proba, sorted_pos = sorted_predictions
+            sorted_proba[class_is_pos] = all_sorted_proba[sorted_pos == class_is_pos].astype(float, copy = False)
+            sorted_weights[class_is_pos] = np.ones(len(sorted_proba[class_is_pos]))
+        else:
+            class_proba = predicted_proba_array[is_pos == class_is_pos].astype(float, copy = False)
+            if sample_weight is None:
+                sorted_proba[class_is_pos] = np.sort(class_proba)
+                sorted_weights[class_is_pos] = np.ones(len(class_proba))
+            else:
+                order = np.argsort(class_proba)
+                sorted_proba[class_is_pos] = class_proba[order]
+                sorted_weights[class_is_pos] = sample_weight[is_pos == class_is_pos][order]
+        cum_weights[class_is_pos] = np.r_[0., np.cumsum(sorted_weights[class_is_pos])]
+        cum_weighted_proba[class_is_pos] = np.r_[0., np.cumsum(sorted_weights[class_is_pos] * sorted_proba[class_is_pos])]
+    
+    proba_pos, weights_pos = sorted_proba[True], sorted_weights[True]
+    weight_neg, weight_pos = cum_weights[False][-1], cum_weights[True][-1]
+    
+    neg_below = cum_weights[False][np.searchsorted(sorted_proba[False], proba_pos, side = 'left')]
+    neg_tied = cum_weights[False][np.searchsorted(sorted_proba[False], proba_pos, side = 'right')] - neg_below
+    roc_auc = _safe_divide(np.sum(weights_pos * (neg_below + neg_tied / 2)), weight_pos * weight_neg, np.nan)
+    
+    # weights predicted positive at the threshold of each positive
+    TP = weight_pos - cum_weights[True][np.searchsorted(proba_pos, proba_pos, side = 'left')]
+    FP = weight_neg - neg_below
+    pr_auc = _safe_divide(np.sum(weights_pos * _safe_divide(TP, TP + FP, 1)), weight_pos, np.nan)
+    
+    n_data = weight_neg + weight_pos
+    clipped_proba = {class_is_pos: np.clip(sorted_proba[class_is_pos], np.finfo(float).eps, 1 - np.finfo(float).eps) 
+                     for class_is_pos in [False, True]}
+    brier_score = (np.sum(sorted_weights[False] * sorted_proba[False]**2) 
+                   + np.sum(weights_pos * (1 - proba_pos)**2)) / n_data
+    log_loss = -(np.sum(sorted_weights[False] * np.log(1 - clipped_proba[False])) 
+                 + np.sum(weights_pos * np.log(clipped_proba[True]))) / n_data
+    
+    # bin k contains the probabilities in (edges[k], edges[k+1]], the first one also 0 (as calibration_curve)
+    inner_edges = np.linspace(0, 1, n_calibration_bins + 1)[1:-1]
+    bins_pos_weight = np.diff(cum_weights[True][np.r_[0, np.searchsorted(proba_pos, inner_edges, side = 'right'), 
+                                                      len(proba_pos)]])
+    bins_proba_sum = sum(np.diff(cum_weighted_proba[class_is_pos][np.r_[0, np.searchsorted(sorted_proba[class_is_pos], 
+                                                                                             inner_edges, side = 'right'), 
+                                                                         len(sorted_proba[class_is_pos])]])
+                         for class_is_pos in [False, True])
+    calibration_error = np.sum(np.abs(bins_pos_weight - bins_proba_sum)) / n_data
+    
+    return {'roc_auc': float(roc_auc), 'pr_auc': float(pr_auc), 'brier_score': float(brier_score),
+            'log_loss': float(log_loss), 'calibration_error': float(calibration_error)}
+
+def _get_cohens_kappa(TN, FP, FN, TP):
+    # Element-wise Cohen's Kappa from confusion counts, as 1 - observed disagreement / expected disagreement
+    # (NaN when undefined, as scikit-learn cohen_kappa_score)
+    TN, FP, FN, TP = [np.asarray(x, dtype = float) for x in (TN, FP, FN, TP)]
+    n_data = TN + FP + FN + TP
+    expected_disagreement = _safe_divide((TN + FP) * (TP + FP) + (TP + FN) * (TN + FN), n_data, 0)
+    return 1 - _safe_divide(FP + FN, expected_disagreement, np.nan)
+
+def _get_matthews_corr_coef(TN, FP, FN, TP):
+    # Element-wise Matthews corr. coeff. from covariances of true and predicted labels
+    # (0 when undefined, as scikit-learn matthews_corrcoef)
+    TN, FP, FN, TP = [np.asarray(x, dtype = float) for x in (TN, FP, FN, TP)]
+    n_data = TN + FP + FN + TP
+    cov_true_pred = (TP + TN) * n_data - ((TN + FP) * (TN + FN) + (TP + FN) * (TP + FP))
+    cov_pred_pred = n_data**2 - ((TN + FN)**2 + (TP + FP)**2)
+    cov_true_true = n_data**2 - ((TN + FP)**2 + (TP + FN)**2)
+    return _safe_divide(cov_true_pred, np.sqrt(cov_true_true * cov_pred_pred), 0)
+
+def _safe_divide(numerator, denominator, zero_division):
+    # Element-wise division returning zero_division where denominator is 0
+    numerator, denominator = np.broadcast_arrays(np.asarray(numerator, dtype = float), 
+                                                 np.asarray(denominator, dtype = float))
+    result = np.full(numerator.shape, zero_division, dtype = float)
+    np.divide(numerator, denominator, out = result, where = denominator != 0)
+    return result
+
 def _get_amount_matrix(true_y, predicted_proba, threshold, amounts):
     
     """ 
@@ -321,12 +496,8 @@ def _get_amount_matrix(true_y, predicted_proba, threshold, amounts):
     amount_matrix: np.array
          matrix with amount values for each class (TN, FP, FN, TP)
     """
-    prediction_data_df = pd.DataFrame(zip(true_y, predicted_proba, amounts), columns = ['true_y', 'predicted_proba', 'amounts'])
-
-    amount_TP = sum(prediction_data_df[(prediction_data_df['true_y'] == 1) & (prediction_data_df['predicted_proba'] >= threshold)]['amounts'])
-    amount_FP = sum(prediction_data_df[(prediction_data_df['true_y'] == 0) & (prediction_data_df['predicted_proba'] >= threshold)]['amounts'])
-    amount_TN = sum(prediction_data_df[(prediction_data_df['true_y'] == 0) & (prediction_data_df['predicted_proba'] < threshold)]['amounts'])
-    amount_FN = sum(prediction_data_df[(prediction_data_df['true_y'] == 1) & (prediction_data_df['predicted_proba'] < threshold)]['amounts'])
+    amount_TN, amount_FP, amount_FN, amount_TP = [x[0] for x in get_confusion_amounts(true_y, predicted_proba, 
+                                                                                      [threshold], amounts)]
 
     amount_matrix = np.array([[amount_TN, amount_FP],
                               [amount_FN, amount_TP]])
@@ -355,44 +526,82 @@ def _get_cost_matrix(true_y, predicted_proba, threshold, cost_dict):
     cost_matrix: np.array
          matrix with cost values for each class (TN, FP, FN, TP)
     """
-    prediction_data_df = pd.DataFrame(zip(true_y, predicted_proba), columns = ['true_y', 'predicted_proba'])
-    
-    for confusion_class in ['TN', 'FP', 'FN', 'TP']:
-        prediction_data_df['cost_' + confusion_class] = cost_dict[confusion_class]
-
-    cost_TN = sum(prediction_data_df[(prediction_data_df['true_y'] == 0) & (prediction_data_df['predicted_proba'] < threshold)]['cost_TN'])
-    cost_FP = sum(prediction_data_df[(prediction_data_df['true_y'] == 0) & (prediction_data_df['predicted_proba'] >= threshold)]['cost_FP'])
-    cost_FN = sum(prediction_data_df[(prediction_data_df['true_y'] == 1) & (prediction_data_df['predicted_proba'] < threshold)]['cost_FN'])
-    cost_TP = sum(prediction_data_df[(prediction_data_df['true_y'] == 1) & (prediction_data_df['predicted_proba'] >= threshold)]['cost_TP'])
+    cost_TN, cost_FP, cost_FN, cost_TP = [x[0] for x in get_confusion_costs(true_y, predicted_proba, 
+                                                                            [threshold], cost_dict)]
 
     cost_matrix = np.array([[cost_TN, cost_FP],
                             [cost_FN, cost_TP]])
     return cost_matrix
 
-def _get_density_curve_data(data, curve_type = 'kde'):
-    
-    """ 
-    Compute distribution data using plotly figure_factory distplot, to plot custom interactive density curve: 
+def _get_density_chunks(data, weights):
+    # Consecutive chunks of data and weights (None if not weighted) as float64 arrays, so that the temporary arrays
+    # of the density curves are bounded by the chunk size and float32 data are accumulated in float64
+    for start in range(0, len(data), _DENSITY_CHUNK_SIZE):
+        stop = start + _DENSITY_CHUNK_SIZE
+        yield data[start:stop].astype(float), None if weights is None else weights[start:stop].astype(float)
 
-    Parameters
-    ----------
-    data: list containing a sequence of floats
-        data of which the density curve will be computed
-        e.g. list([0.5, 0.8, 0.6]) or [np.array([2.0, 5.8, 0.0])]  
-    curve_type: {'kde', 'normal'},  default=kde 
-        type of curve, either kernel density estimation or normal curve
-    
-    Returns
-    ----------
-    x_dist_data: np.array
-         array with x coordinates data for the density curve 
-    y_dist_data: np.array
-         array with y coordinates data for the density curve
-    """
-  
-    fig = ff.create_distplot(data, ['data'], show_hist=False, show_rug=False, curve_type=curve_type)
-    
-    x_dist_data = np.array(fig['data'][0]['x'])
-    y_dist_data = np.array(fig['data'][0]['y'])
-    
-    return x_dist_data, y_dist_data
\ No newline at end of file
+def _get_weighted_moments(data, weights):
+    # Sum of the weights, sum of the squared weights, weighted mean and weighted sum of squared deviations 
+    # from the mean (data without weights have unit weights), accumulated in float64 in two passes over the chunks
+    sum_weights = sum_squared_weights = weighted_sum = 0.
+    for chunk, chunk_weights in _get_density_chunks(data, weights):
+        if chunk_weights is None:
+            sum_weights += len(chunk)
+            sum_squared_weights += len(chunk)
+            weighted_sum += chunk.sum()
+        else:
+            sum_weights += chunk_weights.sum()
+            sum_squared_weights += np.dot(chunk_weights, chunk_weights)
+            weighted_sum += np.dot(chunk_weights, chunk)
+    mean = weighted_sum / sum_weights
+    
+    sum_squared_deviations = 0.
+    for chunk, chunk_weights in _get_density_chunks(data, weights):
+        deviations = chunk - mean
+        sum_squared_deviations += np.dot(deviations if chunk_weights is None else chunk_weights * deviations, deviations)
+    
+    return sum_weights, sum_squared_weights, mean, sum_squared_deviations
+
+def _get_kde_bandwidth(sum_weights, sum_squared_weights, sum_squared_deviations, bandwidth):
+    # Standard deviation of the gaussian kernel, from a rule of thumb on the effective number of data
+    # and the unbiased weighted standard deviation (as scipy.stats.gaussian_kde), or given as a float
+    if not isinstance(bandwidth, str):
+        if bandwidth <= 0:
+            raise ValueError("bandwidth must be positive")
+        return float(bandwidth)
+    n_effective = sum_weights**2 / sum_squared_weights
+    if bandwidth == 'scott':
+        factor = n_effective**(-1 / 5)
+    elif bandwidth == 'silverman':
+        factor = (n_effective * 3 / 4)**(-1 / 5)
+    else:
+        raise ValueError("bandwidth must be 'scott', 'silverman' or a positive float")
+    return factor * np.sqrt(sum_squared_deviations / (sum_weights - sum_squared_weights / sum_weights))
+
+def _get_binned_kde(data, weights, x_values, bandwidth):
+    # Gaussian KDE (not normalized by the sum of the weights) on the evenly spaced x_values: weights are linearly binned 
+    # by chunks on a grid refining x_values (at least 4 grid points per bandwidth) and convolved with the kernel through FFT
+    refinement = int(np.clip(np.ceil(4 * (x_values[1] - x_values[0]) / bandwidth), 1, 64))
+    n_grid = (len(x_values) - 1) * refinement + 1
+    delta = (x_values[-1] - x_values[0]) / (n_grid - 1)
+    
+    binned_weights = np.zeros(n_grid)
+    for chunk, chunk_weights in _get_density_chunks(data, weights):
+        position = (chunk - x_values[0]) / delta
+        left = np.clip(np.floor(position).astype(np.int64), 0, n_grid - 2)
+        right_fraction = position - left
+        left_weights = 1 - right_fraction
+        if chunk_weights is not None:
+            left_weights *= chunk_weights
+            right_fraction *= chunk_weights
+        binned_weights += np.bincount(left, left_weights, minlength = n_grid) \
+                          + np.bincount(left + 1, right_fraction, minlength = n_grid)
+    
+    # kernel truncated at 5 bandwidths, zero padded to avoid the circular wrap-around of the FFT convolution
+    half_width = min(int(np.ceil(5 * bandwidth / delta)), n_grid - 1)
+    offsets = np.arange(-half_width, half_width + 1) * delta
+    kernel = np.exp(-0.5 * (offsets / bandwidth)**2) / (bandwidth * np.sqrt(2 * np.pi))
+    fft_size = 1 << int(np.ceil(np.log2(n_grid + 2 * half_width)))
+    density = np.fft.irfft(np.fft.rfft(binned_weights, fft_size) * np.fft.rfft(kernel, fft_size), fft_size)
+    
+    return np.clip(density[half_width:half_width + n_grid:refinement], 0, None)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+
+def _get_numpy_array(values):
+    # 1d NumPy array of values: NumPy arrays (also memory-mapped), pandas objects and PyArrow arrays
+    # without nulls are not copied, as long as they are contiguous
+    if isinstance(values, np.ndarray):
+        array = values
+    elif isinstance(values, (pd.Series, pd.Index)):
+        array = values.to_numpy()
+    elif type(values).__module__.split('.')[0] == 'pyarrow': # Array or ChunkedArray (chunks are concatenated)
+        array = values.to_numpy(zero_copy_only = False)
+    else:
+        array = np.asarray(values)
+
+    return np.ascontiguousarray(np.ravel(array))
+
+def _get_labels_array(true_y, name = 'true_y'):
+    # True labels as a uint8 array of 0 and 1: bool and uint8 arrays are not copied,
+    # other numeric arrays are validated and converted once
+    array = _get_numpy_array(true_y)
+
+    if array.dtype == bool:
+        return array.view(np.uint8)
+    if array.dtype.kind not in 'iuf':
+        raise TypeError(f"{name} must contain numeric labels (0 or 1), got dtype {array.dtype}")
+    if len(array) == 0:
+        return array.astype(np.uint8)
+
+    if array.dtype.kind == 'f':
+        is_binary = bool(((array == 0) | (array == 1)).all())
+    else: # integers don't need temporary arrays
+        is_binary = (array.min() >= 0) and (array.max() <= 1)
+    if not is_binary:
+        raise ValueError(f"{name} must contain only 0 and 1 labels")
+
+    return array if array.dtype == np.uint8 else array.astype(np.uint8)
+
+def _get_values_array(values, name = 'predicted_proba', n_data = None):
+    # Scores, amounts or weights as a float array: float64 and float32 arrays are not copied,
+    # other numeric arrays are converted once to float64. Values must be finite
+    array = _get_numpy_array(values)
+
+    if array.dtype.kind not in 'biuf':
+        raise TypeError(f"{name} must contain numeric values, got dtype {array.dtype}")
+    if array.dtype not in (np.float64, np.float32):
+        array = array.astype(float)
+    if (n_data is not None) and (len(array) != n_data):
+        raise ValueError(f"{name} must have one element for each data point ({n_data}), got {len(array)}")
+    # min and max propagate NaN, without temporary arrays
+    if len(array) and not (np.isfinite(array.min()) and np.isfinite(array.max())):
+        raise ValueError(f"{name} must contain only finite values")
+
+    return array
+
+def _get_labels_scores_arrays(true_y, predicted_proba):
+    # True labels and predicted probabilities, validated and converted once (see _get_labels_array and _get_values_array)
+    true_y_array = _get_labels_array(true_y)
+    predicted_proba_array = _get_values_array(predicted_proba, 'predicted_proba')
+
+    if len(true_y_array) != len(predicted_proba_array):
+        raise ValueError("true_y and predicted_proba must have the same length")
+
+    return true_y_array, predicted_proba_array
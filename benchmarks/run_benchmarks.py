@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Benchmarks of the public functions of bctools at production scales.
+
+Every benchmark is run for each data size, threshold step and inputs configuration
+(labels only, amounts, per-row costs, amounts and per-row costs) it applies to, measuring:
+- time: best wall time of --repeat calls (the memoization cache is disabled)
+- peak_memory: peak of the memory allocated by a call (tracemalloc, NumPy arrays included)
+- figure_size: size of the figure serialized to JSON, for the plots
+
+Results are saved to a JSON file (by default benchmarks/results/<git commit>.json) together with the versions
+of the environment, so that runs on different commits can be compared:
+
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --steps 0.01
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+import sklearn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import bctools as bc
+from bctools.utilities import get_amount_cost_df, get_confusion_matrix_and_metrics_df, get_invariant_metrics_df
+from bctools.thresholds import get_optimized_thresholds_df
+
+SIZES = [10**3, 10**5, 10**6, 10**7]
+STEPS = [0.01, 0.001]
+INPUTS = ['labels', 'amounts', 'costs', 'amounts_costs']
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def get_benchmark_data(n_data, inputs, random_state = 0):
+
+    """
+    Generates n_data synthetic predictions of an imbalanced problem (20% positives),
+    with predicted probabilities drawn from beta distributions (rounded to 4 decimals, so that there are ties)
+
+    Parameters
+    ----------
+    n_data: int
+        number of data points
+    inputs: {'labels', 'amounts', 'costs', 'amounts_costs'}
+        inputs configuration: amounts and/or cost_dict (with per-row FN costs) are None if not required
+    random_state: int, default=0
+        seed of the generated data
+
+    Returns
+    ----------
+    data: dict
+        keys "true_y", "predicted_proba", "amounts", "cost_dict"
+    """
+    rng = np.random.default_rng(random_state)
+    true_y = (rng.random(n_data) < 0.2).astype(np.int64)
+    predicted_proba = np.where(true_y == 1, rng.beta(4, 2, n_data), rng.beta(2, 4, n_data)).round(4)
+    amounts = rng.lognormal(3, 1, n_data)
+
+    return {'true_y': true_y,
+            'predicted_proba': predicted_proba,
+            'amounts': amounts if inputs in ['amounts', 'amounts_costs'] else None,
+            'cost_dict': bc.get_cost_dict(TN = 0, FP = 10, FN = amounts, TP = 1) if inputs in ['costs', 'amounts_costs'] else None}
+
+def _get_threshold_values(threshold_step):
+    # Thresholds of the plots for the given step
+    return list(np.arange(0, 1 + threshold_step, threshold_step))
+
+# name, function of (data, threshold_step), inputs configurations, whether the threshold step is used,
+# maximum data size (plots embedding every data point)
+BENCHMARKS = [
+    ('get_amount_cost_df',
+     lambda data, step: get_amount_cost_df(data['true_y'], data['predicted_proba'], _get_threshold_values(step),
+                                           data['amounts'], data['cost_dict']),
+     ['amounts', 'costs', 'amounts_costs'], True, None),
+    ('get_confusion_matrix_and_metrics_df',
+     lambda data, step: get_confusion_matrix_and_metrics_df(data['true_y'], data['predicted_proba'], threshold = 0.5),
+     ['labels'], False, None),
+    ('get_invariant_metrics_df',
+     lambda data, step: get_invariant_metrics_df(data['true_y'], data['predicted_proba']),
+     ['labels'], False, None),
+    ('get_optimized_thresholds_df',
+     lambda data, step: get_optimized_thresholds_df('all', _get_threshold_values(step)[1:-1], data['true_y'],
+                                                    data['predicted_proba'], data['cost_dict'], random_state = 0),
+     ['labels', 'costs'], True, None),
+    ('get_bootstrap_confidence_bands',
+     lambda data, step: bc.get_bootstrap_confidence_bands(data['true_y'], data['predicted_proba'], _get_threshold_values(step),
+                                                          data['amounts'], data['cost_dict'], random_state = 0),
+     ['labels', 'amounts_costs'], True, None),
+    ('build_curve_ROC_plot',
+     lambda data, step: bc.build_curve_ROC_plot(data['true_y'], data['predicted_proba']),
+     ['labels'], False, None),
+    ('build_curve_ROC_plot[tolerance]',
+     lambda data, step: bc.build_curve_ROC_plot(data['true_y'], data['predicted_proba'], tolerance = 1e-3),
+     ['labels'], False, None),
+    ('build_curve_PR_plot',
+     lambda data, step: bc.build_curve_PR_plot(data['true_y'], data['predicted_proba']),
+     ['labels'], False, None),
+    ('build_curve_PR_plot[tolerance]',
+     lambda data, step: bc.build_curve_PR_plot(data['true_y'], data['predicted_proba'], tolerance = 1e-3),
+     ['labels'], False, None),
+    ('build_predicted_proba_violin_plot',
+     lambda data, step: bc.build_predicted_proba_violin_plot(data['true_y'], data['predicted_proba'], threshold_step = step),
+     ['labels'], True, 10**5),
+    ('build_predicted_proba_violin_plot[compact]',
+     lambda data, step: bc.build_predicted_proba_violin_plot(data['true_y'], data['predicted_proba'], threshold_step = step,
+                                                             compact = True, max_points = 20000),
+     ['labels'], True, None),
+    ('build_predicted_proba_density_curve_plot',
+     lambda data, step: bc.build_predicted_proba_density_curve_plot(data['true_y'], data['predicted_proba'],
+                                                                    threshold_step = step),
+     ['labels'], True, None),
+    ('build_predicted_proba_density_curve_plot[compact]',
+     lambda data, step: bc.build_predicted_proba_density_curve_plot(data['true_y'], data['predicted_proba'],
+                                                                    threshold_step = step, compact = True),
+     ['labels'], True, None),
+    ('build_confusion_matrix_plot',
+     lambda data, step: bc.build_confusion_matrix_plot(data['true_y'], data['predicted_proba'], threshold_step = step,
+                                                       amounts = data['amounts'], cost_dict = data['cost_dict']),
+     ['labels', 'amounts_costs'], True, None),
+    ('build_confusion_matrix_plot[compact]',
+     lambda data, step: bc.build_confusion_matrix_plot(data['true_y'], data['predicted_proba'], threshold_step = step,
+                                                       amounts = data['amounts'], cost_dict = data['cost_dict'],
+                                                       compact = True),
+     ['labels', 'amounts_costs'], True, None),
+    ('build_confusion_linechart_plot',
+     lambda data, step: bc.build_confusion_linechart_plot(data['true_y'], data['predicted_proba'], threshold_step = step,
+                                                          amounts = data['amounts'], cost_dict = data['cost_dict']),
+     ['amounts', 'costs', 'amounts_costs'], True, None),
+    ('build_confusion_linechart_plot[compact]',
+     lambda data, step: bc.build_confusion_linechart_plot(data['true_y'], data['predicted_proba'], threshold_step = step,
+                                                          amounts = data['amounts'], cost_dict = data['cost_dict'],
+                                                          compact = True),
+     ['amounts', 'costs', 'amounts_costs'], True, None),
+    ('build_total_amount_cost_plot',
+     lambda data, step: bc.build_total_amount_cost_plot(data['true_y'], data['predicted_proba'], threshold_step = step,
+                                                        amounts = data['amounts'], cost_dict = data['cost_dict']),
+     ['amounts_costs'], True, None),
+]
+
+def run_benchmarks(sizes = SIZES, steps = STEPS, name_filter = None, repeat = 3, verbose = True):
+
+    """
+    Runs the benchmarks whose name contains name_filter on every data size, threshold step and inputs configuration
+
+    Parameters
+    ----------
+    sizes: list of ints, default=SIZES
+        data sizes
+    steps: list of floats, default=STEPS
+        threshold steps (only used by the benchmarks depending on the thresholds)
+    name_filter: str, default=None
+        if given, only the benchmarks whose name contains it are run
+    repeat: int, default=3
+        number of timed calls of each benchmark (the best time is kept)
+    verbose: bool, default=True
+        if True, each result is printed as soon as it is measured
+
+    Returns
+    ----------
+    results: list of dicts
+        one dict for each run, with keys "benchmark", "n_data", "threshold_step", "inputs",
+        "time", "peak_memory", "figure_size" (None if the result is not a figure) and "error" (None if it succeeded)
+    """
+    bc.set_cache_options(enabled = False)
+    results = []
+
+    try:
+        for n_data in sizes:
+            for inputs in INPUTS:
+                data = None
+                for name, function, benchmark_inputs, uses_step, max_n_data in BENCHMARKS:
+                    if ((name_filter is not None) and (name_filter not in name)) or (inputs not in benchmark_inputs) \
+                       or ((max_n_data is not None) and (n_data > max_n_data)):
+                        continue
+                    if data is None:
+                        data = get_benchmark_data(n_data, inputs)
+
+                    for threshold_step in (steps if uses_step else [None]):
+                        result = _run_benchmark(name, function, data, threshold_step, repeat)
+                        result.update({'n_data': n_data, 'inputs': inputs})
+                        results.append(result)
+                        if verbose:
+                            print(_format_result(result), flush = True)
+    finally:
+        bc.set_cache_options()
+
+    return results
+
+def _run_benchmark(name, function, data, threshold_step, repeat):
+    # Peak memory and figure size of a first call, then best time of repeat calls
+    result = {'benchmark': name, 'threshold_step': threshold_step,
+              'time': None, 'peak_memory': None, 'figure_size': None, 'error': None}
+    try:
+        tracemalloc.start()
+        output = function(data, threshold_step)
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        figure = output[0] if isinstance(output, tuple) else output
+        if isinstance(figure, go.Figure):
+            result['figure_size'] = len(figure.to_json())
+        del output, figure
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(data, threshold_step)
+            times.append(time.perf_counter() - start)
+        result['time'] = min(times)
+    except Exception as error: # e.g. MemoryError at the largest sizes: recorded, the other benchmarks go on
+        result['error'] = f"{type(error).__name__}: {error}"
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    return result
+
+def _format_result(result):
+    # One line description of a benchmark result
+    description = f"{result['benchmark']:<52} n={result['n_data']:<9,} step={str(result['threshold_step']):<6} " \
+                  + f"inputs={result['inputs']:<14}"
+    if result['error'] is not None:
+        return description + ' ' + result['error']
+    description += f" time={result['time']:9.4f}s  peak_memory={result['peak_memory'] / 2**20:9.1f}MB"
+    if result['figure_size'] is not None:
+        description += f"  figure_size={result['figure_size'] / 2**20:8.2f}MB"
+    return description
+
+def save_results(results, path = None):
+
+    """
+    Saves the results to a JSON file, together with the commit, the date and the versions of the environment
+
+    Parameters
+    ----------
+    results: list of dicts
+        output of run_benchmarks
+    path: str, default=None
+        path of the file; if None, benchmarks/results/<git commit>.json
+
+    Returns
+    ----------
+    path: str
+        path of the saved file
+    """
+    commit = _get_git_commit()
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok = True)
+        path = os.path.join(RESULTS_DIR, f"{commit or 'unknown'}.json")
+
+    environment = {'python': platform.python_version(), 'machine': platform.machine(), 'processor': platform.processor(),
+                   'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                   'plotly': plotly.__version__, 'scikit-learn': sklearn.__version__}
+
+    with open(path, 'w') as results_file:
+        json.dump({'commit': commit, 'date': datetime.datetime.now().isoformat(timespec = 'seconds'),
+                   'environment': environment, 'results': results}, results_file, indent = 1)
+
+    return path
+
+def compare_results(old_path, new_path, factor = 1.2):
+
+    """
+    Prints the ratios (new / old) of time, peak memory and figure size of the benchmarks run in both files,
+    marking the ones that got worse than factor
+
+    Parameters
+    ----------
+    old_path, new_path: str
+        paths of the results files (output of save_results)
+    factor: float, default=1.2
+        ratio above which a result is marked as a regression
+
+    Returns
+    ----------
+    regressions: list of dicts
+        results of new_path that got worse than factor, with the ratios of their measures
+    """
+    runs = []
+    for path in [old_path, new_path]:
+        with open(path) as results_file:
+            saved = json.load(results_file)
+        runs.append({_get_result_key(result): result for result in saved['results'] if result['error'] is None})
+
+    regressions = []
+    for key, new_result in runs[1].items():
+        if key not in runs[0]:
+            continue
+        ratios = {measure: new_result[measure] / runs[0][key][measure]
+                  for measure in ['time', 'peak_memory', 'figure_size']
+                  if (new_result[measure] is not None) and runs[0][key][measure]}
+        is_regression = any(ratio > factor for ratio in ratios.values())
+        if is_regression:
+            regressions.append(dict(new_result, ratios = ratios))
+        print(('REGRESSION ' if is_regression else '           ') + _format_result(new_result).split(' time=')[0] + '  '
+              + '  '.join(f"{measure}={ratio:.2f}x" for measure, ratio in ratios.items()))
+
+    return regressions
+
+def _get_result_key(result):
+    # Identifier of a benchmark run, to match the results of different files
+    return (result['benchmark'], result['n_data'], result['threshold_step'], result['inputs'])
+
+def _get_git_commit():
+    # Short hash of the current git commit (None if not in a git repository)
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd = os.path.dirname(os.path.abspath(__file__)),
+                                       stderr = subprocess.DEVNULL, text = True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Benchmarks of the public functions of bctools")
+    parser.add_argument('--sizes', type = int, nargs = '+', default = SIZES, help = "data sizes")
+    parser.add_argument('--steps', type = float, nargs = '+', default = STEPS, help = "threshold steps")
+    parser.add_argument('--filter', default = None, help = "run only the benchmarks whose name contains this string")
+    parser.add_argument('--repeat', type = int, default = 3, help = "number of timed calls of each benchmark")
+    parser.add_argument('--output', default = None, help = "results file (default: benchmarks/results/<git commit>.json)")
+    parser.add_argument('--compare', nargs = 2, metavar = ('OLD', 'NEW'), default = None,
+                        help = "compare two results files instead of running the benchmarks")
+    parser.add_argument('--factor', type = float, default = 1.2, help = "ratio marked as regression when comparing")
+    args = parser.parse_args(argv)
+
+    if args.compare is not None:
+        regressions = compare_results(*args.compare, factor = args.factor)
+        return 1 if regressions else 0
+
+    results = run_benchmarks(args.sizes, args.steps, args.filter, args.repeat)
+    print(f"Results saved to {save_results(results, args.output)}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import plotly.graph_objects as go
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+
+class Test_Build_Plots(unittest.TestCase):
+    def test_build_plots(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        amounts = np.abs(X_test[:, 13])
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_test[:, 12]), TP = 1)
+
+        # figures are built without being displayed
+        with patch("plotly.graph_objects.Figure.show") as show_patch:
+            fig, area_under_ROC = bc.build_curve_ROC_plot(y_test, test_predicted_proba)
+            self.assertIsInstance(fig, go.Figure)
+            self.assertAlmostEqual(area_under_ROC, 0.9550544562049395, places=3)
+
+            fig, area_under_PR = bc.build_curve_PR_plot(y_test, test_predicted_proba)
+            self.assertIsInstance(fig, go.Figure)
+
+            fig, metrics_df, constant_metrics_df, optimal_thresholds_df = bc.build_confusion_matrix_plot(
+                y_test, test_predicted_proba, threshold_step = threshold_step, amounts = amounts, cost_dict = cost_dict)
+            self.assertIsInstance(fig, go.Figure)
+            self.assertIsNone(optimal_thresholds_df)
+
+            fig, amount_cost_df, total_amount = bc.build_confusion_linechart_plot(
+                y_test, test_predicted_proba, threshold_step = threshold_step, amounts = amounts, cost_dict = cost_dict)
+            self.assertIsInstance(fig, go.Figure)
+            self.assertAlmostEqual(total_amount, round(amounts.sum(), 2), places=2)
+
+            fig, total_amount_cost_df = bc.build_total_amount_cost_plot(
+                y_test, test_predicted_proba, threshold_step = threshold_step, amounts = amounts, cost_dict = cost_dict)
+            self.assertIsInstance(fig, go.Figure)
+            self.assertIn('cost_sum', total_amount_cost_df.columns)
+
+            show_patch.assert_not_called()
+
+            # plot functions display the figure built by their build counterpart
+            self.assertEqual(bc.curve_ROC_plot(y_test, test_predicted_proba), area_under_ROC)
+            show_patch.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
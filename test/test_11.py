@@ -0,0 +1,81 @@
+import unittest
+import json
+
+import numpy as np
+
+import plotly
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+
+class Test_Compact_Slider(unittest.TestCase):
+    def test_compact_slider(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        amounts = np.abs(X_test[:, 13])
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_test[:, 12]), TP = 1)
+
+        # traces compared as json, without the attributes handled by the slider of the full figure
+        to_json = lambda trace: json.loads(json.dumps({key: value for key, value in trace.to_plotly_json().items()
+                                                       if key not in ['visible', 'uid']}, cls = plotly.utils.PlotlyJSONEncoder))
+
+        for build_plot in [bc.build_confusion_matrix_plot, bc.build_confusion_linechart_plot]:
+            full_fig = build_plot(y_test, test_predicted_proba, threshold_step = threshold_step,
+                                  amounts = amounts, cost_dict = cost_dict)[0]
+            compact_fig = build_plot(y_test, test_predicted_proba, threshold_step = threshold_step,
+                                     amounts = amounts, cost_dict = cost_dict, compact = True)[0]
+
+            full_steps = full_fig.layout.sliders[0].steps
+            compact_steps = compact_fig.layout.sliders[0].steps
+            self.assertEqual(len(full_steps), len(compact_steps))
+            self.assertLess(len(compact_fig.data), len(full_fig.data))
+
+            for step_index in [0, 7, len(full_steps) - 1]:
+                # apply the restyle of the step to the compact figure, as plotly.js would do
+                restyle_data, layout_update, trace_indices = compact_steps[step_index].args
+                for key, values in restyle_data.items():
+                    for trace_index, value in zip(trace_indices, values):
+                        if value is not None:
+                            compact_fig.data[trace_index][key] = value
+
+                visible_traces = [trace for trace, visible in zip(full_fig.data, full_steps[step_index].args[0]['visible']) if visible]
+                self.assertEqual([to_json(trace) for trace in visible_traces],
+                                 [to_json(trace) for trace in compact_fig.data])
+                self.assertEqual(full_steps[step_index].args[1], layout_update)
+
+        # compact and n_jobs follow the original parameters, so a positional title doesn't switch to the compact slider
+        fig = bc.build_confusion_matrix_plot(y_test, test_predicted_proba, threshold_step, amounts, cost_dict, None, 70, 0.2,
+                                             False, '€', None, 'My title')[0]
+        full_fig = bc.build_confusion_matrix_plot(y_test, test_predicted_proba, threshold_step = threshold_step,
+                                                  amounts = amounts, cost_dict = cost_dict)[0]
+        self.assertEqual(len(fig.data), len(full_fig.data))
+        self.assertIn('My title', fig.layout.title.text)
+
+        full_fig = bc.build_confusion_linechart_plot(y_test, test_predicted_proba, threshold_step = threshold_step,
+                                                     amounts = amounts, cost_dict = cost_dict)[0]
+        fig, _, _ = bc.build_confusion_linechart_plot(y_test, test_predicted_proba, threshold_step, amounts, cost_dict, '€',
+                                                      'My title')
+        self.assertEqual(len(fig.data), len(full_fig.data))
+        self.assertIn('My title', fig.layout.title.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
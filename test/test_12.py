@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+from bctools.confusion import get_confusion_counts
+
+class Test_Compact_Violin(unittest.TestCase):
+    def test_compact_violin_plot(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+        TN, FP, FN, TP = get_confusion_counts(y_test, test_predicted_proba, threshold_values)
+
+        full_fig = bc.build_predicted_proba_violin_plot(y_test, test_predicted_proba, threshold_step = threshold_step)
+        fig = bc.build_predicted_proba_violin_plot(y_test, test_predicted_proba, threshold_step = threshold_step, compact = True)
+
+        # violin, one strip plot for each true class and the legend of the confusion classes
+        self.assertEqual(len(fig.data), 7)
+        self.assertLess(len(fig.data), len(full_fig.data))
+
+        for i, step in enumerate(fig.layout.sliders[0].steps):
+            self.assertEqual(step.args[1], full_fig.layout.sliders[0].steps[i].args[1])
+            if TP[i] > 0:
+                self.assertIn(f"TP: {TP[i]}", step.args[1]['title']['text'])
+
+            # each point takes the color of its confusion class from the colorscale of its strip plot
+            for true_class, colorscale in zip([0, 1], step.args[0]['marker.colorscale']):
+                pred = np.asarray(fig.data[1 + true_class].y)
+                above = np.array([color for stop, color in colorscale])[
+                    np.searchsorted([stop for stop, color in colorscale], pred, side = 'right').clip(1, len(colorscale)) - 1]
+                expected = np.where(pred >= threshold_values[i],
+                                    fig.data[4 + 2 * true_class].marker.color, fig.data[3 + 2 * true_class].marker.color)
+                np.testing.assert_array_equal(above, expected)
+
+        # at most max_points points are displayed, while the counts refer to all the data
+        fig = bc.build_predicted_proba_violin_plot(y_test, test_predicted_proba, threshold_step = threshold_step,
+                                                   compact = True, max_points = 50)
+        self.assertLessEqual(len(fig.data[1].x) + len(fig.data[2].x), 50)
+        self.assertGreater(len(fig.data[2].x), 0)
+        self.assertIn(f"TN: {TN[10]},  FN: {FN[10]},  TP: {TP[10]}", fig.layout.sliders[0].steps[10].args[1]['title']['text'])
+
+        # compact and max_points follow the original parameters, so positional titles keep working
+        fig = bc.build_predicted_proba_violin_plot(y_test, test_predicted_proba, threshold_step, 3, "My title")
+        self.assertEqual(len(fig.data), len(full_fig.data))
+        self.assertIn("My title", fig.layout.title.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+
+import plotly.graph_objects as go
+
+from scipy.stats import gaussian_kde
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+
+class Test_Density_Curve(unittest.TestCase):
+    def test_density_curve_data(self):
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+        amounts = np.abs(X_test[:, 13])
+
+        for true_class in [0, 1]:
+            data = test_predicted_proba[y_test == true_class]
+            weights = amounts[y_test == true_class]
+
+            # binned FFT estimation matches the exact gaussian kde, with and without weights
+            for bandwidth in ['scott', 'silverman']:
+                for data_weights in [None, weights]:
+                    x_values, density = bc.get_density_curve_data(data, bandwidth = bandwidth, weights = data_weights)
+                    self.assertEqual(len(x_values), 500)
+                    self.assertAlmostEqual(x_values[0], data.min())
+                    self.assertAlmostEqual(x_values[-1], data.max())
+                    expected = gaussian_kde(data, bw_method = bandwidth, weights = data_weights)(x_values)
+                    self.assertLess(np.abs(density - expected).max(), 1e-3 * expected.max())
+
+            # with a given standard deviation of the kernel
+            x_values, density = bc.get_density_curve_data(data, bandwidth = 0.05)
+            expected = gaussian_kde(data, bw_method = 0.05 / data.std(ddof = 1))(x_values)
+            self.assertLess(np.abs(density - expected).max(), 1e-3 * expected.max())
+
+            x_values, density = bc.get_density_curve_data(data, curve_type = 'normal')
+            self.assertAlmostEqual(x_values[np.argmax(density)], data.mean(), delta = x_values[1] - x_values[0])
+
+        with self.assertRaises(ValueError):
+            bc.get_density_curve_data(test_predicted_proba, bandwidth = 'grid')
+        with self.assertRaises(ValueError):
+            bc.get_density_curve_data(test_predicted_proba, weights = amounts[:10])
+
+        fig = bc.build_predicted_proba_density_curve_plot(y_test, test_predicted_proba, threshold_step = 0.05, 
+                                                          bandwidth = 'silverman')
+        self.assertIsInstance(fig, go.Figure)
+
+        # bandwidth and compact follow the original parameters, so positional titles keep working
+        fig = bc.build_predicted_proba_density_curve_plot(y_test, test_predicted_proba, 0.05, 'kde', "My title")
+        self.assertIn("My title", fig.layout.title.text)
+        self.assertEqual(len(fig.data), len(bc.build_predicted_proba_density_curve_plot(y_test, test_predicted_proba,
+                                                                                      threshold_step = 0.05).data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+from bctools.utilities import get_amount_cost_df
+from bctools.thresholds import get_optimized_thresholds_df
+
+class Test_Cache(unittest.TestCase):
+    def setUp(self):
+        bc.set_cache_options(enabled = True)
+        bc.clear_cache()
+
+    def tearDown(self):
+        bc.set_cache_options()
+        bc.clear_cache()
+
+    def test_cache(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+        amounts = np.abs(X_test[:, 13])
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_test[:, 12]), TP = 1)
+
+        # repeated calls reuse the memoized result, also when arguments are passed differently
+        amount_cost_df = get_amount_cost_df(y_test, test_predicted_proba, threshold_values, amounts, cost_dict)
+        self.assertEqual(bc.get_cache_info()['misses'], 1)
+        amount_cost_df['amount_TP'] = 0
+        cached_df = get_amount_cost_df(list(y_test), pd.Series(test_predicted_proba), threshold_values,
+                                       amounts = amounts, cost_dict = dict(cost_dict))
+        self.assertEqual(bc.get_cache_info()['hits'], 1)
+        self.assertGreater(cached_df['amount_TP'].sum(), 0) # callers get copies of the memoized results
+
+        # a change in the content of the data is a new result
+        changed_amounts = amounts.copy()
+        changed_amounts[0] += 1
+        get_amount_cost_df(y_test, test_predicted_proba, threshold_values, changed_amounts, cost_dict)
+        self.assertEqual(bc.get_cache_info()['misses'], 2)
+
+        # GHOST optimizations are memoized only when the random state is given, whatever n_jobs
+        optimized_df = get_optimized_thresholds_df('all', threshold_values[1:-1], y_test, test_predicted_proba, cost_dict,
+                                                   N_subsets = 20, random_state = 1)
+        pd.testing.assert_frame_equal(get_optimized_thresholds_df('all', threshold_values[1:-1], y_test, test_predicted_proba,
+                                                                  cost_dict, N_subsets = 20, random_state = 1, n_jobs = 2),
+                                      optimized_df)
+        self.assertEqual(bc.get_cache_info()['hits'], 2)
+        get_optimized_thresholds_df('all', threshold_values[1:-1], y_test, test_predicted_proba, cost_dict, N_subsets = 20)
+        self.assertEqual(bc.get_cache_info()['misses'], 3)
+
+        # least recently used results are evicted to fit max_memory
+        bc.set_cache_options(enabled = True, max_memory = bc.get_cache_info()['memory'] - 1)
+        self.assertEqual(bc.get_cache_info()['n_results'], 2)
+        self.assertLessEqual(bc.get_cache_info()['memory'], bc.get_cache_info()['max_memory'])
+
+        # the cache is disabled by default
+        bc.set_cache_options()
+        self.assertFalse(bc.get_cache_info()['enabled'])
+        get_amount_cost_df(y_test, test_predicted_proba, threshold_values, amounts, cost_dict)
+        self.assertEqual(bc.get_cache_info()['hits'] + bc.get_cache_info()['misses'], 5)
+
+        # results saved on disk are read after the memory is cleared (e.g. in a new session)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            bc.set_cache_options(enabled = True, cache_dir = cache_dir)
+            bc.clear_cache()
+            get_optimized_thresholds_df('all', threshold_values[1:-1], y_test, test_predicted_proba, cost_dict,
+                                        N_subsets = 20, random_state = 1)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            bc.clear_cache()
+            pd.testing.assert_frame_equal(get_optimized_thresholds_df('all', threshold_values[1:-1], y_test, test_predicted_proba,
+                                                                      cost_dict, N_subsets = 20, random_state = 1),
+                                          optimized_df)
+            self.assertEqual(bc.get_cache_info()['hits'], 1)
+
+            bc.clear_cache(disk = True)
+            self.assertEqual(len(os.listdir(cache_dir)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+from unittest.mock import patch, Mock
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+import bctools.confusion
+from bctools.confusion import get_confusion_counts
+from bctools.utilities import get_amount_cost_df, get_invariant_metrics_df
+from bctools.thresholds import get_optimized_thresholds_df
+
+class Test_Threshold_Analysis(unittest.TestCase):
+    def test_threshold_analysis(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+        amounts = np.abs(X_test[:, 13])
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_test[:, 12]), TP = 1)
+
+        analysis = bc.ThresholdAnalysis(list(y_test), pd.Series(test_predicted_proba), amounts = amounts,
+                                        cost_dict = cost_dict, random_state = 1)
+        self.assertFalse(analysis.predicted_proba.flags.writeable)
+        self.assertTrue(analysis.cost_dict['FN'].flags.c_contiguous)
+
+        # results match the ones of the flat functions
+        for counts, expected in zip(analysis.get_confusion_counts(threshold_values),
+                                    get_confusion_counts(y_test, test_predicted_proba, threshold_values)):
+            np.testing.assert_array_equal(counts, expected)
+        amount_cost_df = analysis.get_amount_cost_df(threshold_values)
+        pd.testing.assert_frame_equal(amount_cost_df,
+                                      get_amount_cost_df(y_test, test_predicted_proba, threshold_values, amounts, cost_dict))
+        pd.testing.assert_frame_equal(analysis.get_invariant_metrics_df(),
+                                      get_invariant_metrics_df(y_test, test_predicted_proba))
+        optimized_df = analysis.get_optimized_thresholds_df(threshold_values = threshold_values[1:-1], N_subsets = 20)
+        pd.testing.assert_frame_equal(optimized_df,
+                                      get_optimized_thresholds_df('all', threshold_values[1:-1], y_test, test_predicted_proba,
+                                                                  cost_dict, N_subsets = 20, random_state = 1))
+
+        # results are computed once and returned as copies
+        amount_cost_df['amount_TP'] = 0
+        self.assertGreater(analysis.get_amount_cost_df(threshold_values)['amount_TP'].sum(), 0)
+        self.assertEqual(len(analysis._results), 3)
+
+        observations_df = analysis.get_confusion_category_observations_df('FP', X_test, threshold = 0.5)
+        self.assertEqual(len(observations_df), get_confusion_counts(y_test, test_predicted_proba, 0.5)[1][0])
+
+        # plots are served with the data of the session
+        with patch("plotly.graph_objects.Figure.show"):
+            self.assertAlmostEqual(analysis.curve_ROC_plot(), bc.build_curve_ROC_plot(y_test, test_predicted_proba)[1])
+            analysis.curve_PR_plot()
+            metrics_df, constant_metrics_df, optimal_thresholds_df = analysis.confusion_matrix_plot(
+                threshold_step = threshold_step, optimize_threshold = 'all', N_subsets = 20)
+            self.assertEqual(len(optimal_thresholds_df), len(optimized_df))
+            linechart_df, total_amount = analysis.confusion_linechart_plot(threshold_step = threshold_step)
+            self.assertAlmostEqual(total_amount, round(amounts.sum(), 2), places=2)
+            analysis.total_amount_cost_plot(threshold_step = threshold_step)
+            analysis.predicted_proba_violin_plot(threshold_step = threshold_step, compact = True)
+            analysis.predicted_proba_density_curve_plot(threshold_step = threshold_step)
+
+        # with the cache disabled, a session sorts its data once for all the plots and dataframes
+        bc.set_cache_options(enabled = False)
+        try:
+            session = bc.ThresholdAnalysis(y_test, test_predicted_proba, amounts = amounts, cost_dict = cost_dict,
+                                           random_state = 1)
+            sort_mock = Mock(wraps = bctools.confusion._sort_validated_predictions)
+            with patch("bctools.confusion._sort_validated_predictions", sort_mock), \
+                 patch("bctools.analysis._sort_validated_predictions", sort_mock), \
+                 patch("plotly.graph_objects.Figure.show"):
+                _, session_constant_metrics_df, _ = session.confusion_matrix_plot(threshold_step = threshold_step)
+                session_linechart_df, _ = session.confusion_linechart_plot(threshold_step = threshold_step,
+                                                                           confidence_level = 0.9, n_bootstraps = 10)
+                session.total_amount_cost_plot(threshold_step = threshold_step)
+                session.predicted_proba_violin_plot(threshold_step = threshold_step)
+                session.curve_ROC_plot(confidence_level = 0.9, n_bootstraps = 10)
+                session.get_amount_cost_df(threshold_values)
+                session.get_confusion_counts(threshold_values)
+                session.get_confusion_category_index()
+            self.assertEqual(sort_mock.call_count, 1)
+        finally:
+            bc.set_cache_options()
+
+        # results from the sorted predictions of the session match the ones of the flat functions
+        pd.testing.assert_frame_equal(session_constant_metrics_df, get_invariant_metrics_df(y_test, test_predicted_proba))
+        pd.testing.assert_frame_equal(session_linechart_df, bc.build_confusion_linechart_plot(y_test, test_predicted_proba,
+                                                                                              threshold_step = threshold_step,
+                                                                                              amounts = amounts,
+                                                                                              cost_dict = cost_dict)[1])
+
+        # the total amount-cost plot of a session shows its amounts and costs by default, if it has them
+        with patch("plotly.graph_objects.Figure.show"):
+            for session_kwargs, plot_classes in [({'amounts': amounts}, {'amount_classes': 'all', 'cost_classes': None}),
+                                                 ({'cost_dict': cost_dict}, {'amount_classes': None, 'cost_classes': 'all'})]:
+                amount_cost_session = bc.ThresholdAnalysis(y_test, test_predicted_proba, **session_kwargs)
+                pd.testing.assert_frame_equal(amount_cost_session.total_amount_cost_plot(threshold_step = threshold_step),
+                                              bc.total_amount_cost_plot(y_test, test_predicted_proba, 
+                                                                        threshold_step = threshold_step,
+                                                                        **session_kwargs, **plot_classes))
+            with self.assertRaises(TypeError):
+                amount_cost_session.total_amount_cost_plot(amount_classes = 'all')
+
+        with self.assertRaises(ValueError):
+            bc.ThresholdAnalysis(y_test, test_predicted_proba[:-1])
+        with self.assertRaises(ValueError):
+            bc.ThresholdAnalysis(y_test + 1, test_predicted_proba)
+        with self.assertRaises(ValueError):
+            bc.ThresholdAnalysis(y_test, test_predicted_proba, amounts = amounts[:10])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import fbeta_score
+
+import bctools as bc
+
+class Test_Curve_PR_Fbeta(unittest.TestCase):
+    def test_curve_PR_fbeta(self):
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        for beta in [0.5, 1, 2]:
+            fig, area_under_PR = bc.build_curve_PR_plot(y_test, test_predicted_proba, beta = beta)
+
+            # F-beta scores from precision and recall match the scikit-learn ones
+            for threshold, fbeta in fig.data[0].customdata[:-1:10]:
+                self.assertAlmostEqual(fbeta, fbeta_score(y_test, (test_predicted_proba >= threshold).astype(int), beta = beta))
+
+        # the simplified curve keeps its endpoints and the farthest vertices, the area is computed on the whole curve
+        simplified_fig, simplified_area_under_PR = bc.build_curve_PR_plot(y_test, test_predicted_proba, max_points = 20)
+        self.assertEqual(len(simplified_fig.data[0].x), 20)
+        self.assertEqual(simplified_area_under_PR, area_under_PR)
+        self.assertEqual(simplified_fig.data[0].x[0], fig.data[0].x[0])
+        self.assertEqual(simplified_fig.data[0].x[-1], fig.data[0].x[-1])
+        self.assertTrue(set(zip(simplified_fig.data[0].x, simplified_fig.data[0].y)) <= set(zip(fig.data[0].x, fig.data[0].y)))
+
+        with self.assertRaises(ValueError):
+            bc.build_curve_PR_plot(y_test, test_predicted_proba, max_points = 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import auc
+
+import bctools as bc
+from bctools.plots import _get_simplified_curve_index
+
+class Test_Curve_Simplification(unittest.TestCase):
+    def test_curve_simplification(self):
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=5000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.5, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        for build_curve_plot in [bc.build_curve_ROC_plot, bc.build_curve_PR_plot]:
+            fig, area_under_curve = build_curve_plot(y_test, test_predicted_proba)
+            x, y = np.asarray(fig.data[0].x), np.asarray(fig.data[0].y)
+            self.assertIsNone(fig.layout.meta)
+
+            for tolerance in [1e-2, 1e-3]:
+                simplified_fig, simplified_area_under_curve = build_curve_plot(y_test, test_predicted_proba, tolerance = tolerance)
+                simplified_x, simplified_y = np.asarray(simplified_fig.data[0].x), np.asarray(simplified_fig.data[0].y)
+                curve_meta = simplified_fig.layout.meta
+
+                # the exact area is kept, the area of the plotted curve and its points are within tolerance
+                self.assertEqual(simplified_area_under_curve, area_under_curve)
+                self.assertEqual(curve_meta['n_plotted_points'], len(simplified_x))
+                self.assertLess(len(simplified_x), len(x))
+                self.assertLessEqual(abs(auc(simplified_x, simplified_y) - area_under_curve), tolerance)
+                self.assertAlmostEqual(abs(auc(simplified_x, simplified_y) - area_under_curve), curve_meta['area_error'])
+
+                # distance of every point of the whole curve from the segment of the simplified curve that skips it
+                curve_index, _ = _get_simplified_curve_index(x, y, tolerance = tolerance)
+                np.testing.assert_array_equal(x[curve_index], simplified_x)
+                segment = np.searchsorted(curve_index, np.arange(len(x)), side = 'right').clip(1, len(curve_index) - 1) - 1
+                start, end = curve_index[segment], curve_index[segment + 1]
+                dx, dy = x[end] - x[start], y[end] - y[start]
+                distances = np.abs(dx * (y - y[start]) - dy * (x - x[start])) / np.hypot(dx, dy)
+                self.assertLessEqual(distances.max(), tolerance)
+
+            simplified_fig, _ = build_curve_plot(y_test, test_predicted_proba, max_points = 30)
+            self.assertEqual(len(simplified_fig.data[0].x), 30)
+
+            with self.assertWarns(UserWarning):
+                simplified_fig, _ = build_curve_plot(y_test, test_predicted_proba, max_points = 3, tolerance = 1e-3)
+            self.assertLessEqual(simplified_fig.layout.meta['max_distance'], 1e-3)
+
+        # the simplification and bootstrap parameters follow the original ones, so positional titles keep working
+        fig, _ = bc.build_curve_ROC_plot(y_test, test_predicted_proba, "My title")
+        self.assertEqual(fig.layout.title.text, "<b>My title</b>")
+        fig, _ = bc.build_curve_PR_plot(y_test, test_predicted_proba, 1, "My title")
+        self.assertEqual(fig.layout.title.text, "<b>My title</b>")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+from bctools.utilities import get_amount_cost_df, get_invariant_metrics_df, get_metrics_dep_on_threshold_df
+from bctools.confusion import get_confusion_counts
+
+class Test_Bootstrap_Confidence_Bands(unittest.TestCase):
+    def setUp(self):
+        bc.set_cache_options(enabled = False)
+
+    def tearDown(self):
+        bc.set_cache_options()
+
+    def test_bootstrap_confidence_bands(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+        amounts = np.abs(X_test[:, 13])
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_test[:, 12]), TP = 1)
+
+        bands = bc.get_bootstrap_confidence_bands(y_test, test_predicted_proba, threshold_values, amounts, cost_dict,
+                                                  n_bootstraps = 100, random_state = 1)
+
+        # values are the ones of the data, within the bounds of the bands
+        invariant_metrics_df = bands['invariant_metrics']
+        pd.testing.assert_frame_equal(invariant_metrics_df[['invariant_metric', 'value']],
+                                      get_invariant_metrics_df(y_test, test_predicted_proba))
+        self.assertTrue((invariant_metrics_df['lower'] <= invariant_metrics_df['value']).all())
+        self.assertTrue((invariant_metrics_df['value'] <= invariant_metrics_df['upper']).all())
+
+        metrics_df = get_metrics_dep_on_threshold_df(threshold_values, *get_confusion_counts(y_test, test_predicted_proba,
+                                                                                              threshold_values))
+        pd.testing.assert_frame_equal(bands['metrics_dep_on_threshold'][metrics_df.columns], metrics_df)
+
+        amount_cost_df = get_amount_cost_df(y_test, test_predicted_proba, threshold_values, amounts, cost_dict)
+        pd.testing.assert_frame_equal(bands['amount_cost'][amount_cost_df.columns], amount_cost_df)
+        for column in amount_cost_df.columns[1:]:
+            self.assertTrue((bands['amount_cost'][column + '_lower'] <= bands['amount_cost'][column + '_upper']).all())
+
+        for curve in ['ROC', 'PR']:
+            self.assertEqual(len(bands[curve]), 101)
+            self.assertTrue((bands[curve]['lower'] <= bands[curve]['upper']).all())
+
+        # wider bands for higher confidence levels
+        wide_bands = bc.get_bootstrap_confidence_bands(y_test, test_predicted_proba, n_bootstraps = 100,
+                                                       confidence_level = 0.99, random_state = 1)
+        self.assertTrue((wide_bands['ROC']['upper'] - wide_bands['ROC']['lower']
+                         >= bands['ROC']['upper'] - bands['ROC']['lower']).all())
+
+        # replicates only depend on the random state, whatever the number of worker processes
+        # (small chunks of replicates, so that they are distributed to the workers)
+        for method in ['poisson', 'multinomial']:
+            serial_bands = bc.get_bootstrap_confidence_bands(y_test, test_predicted_proba, threshold_values,
+                                                             n_bootstraps = 20, method = method, random_state = 2)
+            with patch('bctools.bootstrap._CHUNK_SIZE', 5 * len(y_test)):
+                parallel_bands = bc.get_bootstrap_confidence_bands(y_test, test_predicted_proba, threshold_values,
+                                                                   n_bootstraps = 20, method = method, random_state = 2,
+                                                                   n_jobs = 2)
+            for key in serial_bands:
+                pd.testing.assert_frame_equal(serial_bands[key], parallel_bands[key])
+
+        # bands are drawn on the plots
+        fig, area_under_ROC_curve = bc.build_curve_ROC_plot(y_test, test_predicted_proba, confidence_level = 0.95,
+                                                            n_bootstraps = 100, random_state = 1)
+        self.assertEqual(len(fig.data), 4)
+        np.testing.assert_allclose(fig.data[2].y, bands['ROC']['upper'])
+        self.assertIn('CI', fig.data[0].name)
+
+        fig, area_under_PR_curve = bc.build_curve_PR_plot(y_test, test_predicted_proba, confidence_level = 0.95,
+                                                          n_bootstraps = 100, random_state = 1)
+        np.testing.assert_allclose(fig.data[-1].y, bands['PR']['lower'])
+
+        fig, _, _ = bc.build_confusion_linechart_plot(y_test, test_predicted_proba, threshold_step = threshold_step,
+                                                      amounts = amounts, cost_dict = cost_dict, confidence_level = 0.95,
+                                                      n_bootstraps = 100, random_state = 1)
+        band_traces = [trace for trace in fig.data if trace.fill == 'tonexty']
+        self.assertEqual(len(band_traces), 8)
+        self.assertTrue(all(step['args'][0]['visible'][-1] for step in fig.layout.sliders[0].steps))
+
+        with self.assertRaises(ValueError):
+            bc.get_bootstrap_confidence_bands(y_test, test_predicted_proba, method = 'jackknife')
+        with self.assertRaises(TypeError):
+            bc.get_bootstrap_confidence_bands(y_test, test_predicted_proba, amounts = amounts)
+
+
+if __name__ == '__main__':
+    unittest.main()
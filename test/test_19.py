@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+from sklearn import metrics
+from sklearn.calibration import calibration_curve
+
+from bctools.utilities import get_invariant_metrics_df, _get_invariant_metrics
+
+class Test_Invariant_Metrics(unittest.TestCase):
+    def test_invariant_metrics(self):
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+        sample_weight = np.abs(X_test[:, 13])
+
+        # rounded probabilities, so that there are ties between and within classes
+        for predicted_proba in [test_predicted_proba, test_predicted_proba.round(1)]:
+            for weights in [None, sample_weight]:
+                metrics_values = _get_invariant_metrics(list(y_test), list(predicted_proba), weights)
+                expected_values = {'roc_auc': metrics.roc_auc_score(y_test, predicted_proba, sample_weight = weights),
+                                   'pr_auc': metrics.average_precision_score(y_test, predicted_proba, sample_weight = weights),
+                                   'brier_score': metrics.brier_score_loss(y_test, predicted_proba, sample_weight = weights),
+                                   'log_loss': metrics.log_loss(y_test, predicted_proba, sample_weight = weights)}
+                if weights is None:
+                    prob_true, prob_pred = calibration_curve(y_test, predicted_proba, n_bins = 10)
+                    bins_counts = np.bincount(np.searchsorted(np.linspace(0, 1, 11)[1:-1], predicted_proba), minlength = 10)
+                    expected_values['calibration_error'] = np.sum(bins_counts[bins_counts > 0] * np.abs(prob_true - prob_pred)) \
+                                                           / len(y_test)
+
+                for metric_name, expected in expected_values.items():
+                    self.assertLess(abs(metrics_values[metric_name] - expected), 1e-9)
+
+        invariant_metrics_df = get_invariant_metrics_df(y_test, test_predicted_proba, sample_weight = sample_weight)
+        self.assertEqual(list(invariant_metrics_df['invariant_metric']),
+                         ['roc_auc', 'pr_auc', 'brier_score', 'log_loss', 'calibration_error'])
+
+        # aucs are not defined for a single class
+        self.assertTrue(np.isnan(_get_invariant_metrics(np.zeros(10), np.linspace(0, 1, 10))['roc_auc']))
+
+        # sample weights are validated: one finite non-negative weight for each data point, with a positive sum
+        for wrong_weights in [sample_weight[:10], np.r_[-1, sample_weight[1:]], np.zeros(len(y_test)),
+                              np.r_[np.nan, sample_weight[1:]]]:
+            with self.assertRaises(ValueError):
+                get_invariant_metrics_df(y_test, test_predicted_proba, sample_weight = wrong_weights)
+
+
+if __name__ == '__main__':
+    unittest.main()
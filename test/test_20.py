@@ -0,0 +1,43 @@
+import unittest
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'benchmarks'))
+
+import run_benchmarks
+
+class Test_Benchmarks(unittest.TestCase):
+    def test_benchmarks(self):
+
+        # every benchmark of the data functions runs on each of its inputs configurations
+        results = run_benchmarks.run_benchmarks(sizes = [1000], steps = [0.01], name_filter = 'get_amount_cost_df',
+                                                repeat = 1, verbose = False)
+        self.assertEqual([result['inputs'] for result in results], ['amounts', 'costs', 'amounts_costs'])
+        for result in results:
+            self.assertIsNone(result['error'])
+            self.assertGreater(result['time'], 0)
+            self.assertGreater(result['peak_memory'], 0)
+            self.assertIsNone(result['figure_size'])
+
+        # plots are measured with the size of their serialized figure
+        plot_results = run_benchmarks.run_benchmarks(sizes = [1000], steps = [0.01], name_filter = 'build_curve_ROC_plot',
+                                                     repeat = 1, verbose = False)
+        self.assertEqual(len(plot_results), 2)
+        self.assertTrue(all(result['figure_size'] > 0 for result in plot_results))
+
+        # saved results are compared run by run, regressions are the ones worse than factor
+        with tempfile.TemporaryDirectory() as results_dir:
+            old_path = run_benchmarks.save_results(results, os.path.join(results_dir, 'old.json'))
+            for result in results:
+                result['time'] *= 2
+            new_path = run_benchmarks.save_results(results, os.path.join(results_dir, 'new.json'))
+
+            regressions = run_benchmarks.compare_results(old_path, new_path, factor = 1.5)
+            self.assertEqual(len(regressions), 3)
+            self.assertAlmostEqual(regressions[0]['ratios']['time'], 2)
+            self.assertEqual(run_benchmarks.compare_results(old_path, new_path, factor = 3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
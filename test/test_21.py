@@ -0,0 +1,87 @@
+import unittest
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+
+class Test_Confusion_Category_Index(unittest.TestCase):
+    def test_confusion_category_index(self):
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+        X_test_df = pd.DataFrame(X_test, columns = [f'feature_{i}' for i in range(X_test.shape[1])],
+                                 index = np.arange(len(X_test)) + 1000)
+
+        index = bc.ConfusionCategoryIndex(y_test, test_predicted_proba, X_test_df)
+        sorted_index = bc.ConfusionCategoryIndex(y_test, test_predicted_proba, X_test_df, sort_data = True)
+        array_index = bc.ConfusionCategoryIndex(y_test, test_predicted_proba, X_test)
+
+        # same observations as get_confusion_category_observations_df, sorted by predicted probability
+        for threshold in [0, 0.3, 0.5, 1]:
+            for confusion_category in ['TN', 'FP', 'FN', 'TP']:
+                expected_df = bc.get_confusion_category_observations_df(confusion_category, X_test_df, y_test,
+                                                                        test_predicted_proba, threshold = threshold)
+                for category_index in [index, sorted_index]:
+                    observations_df = category_index.get_observations_df(confusion_category, threshold)
+                    pd.testing.assert_frame_equal(observations_df.sort_index(), expected_df)
+                    self.assertTrue(np.all(np.diff(test_predicted_proba[observations_df.index - 1000]) >= 0))
+
+                    observations_df = category_index.get_observations_df(confusion_category, threshold,
+                                                                         columns = ['feature_3', 'feature_0'])
+                    pd.testing.assert_frame_equal(observations_df.sort_index(), expected_df[['feature_3', 'feature_0']])
+
+                observations_df = array_index.get_observations_df(confusion_category, threshold, columns = [3, 0])
+                np.testing.assert_array_equal(observations_df.sort_index().values,
+                                              expected_df[['feature_3', 'feature_0']].values)
+
+        # observations of a sorted table are views of it
+        fp_df = sorted_index.get_observations_df('FP', threshold = 0.3)
+        self.assertTrue(np.shares_memory(fp_df['feature_0'].values, sorted_index.X_data['feature_0'].values))
+        fp_indices = index.get_indices('FP', threshold = 0.3)
+        self.assertTrue(np.shares_memory(fp_indices, index.order))
+        np.testing.assert_array_equal(X_test_df.index[fp_indices], fp_df.index)
+
+        # memory-mapped tables, also sorted to a new memory-mapped file
+        with tempfile.TemporaryDirectory() as data_dir:
+            np.save(os.path.join(data_dir, 'X_test.npy'), X_test)
+            X_test_memmap = np.load(os.path.join(data_dir, 'X_test.npy'), mmap_mode = 'r')
+            expected_df = array_index.get_observations_df('FN', threshold = 0.3)
+
+            memmap_index = bc.ConfusionCategoryIndex(y_test, test_predicted_proba, X_test_memmap)
+            pd.testing.assert_frame_equal(memmap_index.get_observations_df('FN', threshold = 0.3), expected_df)
+
+            memmap_index = bc.ConfusionCategoryIndex(y_test, test_predicted_proba, X_test_memmap,
+                                                     sort_data = os.path.join(data_dir, 'X_test_sorted.npy'))
+            fn_df = memmap_index.get_observations_df('FN', threshold = 0.3)
+            pd.testing.assert_frame_equal(fn_df, expected_df)
+            self.assertTrue(np.shares_memory(fn_df.values, memmap_index.X_data))
+            del memmap_index, fn_df, X_test_memmap
+
+        with self.assertRaises(ValueError):
+            index.get_indices('PP')
+        with self.assertRaises(KeyError):
+            index.get_observations_df('TP', columns = ['feature_100'])
+        with self.assertRaises(ValueError):
+            bc.ConfusionCategoryIndex(y_test, test_predicted_proba, X_test[:10])
+
+
+if __name__ == '__main__':
+    unittest.main()
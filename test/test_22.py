@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+
+class Test_Threshold_Transitions(unittest.TestCase):
+    def test_threshold_transitions(self):
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+        amounts = np.abs(X_test[:, 13])
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_test[:, 12]), TP = 1)
+
+        index = bc.ConfusionCategoryIndex(y_test, test_predicted_proba, X_test, amounts = amounts, cost_dict = cost_dict)
+
+        for threshold_from, threshold_to in [(0.5, 0.3), (0.3, 0.5), (0.4, 0.4), (0, 1)]:
+            transitions_df = index.get_transitions_df(threshold_from, threshold_to, columns = [0, 13])
+
+            # data points that change category are the ones in a category at threshold_to but not at threshold_from
+            for old_class, new_class in [('TN', 'FP'), ('FP', 'TN'), ('FN', 'TP'), ('TP', 'FN')]:
+                old_df = bc.get_confusion_category_observations_df(old_class, X_test, y_test, test_predicted_proba,
+                                                                   threshold = threshold_from)
+                new_df = bc.get_confusion_category_observations_df(new_class, X_test, y_test, test_predicted_proba,
+                                                                   threshold = threshold_to)
+                moved = transitions_df[transitions_df['transition'] == f'{old_class}->{new_class}']
+                self.assertEqual(sorted(moved.index), sorted(set(old_df.index) & set(new_df.index)))
+
+            self.assertTrue((transitions_df['true_class'] == y_test[transitions_df.index]).all())
+            np.testing.assert_array_equal(transitions_df['amount'], amounts[transitions_df.index])
+            np.testing.assert_array_equal(transitions_df[13], X_test[transitions_df.index, 13])
+
+            # cost deltas add up to the change of the total cost between the two thresholds
+            total_costs = [bc.utilities.get_amount_cost_df(y_test, test_predicted_proba, [threshold], amounts, cost_dict)
+                           [['cost_TN', 'cost_FP', 'cost_FN', 'cost_TP']].values.sum()
+                           for threshold in [threshold_from, threshold_to]]
+            self.assertAlmostEqual(transitions_df['cost_delta'].sum(), total_costs[1] - total_costs[0])
+
+        # without features, amounts and costs only the transitions are returned
+        transitions_df = bc.ConfusionCategoryIndex(y_test, test_predicted_proba).get_transitions_df(0.5, 0.3)
+        self.assertEqual(list(transitions_df.columns), ['true_class', 'transition', 'predicted_proba'])
+        self.assertEqual(set(transitions_df['transition']), {'TN->FP', 'FN->TP'})
+
+        # sessions pass their amounts and costs to the index
+        analysis = bc.ThresholdAnalysis(y_test, test_predicted_proba, amounts = amounts, cost_dict = cost_dict)
+        pd.testing.assert_frame_equal(analysis.get_confusion_category_index(X_test).get_transitions_df(0.5, 0.3),
+                                      index.get_transitions_df(0.5, 0.3))
+
+        with self.assertRaises(ValueError):
+            bc.ConfusionCategoryIndex(y_test, test_predicted_proba, amounts = amounts[:10])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+from bctools.confusion import get_confusion_costs
+from bctools.utilities import get_amount_cost_df
+from bctools.thresholds import get_cost_optimal_threshold
+from bctools.plots import build_confusion_matrix_plot, build_confusion_linechart_plot, build_total_amount_cost_plot
+
+class Test_Cost_Model(unittest.TestCase):
+    def test_cost_model(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = list(np.abs(X_test[:, 12])), TP = np.abs(X_test[:, 13]))
+
+        # scalar costs are floats, per-row costs contiguous read-only arrays
+        cost_model = bc.CostModel(**cost_dict, n_data = len(y_test))
+        self.assertEqual(cost_model['FP'], 10.)
+        self.assertEqual(cost_model['FN'].dtype, np.float64)
+        self.assertTrue(cost_model['FN'].flags.c_contiguous)
+        self.assertFalse(cost_model['TP'].flags.writeable)
+        self.assertEqual(set(cost_model), {'TN', 'FP', 'FN', 'TP'})
+        self.assertIs(bc.CostModel.from_cost_dict(cost_model, n_data = len(y_test)), cost_model)
+
+        # same costs as the ones of the dict, wherever a cost_dict is accepted
+        for costs, expected in zip(cost_model.get_threshold_costs(y_test, test_predicted_proba, threshold_values),
+                                   get_confusion_costs(y_test, test_predicted_proba, threshold_values, cost_dict)):
+            np.testing.assert_array_equal(costs, expected)
+
+        pd.testing.assert_frame_equal(get_amount_cost_df(y_test, test_predicted_proba, threshold_values, cost_dict = cost_model),
+                                      get_amount_cost_df(y_test, test_predicted_proba, threshold_values, cost_dict = cost_dict))
+
+        self.assertEqual(bc.get_optimized_thresholds_df('Cost', threshold_values[1:-1], y_test, test_predicted_proba,
+                                                        cost_model, N_subsets = 20, random_state = 1)['optimal_threshold'].iloc[0],
+                         bc.get_optimized_thresholds_df('Cost', threshold_values[1:-1], y_test, test_predicted_proba,
+                                                        cost_dict, N_subsets = 20, random_state = 1)['optimal_threshold'].iloc[0])
+
+        analysis = bc.ThresholdAnalysis(y_test, test_predicted_proba, cost_dict = cost_dict)
+        self.assertIsInstance(analysis.cost_dict, bc.CostModel)
+
+        # float32 per-row costs, summed in float64
+        float32_model = bc.CostModel.from_cost_dict(cost_model, dtype = 'float32')
+        self.assertEqual(float32_model['FN'].dtype, np.float32)
+        for costs, expected in zip(float32_model.get_threshold_costs(y_test, test_predicted_proba, threshold_values),
+                                   cost_model.get_threshold_costs(y_test, test_predicted_proba, threshold_values)):
+            np.testing.assert_allclose(costs, expected, rtol = 1e-6)
+
+        with self.assertRaises(ValueError):
+            bc.CostModel(FN = np.ones(10), TP = np.ones(20))
+        with self.assertRaises(ValueError):
+            bc.CostModel.from_cost_dict(cost_model, n_data = 10)
+        with self.assertRaises(ValueError):
+            bc.CostModel.from_cost_dict({'TN': 0, 'FP': 1})
+        with self.assertRaises(ValueError):
+            bc.CostModel(FP = 1, dtype = 'int64')
+
+        # per-row costs longer or shorter than the data are rejected by every cost path, as dicts or cost models
+        for n_costs in [len(y_test) + 50, len(y_test) - 50]:
+            for wrong_costs in [bc.get_cost_dict(FP = 1, FN = np.ones(n_costs)), bc.CostModel(FP = 1, FN = np.ones(n_costs))]:
+                cost_paths = [lambda: get_confusion_costs(y_test, test_predicted_proba, threshold_values, wrong_costs),
+                              lambda: get_amount_cost_df(y_test, test_predicted_proba, threshold_values, cost_dict = wrong_costs),
+                              lambda: get_cost_optimal_threshold(y_test, test_predicted_proba, threshold_values, wrong_costs,
+                                                                 N_subsets = 5, random_seed = 1),
+                              lambda: bc.get_optimized_thresholds_df('Cost', threshold_values, y_test, test_predicted_proba,
+                                                                     wrong_costs, N_subsets = 5, random_state = 1),
+                              lambda: bc.get_bootstrap_confidence_bands(y_test, test_predicted_proba, threshold_values,
+                                                                        cost_dict = wrong_costs, n_bootstraps = 5),
+                              lambda: build_confusion_matrix_plot(y_test, test_predicted_proba, cost_dict = wrong_costs),
+                              lambda: build_confusion_linechart_plot(y_test, test_predicted_proba, cost_dict = wrong_costs),
+                              lambda: build_total_amount_cost_plot(y_test, test_predicted_proba, cost_dict = wrong_costs,
+                                                                   amount_classes = None)]
+                for cost_path in cost_paths:
+                    with self.assertRaises(ValueError):
+                        cost_path()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+from bctools.utilities import get_amount_cost_df, get_invariant_metrics_df
+from bctools.validation import _get_labels_array, _get_values_array
+
+try:
+    import pyarrow
+except ImportError: # PyArrow inputs are not tested
+    pyarrow = None
+
+class Test_Input_Validation(unittest.TestCase):
+    def setUp(self):
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, self.y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        self.test_predicted_proba = np.ascontiguousarray(cls.predict_proba(X_test)[:,1])
+        self.amounts = np.abs(X_test[:, 13])
+        self.threshold_values = list(np.arange(0, 1.05, 0.05))
+
+    def test_input_validation(self):
+
+        y_test, test_predicted_proba, amounts = self.y_test, self.test_predicted_proba, self.amounts
+
+        # arrays whose dtype and contiguity already fit are not copied
+        self.assertTrue(np.shares_memory(_get_values_array(test_predicted_proba), test_predicted_proba))
+        float32_proba = test_predicted_proba.astype(np.float32)
+        float32_series = pd.Series(float32_proba)
+        self.assertTrue(np.shares_memory(_get_values_array(float32_series), float32_series.to_numpy()))
+        bool_labels = y_test == 1
+        self.assertTrue(np.shares_memory(_get_labels_array(bool_labels), bool_labels))
+        self.assertEqual(_get_labels_array(list(y_test)).dtype, np.uint8)
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            np.save(os.path.join(data_dir, 'proba.npy'), test_predicted_proba)
+            memmap_proba = np.load(os.path.join(data_dir, 'proba.npy'), mmap_mode = 'r')
+            self.assertTrue(np.shares_memory(_get_values_array(memmap_proba), memmap_proba))
+
+            # lists, pandas objects, memory-mapped and float32 arrays give the same results
+            expected_df = get_amount_cost_df(y_test, test_predicted_proba, self.threshold_values, amounts)
+            for true_y, predicted_proba in [(list(y_test), list(test_predicted_proba)),
+                                            (pd.Series(y_test), pd.Series(test_predicted_proba)),
+                                            (bool_labels, memmap_proba),
+                                            (y_test.astype(float), float32_proba.astype(float))]:
+                pd.testing.assert_frame_equal(get_amount_cost_df(true_y, predicted_proba, self.threshold_values,
+                                                                 list(amounts)), expected_df)
+            del memmap_proba
+
+        # labels given as lists are accepted by the curves
+        fig, area_under_PR_curve = bc.build_curve_PR_plot(list(y_test), list(test_predicted_proba))
+        self.assertAlmostEqual(area_under_PR_curve, bc.build_curve_PR_plot(y_test, test_predicted_proba)[1])
+
+        analysis = bc.ThresholdAnalysis(list(y_test), float32_proba)
+        self.assertEqual(analysis.true_y.dtype, np.uint8)
+        self.assertEqual(analysis.predicted_proba.dtype, np.float32)
+
+        # dtype, NaN and length errors are reported before any computation
+        nan_proba = test_predicted_proba.copy()
+        nan_proba[3] = np.nan
+        with self.assertRaises(ValueError):
+            get_invariant_metrics_df(y_test, nan_proba)
+        with self.assertRaises(ValueError):
+            get_amount_cost_df(y_test, test_predicted_proba, self.threshold_values, np.r_[amounts[:-1], np.inf])
+        with self.assertRaises(ValueError):
+            bc.ThresholdAnalysis(y_test + 1, test_predicted_proba)
+        with self.assertRaises(TypeError):
+            bc.ThresholdAnalysis(y_test.astype(str), test_predicted_proba)
+        with self.assertRaises(ValueError):
+            bc.curve_ROC_plot(y_test[:10], test_predicted_proba)
+
+        # per-row costs are validated like amounts, in the same place
+        costs = np.abs(self.test_predicted_proba - 0.5)
+        pd.testing.assert_frame_equal(get_amount_cost_df(y_test, test_predicted_proba, self.threshold_values,
+                                                         cost_dict = bc.get_cost_dict(FN = pd.Series(costs))),
+                                      get_amount_cost_df(y_test, test_predicted_proba, self.threshold_values,
+                                                         cost_dict = bc.get_cost_dict(FN = costs)))
+        for wrong_costs in [np.r_[costs[:-1], np.nan], costs[:-1], np.r_[costs, 1.]]:
+            with self.assertRaises(ValueError):
+                get_amount_cost_df(y_test, test_predicted_proba, self.threshold_values, amounts,
+                                   bc.get_cost_dict(FN = wrong_costs))
+        with self.assertRaises(TypeError):
+            get_amount_cost_df(y_test, test_predicted_proba, self.threshold_values, 
+                               cost_dict = bc.get_cost_dict(FN = costs.astype(str)))
+
+    @unittest.skipUnless(pyarrow is not None, "pyarrow is not installed")
+    def test_arrow_inputs(self):
+
+        arrow_proba = pyarrow.array(self.test_predicted_proba)
+        self.assertTrue(np.shares_memory(_get_values_array(arrow_proba), arrow_proba.to_numpy()))
+
+        pd.testing.assert_frame_equal(get_amount_cost_df(pyarrow.chunked_array([self.y_test[:100], self.y_test[100:]]),
+                                                         arrow_proba, self.threshold_values, pyarrow.array(self.amounts)),
+                                      get_amount_cost_df(self.y_test, self.test_predicted_proba, self.threshold_values,
+                                                         self.amounts))
+        with self.assertRaises(ValueError): # nulls
+            _get_labels_array(pyarrow.array([0, 1, None]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+from bctools.utilities import get_density_curve_data
+from bctools.confusion import _get_threshold_bins
+
+class Test_Low_Memory(unittest.TestCase):
+    def test_low_memory(self):
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+        amounts = np.abs(X_test[:, 13])
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_test[:, 12]), TP = 0)
+        threshold_values = list(np.arange(0, 1.05, 0.05))
+
+        analysis = bc.ThresholdAnalysis(y_test, test_predicted_proba, amounts = amounts, cost_dict = cost_dict,
+                                        random_state = 123)
+        low_memory_analysis = bc.ThresholdAnalysis(y_test, test_predicted_proba, amounts = amounts, cost_dict = cost_dict,
+                                                   random_state = 123, low_memory = True)
+
+        # float32 values, compact cumulative counts and bins, int64 counts
+        self.assertEqual(low_memory_analysis.predicted_proba.dtype, np.float32)
+        self.assertEqual(low_memory_analysis.amounts.dtype, np.float32)
+        self.assertEqual(low_memory_analysis.cost_dict['FN'].dtype, np.float32)
+        self.assertFalse(low_memory_analysis.predicted_proba.flags.writeable)
+        self.assertEqual(low_memory_analysis._get_cum_pos().dtype, np.int32)
+        self.assertEqual(_get_threshold_bins(test_predicted_proba, np.array(threshold_values)).dtype, np.uint16)
+        self.assertEqual(low_memory_analysis.get_confusion_counts(threshold_values)[0].dtype, np.int64)
+
+        # the low memory session is the default one on the float32 rounded inputs
+        rounded_analysis = bc.ThresholdAnalysis(y_test, test_predicted_proba.astype(np.float32).astype(float),
+                                                amounts = amounts.astype(np.float32).astype(float),
+                                                cost_dict = bc.CostModel.from_cost_dict(cost_dict, dtype = 'float32'),
+                                                random_state = 123)
+        for count, rounded_count in zip(low_memory_analysis.get_confusion_counts(threshold_values),
+                                        rounded_analysis.get_confusion_counts(threshold_values)):
+            np.testing.assert_array_equal(count, rounded_count)
+        pd.testing.assert_frame_equal(low_memory_analysis.get_amount_cost_df(threshold_values),
+                                      rounded_analysis.get_amount_cost_df(threshold_values), rtol = 1e-12)
+        pd.testing.assert_frame_equal(low_memory_analysis.get_optimized_thresholds_df(threshold_values = threshold_values),
+                                      rounded_analysis.get_optimized_thresholds_df(threshold_values = threshold_values))
+
+        # counts differ from the default ones at most by the data points within 2**-24 (relative) of a threshold
+        near_threshold = [np.sum(np.abs(test_predicted_proba - threshold) <= 2**-24 * threshold)
+                          for threshold in threshold_values]
+        for count, default_count in zip(low_memory_analysis.get_confusion_counts(threshold_values),
+                                        analysis.get_confusion_counts(threshold_values)):
+            self.assertTrue((np.abs(count - default_count) <= near_threshold).all())
+
+        # amounts and costs differ at most by 2**-24 times the sum of the absolute values
+        amount_cost_df = low_memory_analysis.get_amount_cost_df(threshold_values)
+        default_amount_cost_df = analysis.get_amount_cost_df(threshold_values)
+        bound = 2**-24 * (amounts.sum() + np.abs(X_test[:, 12]).sum()) + 1e-9
+        for column in ['amount_TN', 'amount_FP', 'amount_FN', 'amount_TP', 'cost_FN']:
+            self.assertLess(np.abs(amount_cost_df[column] - default_amount_cost_df[column]).max(), bound)
+
+        # density curves are accumulated in float64, whatever the dtype of data and weights
+        for curve_type in ['kde', 'normal']:
+            x_values, y_values = get_density_curve_data(test_predicted_proba, curve_type, weights = amounts)
+            x_values_32, y_values_32 = get_density_curve_data(test_predicted_proba.astype(np.float32), curve_type,
+                                                              weights = amounts.astype(np.float32))
+            self.assertEqual(y_values_32.dtype, np.float64)
+            np.testing.assert_allclose(y_values_32, y_values, rtol = 0, atol = 1e-5 * y_values.max())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import confusion_matrix
+
+from bctools.confusion import get_confusion_counts, get_breakpoint_thresholds
+
+class Test_Confusion_Counts(unittest.TestCase):
+    def test_get_confusion_counts(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+
+        TN, FP, FN, TP = get_confusion_counts(y_test, test_predicted_proba, threshold_values)
+
+        for i, threshold in enumerate(threshold_values):
+            y_pred = [int(x >= threshold) for x in test_predicted_proba]
+            expected = confusion_matrix(y_test, y_pred, labels = [0, 1]).ravel()
+            self.assertListEqual([TN[i], FP[i], FN[i], TP[i]], expected.tolist())
+
+        # thresholds equal to predicted probabilities are classified as positive
+        TN, FP, FN, TP = get_confusion_counts([0, 1, 1], [0.2, 0.5, 0.5], [0.5])
+        self.assertListEqual([TN[0], FP[0], FN[0], TP[0]], [1, 0, 0, 2])
+
+        # breakpoints are the distinct predicted probabilities, optionally compressed to quantiles
+        breakpoints = get_breakpoint_thresholds(test_predicted_proba)
+        np.testing.assert_array_equal(breakpoints, np.unique(test_predicted_proba))
+        compressed_breakpoints = get_breakpoint_thresholds(test_predicted_proba, n_breakpoints = 10)
+        self.assertLessEqual(len(compressed_breakpoints), 10)
+        self.assertTrue(np.isin(compressed_breakpoints, breakpoints).all())
+        self.assertEqual(compressed_breakpoints[0], breakpoints[0])
+        self.assertEqual(compressed_breakpoints[-1], breakpoints[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+from sklearn import metrics
+
+from bctools.confusion import get_confusion_counts
+from bctools.utilities import get_metrics_dep_on_threshold_df
+
+class Test_Metrics_Dep_On_Threshold(unittest.TestCase):
+    def test_get_metrics_dep_on_threshold_df(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+
+        TN, FP, FN, TP = get_confusion_counts(y_test, test_predicted_proba, threshold_values)
+        metrics_df = get_metrics_dep_on_threshold_df(threshold_values, TN, FP, FN, TP)
+
+        self.assertListEqual(list(metrics_df.columns), ['threshold', 'accuracy', 'balanced_accuracy', 'cohens_kappa',
+                                                        'f1_score', 'matthews_corr_coef', 'precision', 'recall'])
+
+        for i, threshold in enumerate(threshold_values):
+            y_pred = [int(x >= threshold) for x in test_predicted_proba]
+            row = metrics_df.iloc[i]
+            self.assertAlmostEqual(row['accuracy'], metrics.accuracy_score(y_test, y_pred), places=3)
+            self.assertAlmostEqual(row['balanced_accuracy'], metrics.balanced_accuracy_score(y_test, y_pred), places=3)
+            self.assertAlmostEqual(row['cohens_kappa'], metrics.cohen_kappa_score(y_test, y_pred), places=3)
+            self.assertAlmostEqual(row['f1_score'], metrics.f1_score(y_test, y_pred, zero_division = 0), places=3)
+            self.assertAlmostEqual(row['matthews_corr_coef'], metrics.matthews_corrcoef(y_test, y_pred), places=3)
+            self.assertAlmostEqual(row['precision'], metrics.precision_score(y_test, y_pred, zero_division = 1), places=3)
+            self.assertAlmostEqual(row['recall'], metrics.recall_score(y_test, y_pred, zero_division = 1), places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
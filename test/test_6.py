@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+
+import bctools as bc
+from bctools.utilities import get_amount_cost_df
+
+class Test_Amounts_Cost(unittest.TestCase):
+    def test_get_amount_cost_df(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+        amounts = np.abs(X_test[:, 13])
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_test[:, 12]), TP = 1)
+
+        amount_cost_df = get_amount_cost_df(y_test, test_predicted_proba, threshold_values, amounts, cost_dict)
+
+        for i, threshold in enumerate(threshold_values):
+            y_pred = test_predicted_proba >= threshold
+            row = amount_cost_df.iloc[i]
+
+            self.assertAlmostEqual(row['amount_TN'], amounts[(y_test == 0) & ~y_pred].sum(), places=6)
+            self.assertAlmostEqual(row['amount_FP'], amounts[(y_test == 0) & y_pred].sum(), places=6)
+            self.assertAlmostEqual(row['amount_FN'], amounts[(y_test == 1) & ~y_pred].sum(), places=6)
+            self.assertAlmostEqual(row['amount_TP'], amounts[(y_test == 1) & y_pred].sum(), places=6)
+
+            self.assertAlmostEqual(row['cost_TN'], 0, places=6)
+            self.assertAlmostEqual(row['cost_FP'], 10 * ((y_test == 0) & y_pred).sum(), places=6)
+            self.assertAlmostEqual(row['cost_FN'], cost_dict['FN'][(y_test == 1) & ~y_pred].sum(), places=6)
+            self.assertAlmostEqual(row['cost_TP'], ((y_test == 1) & y_pred).sum(), places=6)
+            self.assertAlmostEqual(row['total_cost'], row[['cost_TN', 'cost_FP', 'cost_FN', 'cost_TP']].sum(), places=6)
+
+        # exact thresholds: every distinct predicted proba
+        exact_amount_cost_df = get_amount_cost_df(y_test, test_predicted_proba, 'exact', amounts, cost_dict)
+        np.testing.assert_array_equal(exact_amount_cost_df['threshold'], np.unique(test_predicted_proba))
+        for i, threshold in enumerate(exact_amount_cost_df['threshold']):
+            y_pred = test_predicted_proba >= threshold
+            row = exact_amount_cost_df.iloc[i]
+            self.assertAlmostEqual(row['amount_FN'], amounts[(y_test == 1) & ~y_pred].sum(), places=6)
+            self.assertAlmostEqual(row['cost_FN'], cost_dict['FN'][(y_test == 1) & ~y_pred].sum(), places=6)
+        
+        compressed_amount_cost_df = get_amount_cost_df(y_test, test_predicted_proba, 'exact', amounts, n_breakpoints = 20)
+        self.assertLessEqual(len(compressed_amount_cost_df), 20)
+
+        with self.assertRaises(ValueError):
+            get_amount_cost_df(y_test, test_predicted_proba, 'grid', amounts)
+
+        with self.assertRaises(TypeError):
+            get_amount_cost_df(y_test, test_predicted_proba, threshold_values)
+
+        # per-row costs must have one element for each data point, neither more nor less
+        for n_costs in [len(y_test) + 50, len(y_test) - 50]:
+            with self.assertRaises(ValueError):
+                get_amount_cost_df(y_test, test_predicted_proba, threshold_values, 
+                                   cost_dict = bc.get_cost_dict(FP = np.ones(n_costs)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import confusion_matrix
+
+import bctools as bc
+from bctools.thresholds import get_optimal_threshold, get_cost_optimal_threshold, _get_subsets_indices, _get_subsets_confusion_tensors
+
+class Test_Ghost_Tensors(unittest.TestCase):
+    def test_subsets_confusion_tensors(self):
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        train_predicted_proba = cls.predict_proba(X_train)[:,1]
+
+        # thresholds in arbitrary order
+        threshold_values = np.random.RandomState(0).permutation(np.arange(0.05, 1, 0.05))
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_train[:, 12]), TP = 1)
+
+        for with_replacement in [False, True]:
+            subsets_indices = _get_subsets_indices(y_train, 5, 0.2, with_replacement, 123)
+            tensors = _get_subsets_confusion_tensors(y_train, train_predicted_proba, threshold_values, 
+                                                     5, 0.2, with_replacement, 123, cost_dict = cost_dict)
+            TN, FP, FN, TP = tensors['TN'], tensors['FP'], tensors['FN'], tensors['TP']
+            cost_TN, cost_FP, cost_FN, cost_TP = tensors['cost_TN'], tensors['cost_FP'], tensors['cost_FN'], tensors['cost_TP']
+            self.assertEqual(TN.shape, (5, len(threshold_values)))
+            
+            # parallel computation gives the same results
+            parallel_tensors = _get_subsets_confusion_tensors(y_train, train_predicted_proba, threshold_values, 
+                                                              5, 0.2, with_replacement, 123, cost_dict = cost_dict, n_jobs = 2)
+            for key in tensors:
+                np.testing.assert_allclose(tensors[key], parallel_tensors[key])
+
+            for i, indices in enumerate(subsets_indices):
+                labels_subset = y_train[indices]
+                for j, threshold in enumerate(threshold_values):
+                    y_pred = (train_predicted_proba[indices] >= threshold).astype(int)
+                    expected = confusion_matrix(labels_subset, y_pred, labels = [0, 1]).ravel()
+                    self.assertListEqual([TN[i, j], FP[i, j], FN[i, j], TP[i, j]], expected.tolist())
+
+                    self.assertAlmostEqual(cost_TN[i, j], 0, places=6)
+                    self.assertAlmostEqual(cost_FP[i, j], 10 * FP[i, j], places=6)
+                    self.assertAlmostEqual(cost_FN[i, j], cost_dict['FN'][indices][(labels_subset == 1) & (y_pred == 0)].sum(), places=6)
+                    self.assertAlmostEqual(cost_TP[i, j], TP[i, j], places=6)
+
+        # single-pass optimization gives the same thresholds as the per-metric functions
+        optimal_thresholds_df, ghost_curves_df = bc.get_optimized_thresholds_df('all', threshold_values, y_train, train_predicted_proba, 
+                                                                                cost_dict = cost_dict, N_subsets = 5, 
+                                                                                random_state = 123, return_curves = True)
+        optimal_thresholds = dict(zip(optimal_thresholds_df['optimized_metric'], optimal_thresholds_df['optimal_threshold']))
+        self.assertListEqual(list(optimal_thresholds), ['kappa', 'mcc', 'roc', 'f1_score', 'f2_score', 'f05_score', 'cost'])
+        self.assertEqual(len(ghost_curves_df), len(threshold_values))
+        for metric_name in ['Kappa', 'MCC', 'ROC']:
+            self.assertAlmostEqual(optimal_thresholds[metric_name.lower()], 
+                                   get_optimal_threshold(y_train, train_predicted_proba, threshold_values, metric_name, 5, 0.2, False, 123), 
+                                   places=5)
+        self.assertAlmostEqual(optimal_thresholds['cost'], 
+                               get_cost_optimal_threshold(y_train, train_predicted_proba, threshold_values, cost_dict, 5, 0.2, False, 123), 
+                               places=5)
+        self.assertAlmostEqual(optimal_thresholds['mcc'], threshold_values[np.argmax(ghost_curves_df['mcc_median'])], places=5)
+
+        # exact thresholds: optimal thresholds are predicted probabilities
+        exact_thresholds_df = bc.get_optimized_thresholds_df(['MCC', 'Fscore'], 'exact', y_train, train_predicted_proba, 
+                                                             N_subsets = 5, random_state = 123, n_breakpoints = 50)
+        self.assertTrue(np.isin(exact_thresholds_df['optimal_threshold'], train_predicted_proba).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
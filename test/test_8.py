@@ -0,0 +1,107 @@
+import unittest
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+from sklearn import metrics
+
+import bctools as bc
+from bctools.confusion import get_confusion_counts
+from bctools.utilities import get_amount_cost_df
+
+class Test_Confusion_Accumulator(unittest.TestCase):
+    def test_confusion_accumulator(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+        amounts = np.abs(X_test[:, 13])
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_test[:, 12]), TP = 1)
+
+        # chunks of a dataframe, as returned by pd.read_csv with chunksize
+        data_df = pd.DataFrame({'label': y_test, 'proba': test_predicted_proba, 'amount': amounts, 'cost_FN': cost_dict['FN']})
+        chunks = (data_df.iloc[start:start + 30] for start in range(0, len(data_df), 30))
+
+        accumulator = bc.ConfusionAccumulator(threshold_step = threshold_step)
+        accumulator.update_from_chunks(chunks, 'label', 'proba', amounts_column = 'amount',
+                                       cost_columns = {'TN': 0, 'FP': 10, 'FN': 'cost_FN', 'TP': 1})
+        self.assertEqual(accumulator.n_data, len(y_test))
+        self.assertAlmostEqual(accumulator.total_amount, amounts.sum(), places=6)
+
+        for accumulated, expected in zip(accumulator.get_confusion_counts(),
+                                         get_confusion_counts(y_test, test_predicted_proba, threshold_values)):
+            np.testing.assert_array_equal(accumulated, expected)
+
+        expected_df = get_amount_cost_df(y_test, test_predicted_proba, threshold_values, amounts, cost_dict)
+        pd.testing.assert_frame_equal(accumulator.get_amount_cost_df().reset_index(drop = True),
+                                      expected_df.reset_index(drop = True))
+
+        # aucs are approximated within their maximum errors, Brier score is exact
+        invariant_metrics_df = bc.utilities.get_invariant_metrics_df(accumulator, None).set_index('invariant_metric')
+        for metric_name, expected in [('roc_auc', metrics.roc_auc_score(y_test, test_predicted_proba)),
+                                      ('pr_auc', metrics.average_precision_score(y_test, test_predicted_proba)),
+                                      ('brier_score', metrics.brier_score_loss(y_test, test_predicted_proba))]:
+            self.assertLessEqual(abs(invariant_metrics_df.loc[metric_name, 'value'] - expected), 
+                                 invariant_metrics_df.loc[metric_name, 'max_error'] + 1e-4)
+        self.assertEqual(invariant_metrics_df.loc['brier_score', 'max_error'], 0)
+
+        # accumulators of separate partitions can be serialized and merged
+        merged_accumulator = bc.ConfusionAccumulator(threshold_step = threshold_step)
+        for start in range(0, len(y_test), 50):
+            partition_accumulator = bc.ConfusionAccumulator(threshold_step = threshold_step)
+            partition_accumulator.update(y_test[start:start + 50], test_predicted_proba[start:start + 50], 
+                                         amounts = amounts[start:start + 50], 
+                                         cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = cost_dict['FN'][start:start + 50], TP = 1))
+            merged_accumulator.merge(bc.ConfusionAccumulator.from_dict(json.loads(json.dumps(partition_accumulator.to_dict()))))
+        pd.testing.assert_frame_equal(merged_accumulator.get_amount_cost_df(), accumulator.get_amount_cost_df())
+        pd.testing.assert_frame_equal(merged_accumulator.get_invariant_metrics_df(), accumulator.get_invariant_metrics_df())
+
+        with self.assertRaises(ValueError):
+            accumulator.update(y_test, test_predicted_proba)
+
+        # per-row costs longer or shorter than the chunk are rejected before the statistics are updated
+        sketch = bc.ConfusionSketch().update(y_test, test_predicted_proba, amounts = amounts, cost_dict = cost_dict)
+        for statistics, df_args in [(accumulator, ()), (sketch, (threshold_values,))]:
+            expected_df = statistics.get_amount_cost_df(*df_args)
+            for n_costs in [len(y_test[:100]) + 1, len(y_test[:100]) - 1]:
+                with self.assertRaises(ValueError):
+                    statistics.update(y_test[:100], test_predicted_proba[:100], amounts = amounts[:100],
+                                      cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.ones(n_costs), TP = 1))
+            self.assertEqual(statistics.n_data, len(y_test))
+            pd.testing.assert_frame_equal(statistics.get_amount_cost_df(*df_args), expected_df)
+
+        # the accumulator can be plotted in place of the data
+        with patch("plotly.graph_objects.Figure.show"):
+            metrics_df, constant_metrics_df, _ = bc.confusion_matrix_plot(accumulator, None, threshold_step = threshold_step)
+            self.assertEqual(len(metrics_df), len(threshold_values))
+            amount_cost_df, total_amount = bc.confusion_linechart_plot(accumulator, None, threshold_step = threshold_step)
+            self.assertAlmostEqual(total_amount, round(amounts.sum(), 2), places=2)
+            bc.total_amount_cost_plot(accumulator, None, threshold_step = threshold_step)
+
+            with self.assertRaises(ValueError):
+                bc.confusion_matrix_plot(accumulator, None, optimize_threshold = 'all')
+            with self.assertRaises(TypeError):
+                bc.confusion_linechart_plot(accumulator, test_predicted_proba)
+
+
+if __name__ == '__main__':
+    unittest.main()
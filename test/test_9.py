@@ -0,0 +1,81 @@
+import unittest
+import json
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+from sklearn import metrics
+
+import bctools as bc
+from bctools.confusion import get_confusion_counts
+from bctools.utilities import get_amount_cost_df, get_invariant_metrics_df
+
+class Test_Confusion_Sketch(unittest.TestCase):
+    def test_confusion_sketch(self):
+
+        threshold_step = 0.05
+
+        # Generate a binary imbalanced classification problem, with 80% zeros and 20% ones.
+        X, y = make_classification(n_samples=1000, n_features=20,
+                                   n_informative=14, n_redundant=0,
+                                   random_state=12, shuffle=False, weights = [0.8, 0.2])
+
+        # Train - test split
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size = 0.2, stratify = y, random_state=123)
+
+        # Train a RF classifier
+        cls = RandomForestClassifier(max_depth=6, oob_score=True, random_state=123)
+        cls.fit(X_train, y_train)
+
+        test_predicted_proba = cls.predict_proba(X_test)[:,1]
+
+        threshold_values = list(np.arange(0, 1 + threshold_step, threshold_step))
+        amounts = np.abs(X_test[:, 13])
+        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = np.abs(X_test[:, 12]), TP = 1)
+
+        expected_df = get_amount_cost_df(y_test, test_predicted_proba, threshold_values, amounts, cost_dict).reset_index(drop = True)
+        expected_counts = get_confusion_counts(y_test, test_predicted_proba, threshold_values)
+        expected_metrics = {'roc_auc': metrics.roc_auc_score(y_test, test_predicted_proba),
+                            'pr_auc': metrics.average_precision_score(y_test, test_predicted_proba),
+                            'brier_score': metrics.brier_score_loss(y_test, test_predicted_proba)}
+
+        for max_bins in [1000, 20]:
+            # sketches of separate partitions, serialized and merged
+            sketch = bc.ConfusionSketch(max_bins = max_bins)
+            for start in range(0, len(y_test), 40):
+                partition_sketch = bc.ConfusionSketch(max_bins = max_bins)
+                partition_sketch.update(y_test[start:start + 40], test_predicted_proba[start:start + 40],
+                                        amounts = amounts[start:start + 40],
+                                        cost_dict = bc.get_cost_dict(TN = 0, FP = 10, FN = cost_dict['FN'][start:start + 40], TP = 1))
+                sketch.merge(bc.ConfusionSketch.from_dict(json.loads(json.dumps(partition_sketch.to_dict()))))
+            self.assertEqual(sketch.n_data, len(y_test))
+
+            amount_cost_df = sketch.get_amount_cost_df(threshold_values).reset_index(drop = True)
+            max_errors_df = sketch.get_max_errors_df(threshold_values).reset_index(drop = True)
+
+            for estimated, expected, max_error in zip(sketch.get_confusion_counts(threshold_values), expected_counts,
+                                                      [max_errors_df[confusion_class] for confusion_class in ['TN', 'FP', 'FN', 'TP']]):
+                self.assertTrue((np.abs(estimated - expected) <= max_error + 1e-6).all())
+            for column in expected_df.columns[1:-1]:
+                self.assertTrue((np.abs(amount_cost_df[column] - expected_df[column]) <= max_errors_df[column] + 1e-6).all())
+
+            invariant_metrics_df = get_invariant_metrics_df(sketch, None).set_index('invariant_metric')
+            for metric_name, expected in expected_metrics.items():
+                self.assertLessEqual(abs(invariant_metrics_df.loc[metric_name, 'value'] - expected),
+                                     invariant_metrics_df.loc[metric_name, 'max_error'] + 1e-4)
+
+            if max_bins == 1000:
+                # fewer distinct predicted probabilities than bins: results are exact
+                pd.testing.assert_frame_equal(amount_cost_df, expected_df)
+                self.assertEqual(max_errors_df[['TN', 'FP', 'FN', 'TP']].values.max(), 0)
+                self.assertEqual(invariant_metrics_df['max_error'].max(), 0)
+            else:
+                self.assertLessEqual(max(len(bins) for bins in sketch._bins), max_bins + 1)
+                self.assertGreater(max_errors_df['TN'].max(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()